@@ -0,0 +1,416 @@
+"""
+Headless benchmarks of DynamicFilters, DynamicFiltersHierarchical and DynamicFiltersWithGroupby.
+
+Streamlit is replaced by a stub exposing a plain dict as st.session_state and widgets returning
+their current value, so the filters run outside of a Streamlit server. Every case generates a
+synthetic dataframe, sets a selection in a fresh session state and measures one script rerun:
+
+    init             constructing the filters object in a new process (builds the value indexes)
+    filter_df        filtering the dataframe with the current selection
+    display_filters  computing the options and rendering the widgets
+    display_df       rendering the filtered dataframe
+    rerun            display_filters and display_df, including the reruns they request
+    init+rerun       a whole script run: constructing the filters object again, with what
+                     st.cache_resource kept from the previous run, and rerun
+
+Each stage reports the median time over the repeats and the peak memory traced during one
+extra run. Results can be saved as a baseline and later runs compared against it:
+
+    python benchmarks/bench.py --save benchmarks/baseline.json
+    python benchmarks/bench.py --compare benchmarks/baseline.json
+
+The comparison flags the init+rerun stage, or the stages given with --compare-stages, when it
+is slower (or larger in peak memory) than the baseline by more than the tolerance, and exits
+with status 1 if any stage regressed. --package measures another checkout of the package, e.g.
+the commit a change starts from, to produce the baseline.
+"""
+
+import argparse
+import functools
+import importlib.util
+import inspect
+import itertools
+import json
+import pathlib
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+PACKAGE = pathlib.Path(__file__).resolve().parent.parent / "streamlit-dynamic-filters"
+CLASSES = ["DynamicFilters", "DynamicFiltersHierarchical", "DynamicFiltersWithGroupby"]
+STAGES = ["init", "filter_df", "display_filters", "display_df", "rerun", "init+rerun"]
+MAX_RERUNS = 10
+
+
+class RerunRequested(Exception):
+    """Raised by the stubbed st.rerun()."""
+
+
+class SessionState(dict):
+    """A dict with attribute access, like st.session_state."""
+
+    def __getattr__(self, key):
+        try:
+            return self[key]
+        except KeyError:
+            raise AttributeError(key) from None
+
+    def __setattr__(self, key, value):
+        self[key] = value
+
+
+class StubContainer:
+    """Stubbed layout container; widgets return the value held in session state or their default."""
+
+    def __init__(self, streamlit):
+        self.streamlit = streamlit
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def widget(self, key, default):
+        state = self.streamlit.session_state
+        if key is None:
+            return default
+        if key not in state:
+            state[key] = default
+        return state[key]
+
+    def multiselect(self, label, options, default=None, key=None, **kwargs):
+        if default is not None:
+            self.streamlit.session_state[key] = list(default)
+        return list(self.widget(key, []))
+
+    def checkbox(self, label, value=False, key=None, **kwargs):
+        return self.widget(key, value)
+
+    toggle = checkbox
+
+    def text_input(self, label, value="", key=None, **kwargs):
+        return self.widget(key, value)
+
+    def selectbox(self, label, options, index=0, key=None, **kwargs):
+        return self.widget(key, list(options)[index] if options else None)
+
+    def number_input(self, label, min_value=None, max_value=None, value=None, key=None, **kwargs):
+        return self.widget(key, value if value is not None else min_value)
+
+    def button(self, label, key=None, **kwargs):
+        return False
+
+    def dataframe(self, data=None, **kwargs):
+        self.streamlit.rendered.append(data)
+
+    def columns(self, spec, **kwargs):
+        count = spec if isinstance(spec, int) else len(spec)
+        return [StubContainer(self.streamlit) for _ in range(count)]
+
+    def container(self, **kwargs):
+        return StubContainer(self.streamlit)
+
+    expander = container
+
+    def caption(self, *args, **kwargs):
+        pass
+
+    write = markdown = json = caption
+
+
+class StubStreamlit(StubContainer):
+    """Stubbed streamlit module."""
+
+    def __init__(self):
+        super().__init__(self)
+        self.session_state = SessionState()
+        self.sidebar = StubContainer(self)
+        self.rendered = []
+        self.reruns = 0
+        self.caches = getattr(self, "caches", [])
+
+    def rerun(self):
+        self.reruns += 1
+        raise RerunRequested
+
+    def fragment(self, func=None, **kwargs):
+        return func if func is not None else (lambda func: func)
+
+    def cache_resource(self, func=None, **kwargs):
+        """Memoizes a function for the process like st.cache_resource, leaving out the arguments named with a leading underscore."""
+
+        def decorate(func):
+            signature = inspect.signature(func)
+            results = {}
+            self.caches.append(results)
+
+            @functools.wraps(func)
+            def cached(*args, **kwargs):
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                key = repr([(name, value) for name, value in bound.arguments.items() if not name.startswith("_")])
+                if key not in results:
+                    results[key] = func(*args, **kwargs)
+                return results[key]
+
+            cached.clear = results.clear
+            return cached
+
+        return decorate(func) if func is not None else decorate
+
+    def clear_caches(self):
+        """Empties every function memoized with cache_resource, as in a new process."""
+        for results in self.caches:
+            results.clear()
+
+
+def load_package(stub, path=PACKAGE):
+    """
+    Imports the package from a directory and points its modules at the streamlit stub.
+
+    The functions the package memoizes with st.cache_resource at import time are memoized by
+    the stub, so the benchmark decides when a run starts from an empty cache.
+    """
+    import streamlit
+
+    spec = importlib.util.spec_from_file_location(
+        "streamlit_dynamic_filters", pathlib.Path(path) / "__init__.py", submodule_search_locations=[str(path)]
+    )
+    package = importlib.util.module_from_spec(spec)
+    sys.modules["streamlit_dynamic_filters"] = package
+    cache_resource = streamlit.cache_resource
+    streamlit.cache_resource = stub.cache_resource
+    try:
+        spec.loader.exec_module(package)
+    finally:
+        streamlit.cache_resource = cache_resource
+    for name, module in list(sys.modules.items()):
+        if name.startswith("streamlit_dynamic_filters.") and hasattr(module, "st"):
+            module.st = stub
+    return package
+
+
+def make_frame(rows, cardinality, num_filters, seed=0):
+    """Generates a dataframe with num_filters string columns of the given cardinality and a numeric column."""
+    rng = np.random.default_rng(seed)
+    data = {}
+    for position in range(num_filters):
+        labels = np.array([f"f{position}_{value}" for value in range(cardinality)], dtype=object)
+        data[f"f{position}"] = labels[rng.integers(0, cardinality, rows)]
+    data["value"] = rng.random(rows)
+    return pd.DataFrame(data)
+
+
+def make_selection(df, filters, density, seed=0):
+    """
+    Selects a fraction density of the distinct values of the first half of the filters.
+
+    Every selected filter keeps at least one value, unless density is 0.
+    """
+    rng = np.random.default_rng(seed)
+    selection = {filter_name: [] for filter_name in filters}
+    if density <= 0:
+        return selection
+    for filter_name in filters[: max(1, len(filters) // 2)]:
+        values = df[filter_name].unique()
+        count = max(1, int(round(len(values) * density)))
+        selection[filter_name] = list(rng.choice(values, size=count, replace=False))
+    return selection
+
+
+def construct(package, class_name, df, filters, max_workers=None):
+    """Constructs the filters, passing max_workers only if set, so versions without it can be measured."""
+    cls = getattr(package.dynamic_filters, class_name)
+    kwargs = {"max_workers": max_workers} if max_workers is not None else {}
+    if class_name == "DynamicFiltersWithGroupby":
+        return cls(df, filters, numerics=["value"], **kwargs)
+    return cls(df, filters, **kwargs)
+
+
+def reset_session(stub, dynamic_filters, selection):
+    """Replaces the session state with a fresh one holding the selection."""
+    stub.session_state = SessionState()
+    stub.session_state[dynamic_filters.filters_name] = {key: list(values) for key, values in selection.items()}
+    if hasattr(dynamic_filters, "aggregation_name"):
+        # group by the first filter so display_df aggregates; the checkboxes are keyed by filter name
+        aggregation = {filter_name: position == 0 for position, filter_name in enumerate(selection)}
+        stub.session_state[dynamic_filters.aggregation_name] = aggregation
+        stub.session_state.update(aggregation)
+    dynamic_filters.filters = stub.session_state[dynamic_filters.filters_name]
+    stub.rendered = []
+    stub.reruns = 0
+
+
+def rerun(dynamic_filters):
+    """Runs the filters part of the script, repeating it while it requests reruns."""
+    for _ in range(MAX_RERUNS):
+        try:
+            dynamic_filters.display_filters()
+            dynamic_filters.display_df()
+            return
+        except RerunRequested:
+            continue
+
+
+def measure(func, repeats, prepare):
+    """Returns the median time in seconds over the repeats and the peak traced memory of one more call."""
+    timings = []
+    for _ in range(repeats):
+        prepare()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    prepare()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(timings), peak
+
+
+def run_case(package, stub, class_name, df, filters, selection, repeats, max_workers=None):
+    """Measures every stage of one case and returns {stage: {'seconds', 'peak_bytes', 'reruns'}}."""
+    results = {}
+    holder = {}
+
+    def init():
+        holder["filters"] = construct(package, class_name, df, filters, max_workers)
+
+    def cold():
+        stub.__init__()
+        stub.clear_caches()
+
+    seconds, peak = measure(init, repeats, cold)
+    results["init"] = {"seconds": seconds, "peak_bytes": peak}
+
+    dynamic_filters = holder["filters"]
+
+    def prepare():
+        reset_session(stub, dynamic_filters, selection)
+
+    def display_filters():
+        try:
+            dynamic_filters.display_filters()
+        except RerunRequested:
+            pass
+
+    def script_run():
+        # a rerun constructs the filters again, from a copy of df as st.cache_data returns one
+        rerun(construct(package, class_name, holder["copy"], filters, max_workers))
+
+    def prepare_script_run():
+        prepare()
+        holder["copy"] = df.copy()
+
+    stages = {
+        "filter_df": (dynamic_filters.filter_df, prepare),
+        "display_filters": (display_filters, prepare),
+        "display_df": (dynamic_filters.display_df, prepare),
+        "rerun": (lambda: rerun(dynamic_filters), prepare),
+        "init+rerun": (script_run, prepare_script_run),
+    }
+    for stage, (func, prepare_stage) in stages.items():
+        seconds, peak = measure(func, repeats, prepare_stage)
+        results[stage] = {"seconds": seconds, "peak_bytes": peak, "reruns": stub.reruns}
+    return results
+
+
+def case_name(class_name, rows, cardinality, num_filters, density):
+    return f"{class_name}/rows={rows}/card={cardinality}/filters={num_filters}/density={density}"
+
+
+def run(args):
+    stub = StubStreamlit()
+    package = load_package(stub, args.package)
+    results = {}
+    for rows, cardinality, num_filters in itertools.product(args.rows, args.cardinality, args.filters):
+        df = make_frame(rows, cardinality, num_filters)
+        filters = [column for column in df.columns if column != "value"]
+        for density, class_name in itertools.product(args.density, args.classes):
+            name = case_name(class_name, rows, cardinality, num_filters, density)
+            selection = make_selection(df, filters, density)
+            results[name] = run_case(
+                package, stub, class_name, df, filters, selection, args.repeats, args.max_workers
+            )
+            for stage in STAGES:
+                result = results[name][stage]
+                print(
+                    f"{name:<75} {stage:<16} {result['seconds'] * 1000:>10.2f} ms"
+                    f" {result['peak_bytes'] / 2**20:>9.1f} MiB",
+                    flush=True,
+                )
+        del df
+    return results
+
+
+def compare(results, baseline, tolerance, min_seconds, stages=("init+rerun",)):
+    """Returns the given stages of results that are slower or use more memory than the baseline beyond the tolerance."""
+    regressions = []
+    for name, case in results.items():
+        for stage in stages:
+            result, reference = case.get(stage), baseline.get(name, {}).get(stage)
+            if result is None or reference is None:
+                continue
+            slower = (
+                result["seconds"] > reference["seconds"] * (1 + tolerance)
+                and result["seconds"] - reference["seconds"] > min_seconds
+            )
+            larger = result["peak_bytes"] > reference["peak_bytes"] * (1 + tolerance) + 2**20
+            if slower or larger:
+                regressions.append((name, stage, reference, result))
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+                        help="row counts of the synthetic frames, e.g. 10000 10000000")
+    parser.add_argument("--cardinality", type=int, nargs="+", default=[10, 1_000],
+                        help="distinct values per filter column")
+    parser.add_argument("--filters", type=int, nargs="+", default=[2, 5], help="number of filter columns")
+    parser.add_argument("--density", type=float, nargs="+", default=[0.0, 0.1, 0.5],
+                        help="fraction of the distinct values selected in the first half of the filters")
+    parser.add_argument("--classes", nargs="+", default=CLASSES, choices=CLASSES)
+    parser.add_argument("--max-workers", type=int, help="thread pool size for the options of the filters")
+    parser.add_argument("--repeats", type=int, default=3, help="timed runs per stage; the median is reported")
+    parser.add_argument("--save", metavar="PATH", help="store the results as a baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare the results with a stored baseline")
+    parser.add_argument("--compare-stages", nargs="+", default=["init+rerun"], choices=STAGES,
+                        help="stages checked against the baseline")
+    parser.add_argument("--package", metavar="PATH", default=PACKAGE,
+                        help="package directory to measure, e.g. of a worktree of the commit a change starts from")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="relative slowdown or memory growth flagged as a regression")
+    parser.add_argument("--min-ms", type=float, default=1.0,
+                        help="slowdowns smaller than this many milliseconds are ignored")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run(args)
+
+    if args.save:
+        pathlib.Path(args.save).write_text(json.dumps(results, indent=2, sort_keys=True))
+        print(f"baseline saved to {args.save}")
+
+    if args.compare:
+        baseline = json.loads(pathlib.Path(args.compare).read_text())
+        regressions = compare(results, baseline, args.tolerance, args.min_ms / 1000, args.compare_stages)
+        for name, stage, reference, result in regressions:
+            print(
+                f"REGRESSION {name} {stage}: {reference['seconds'] * 1000:.2f} ms -> {result['seconds'] * 1000:.2f} ms,"
+                f" {reference['peak_bytes'] / 2**20:.1f} MiB -> {result['peak_bytes'] / 2**20:.1f} MiB"
+            )
+        print(f"{len(regressions)} regression(s) against {args.compare}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -19,6 +19,7 @@ setup(
     long_description_content_type="text/markdown",
     packages=find_packages(),
     install_requires=['streamlit'],
+    extras_require={'duckdb': ['duckdb'], 'arrow': ['pyarrow']},
     keywords=['streamlit', 'custom', 'component'],
     license="MIT",
     url="https://github.com/arsentievalex/streamlit-dynamic-filters",
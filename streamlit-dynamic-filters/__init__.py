@@ -1,2 +1,8 @@
+from .arrow import DynamicFiltersArrow, DynamicFiltersHierarchicalArrow
+from .background import BackgroundResults
+from .cache import FilterCache
+from .cube import AggregationCube
 from .dynamic_filters import DynamicFilters, DynamicFiltersHierarchical
-
+from .engine import FilterEngine, FilterIndex
+from .profiling import FilterProfiler
+from .sql import DynamicFiltersDuckDB
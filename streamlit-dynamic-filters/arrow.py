@@ -0,0 +1,252 @@
+import streamlit as st
+from streamlit.errors import StreamlitAPIException
+
+from .dynamic_filters import DynamicFilters, DynamicFiltersHierarchical
+from .engine import is_missing
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    from pyarrow import fs
+except ImportError:  # pragma: no cover - optional dependency
+    ds = None
+
+
+def open_dataset(source, format="parquet", partitioning="hive"):
+    """
+    Opens a pyarrow dataset from a dataset object or a path, memory-mapping local files.
+
+    Parameters
+    ----------
+        source : Dataset or str
+            A pyarrow dataset, or the path to a Parquet/Feather file or directory.
+        format : str, optional
+            File format of the dataset when source is a path: 'parquet', 'feather' or 'ipc'.
+        partitioning : str, optional
+            Partitioning scheme of the directory when source is a path.
+
+    Returns
+    -------
+        Dataset
+            The opened dataset.
+    """
+    if ds is None:
+        raise ImportError(
+            "Arrow datasets require pyarrow: pip install streamlit-dynamic-filters[arrow]"
+        )
+    if isinstance(source, ds.Dataset):
+        return source
+    if not isinstance(source, str):
+        raise StreamlitAPIException("source must be a pyarrow dataset or a path")
+    return ds.dataset(
+        source,
+        format=format,
+        partitioning=partitioning,
+        filesystem=fs.LocalFileSystem(use_mmap=True),
+    )
+
+
+def dataset_key(dataset, version=None):
+    """
+    Returns a key identifying the data of a dataset from its files, None if it has no files.
+
+    The key holds the paths of the files and, unless version is given, their sizes and
+    modification times, so rewriting a file changes the key without reading any row of it.
+    """
+    files = getattr(dataset, "files", None)
+    if not files:
+        return None
+    if version is not None:
+        return ("version", version, tuple(files))
+    return tuple((info.path, info.size, info.mtime_ns) for info in dataset.filesystem.get_file_info(files))
+
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def shared_filter_columns(key, columns, _dataset):
+    """Returns the columns read from a dataset, once per process for a key identifying its files, see dataset_key()."""
+    return _dataset.to_table(columns=columns).to_pandas()
+
+
+class DynamicFiltersArrow(DynamicFilters):
+    """
+    A class that extends DynamicFilters to filter a pyarrow dataset instead of an in-memory dataframe.
+
+    Only the filter columns, and the key columns of dimensions, are read eagerly; they back the
+    value index and the options of the widgets. Filtered rows are read from the dataset with the
+    selections pushed down as a filter expression, so partitions and row groups that cannot
+    match are skipped.
+
+    With shared or index_path, the filter columns of a dataset backed by files are read once per
+    process and kept with st.cache_resource, keyed by the paths of the files and the version, or
+    their sizes and modification times if no version is given. A rerun then reads no rows and
+    fingerprints nothing, and the indexes built from the columns are shared as in DynamicFilters.
+
+    Requires the optional pyarrow dependency: pip install streamlit-dynamic-filters[arrow]
+
+    Attributes
+    ----------
+    dataset : Dataset
+        The dataset on which filters are applied.
+    df : DataFrame
+        The filter columns of the dataset.
+    """
+
+    def __init__(self, source, filters, filters_name="filters", format="parquet", partitioning="hive", **kwargs):
+        """
+        Constructs all the necessary attributes for the DynamicFiltersArrow object.
+
+        Parameters
+        ----------
+            source : Dataset or str
+                A pyarrow dataset, or the path to a Parquet/Feather file or directory.
+            filters : list of str
+                List of column names in the dataset for which filters are to be created.
+            filters_name: str, optional
+                Name of the filters object in session state.
+            format: str, optional
+                File format of the dataset when source is a path: 'parquet', 'feather' or 'ipc'.
+            partitioning: str, optional
+                Partitioning scheme of the directory when source is a path.
+            **kwargs:
+                The other arguments of DynamicFilters, e.g. cache, ranges, shared or version,
+                passed on to it. dimensions are keyed by columns of the dataset, background reads
+                the rendered rows from the dataset, and version identifies the files of the
+                dataset, e.g. by their modification time.
+        """
+        self.dataset = open_dataset(source, format, partitioning)
+        dimensions = kwargs.get("dimensions") or {}
+        columns = [name for name in filters if name in self.dataset.schema.names] + list(dimensions)
+        columns = list(dict.fromkeys(columns))
+        shared = kwargs.get("shared", True) or kwargs.get("index_path") is not None
+        key = dataset_key(self.dataset, kwargs.get("version")) if shared else None
+        if key is None:
+            df = self.dataset.to_table(columns=columns).to_pandas()
+        else:
+            df = shared_filter_columns(key, columns, self.dataset)
+        super().__init__(df, filters, filters_name, **kwargs)
+
+    def filter_expression(self, except_filters=()):
+        """
+        Builds the dataset filter expression of the session state values except for the specified filters.
+
+        Parameters
+        ----------
+            except_filters : list of str, optional
+                Filter names that should be excluded from the current filtering operation.
+
+        Returns
+        -------
+            Expression or None
+                The filter expression, or None if no filter restricts the rows.
+        """
+        expression = None
+        for key, values in st.session_state[self.filters_name].items():
+            if key in except_filters or not values:
+                continue
+            if key in self.ranges:
+                predicate = (ds.field(key) >= values[0]) & (ds.field(key) <= values[1])
+            elif key in self.texts:
+                # the text index resolves the query to the matching values, typed as no value may match
+                index = self.index[key]
+                matches = pa.array(
+                    index.values.take(index.match(values[0])).tolist(), type=self.dataset.schema.field(key).type
+                )
+                predicate = ds.field(key).isin(matches)
+            elif key in self.linked:
+                # linked selections are pushed down as the keys of the matching dimension rows
+                index = self.index[key]
+                keys = index.key_index.values[index.key_keep(values)].tolist()
+                predicate = ds.field(index.key).isin(pa.array(keys, type=self.dataset.schema.field(index.key).type))
+            else:
+                # missing values are matched as nulls, which isin() does not compare
+                present = [value for value in values if not is_missing(value)]
+                predicate = ds.field(key).isin(pa.array(present, type=self.dataset.schema.field(key).type))
+                if len(present) < len(values):
+                    predicate = predicate | ds.field(key).is_null(nan_is_null=True)
+            expression = predicate if expression is None else expression & predicate
+        return expression
+
+    def read(self, except_filters=()):
+        """Reads the rows of the dataset matching the session state values except for the specified filters."""
+        return self.dataset.to_table(filter=self.filter_expression(except_filters)).to_pandas()
+
+    def filter_df(self, except_filter=None):
+        """
+        Filters the dataset based on session state values except for the specified filter.
+
+        Parameters
+        ----------
+            except_filter : str, optional
+                The filter name that should be excluded from the current filtering operation.
+
+        Returns
+        -------
+            DataFrame
+                Filtered dataframe with all the columns of the dataset.
+        """
+        return self.read([except_filter])
+
+    def rows_task(self):
+        """Returns a function reading the rows matching the current selections from the dataset, without reading the session state."""
+        expression = self.filter_expression()
+        return lambda: self.dataset.to_table(filter=expression).to_pandas()
+
+    def take_rows(self, positions):
+        """Reads the rows of the dataset at the given positions, or all rows if positions is None."""
+        if positions is None:
+            return self.dataset.to_table().to_pandas()
+        return self.dataset.take(positions).to_pandas()
+
+    def append(self, rows):
+        """
+        Not supported: rows are appended to a dataset by writing files to it.
+
+        Exceptions
+        ----------
+        Raises StreamlitAPIException. Construct the filters again once the files are written.
+        """
+        raise StreamlitAPIException("rows cannot be appended to a dataset; construct the filters again")
+
+    def column_names(self):
+        """Returns the names of the columns of the dataset."""
+        return list(self.dataset.schema.names)
+
+    def column_values(self, column_name):
+        """Returns a column over all rows, reading it from the dataset unless it is a filter column."""
+        if column_name in self.df.columns:
+            return self.df[column_name]
+        return self.dataset.to_table(columns=[column_name]).column(column_name).to_pandas()
+
+
+class DynamicFiltersHierarchicalArrow(DynamicFiltersHierarchical, DynamicFiltersArrow):
+    """
+    A class that combines DynamicFiltersHierarchical with a pyarrow dataset source.
+
+    The hierarchy is evaluated on the eagerly read filter columns, and the final rows are read
+    from the dataset with the selections pushed down as a filter expression.
+    """
+
+    def filter_df(self, except_filter=None, except_filter_tab: list = None):
+        """
+        Filters the dataset based on session state values except for specified filters.
+
+        Parameters
+        ----------
+        except_filter : str, optional
+            The filter name that should be excluded from the current filtering operation.
+
+        except_filter_tab : list, optional
+            A list of filter names that should be excluded from the current filtering operation.
+
+        Returns
+        -------
+        DataFrame
+            Filtered dataframe with all the columns of the dataset.
+        """
+        if except_filter_tab is None:
+            except_filter_tab = []
+        return self.read([except_filter, *except_filter_tab])
+
+    def rows_task(self):
+        """Returns a function reading the rows matching the current selections from the dataset with pushdown."""
+        return DynamicFiltersArrow.rows_task(self)
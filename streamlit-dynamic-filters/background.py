@@ -0,0 +1,207 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent import futures
+
+# sessions whose state is remembered, least recently active first out
+MAX_OWNERS = 1024
+
+
+class BackgroundResults:
+    """
+    Filtered rows and aggregations computed on a background thread pool, keyed by selection state.
+
+    A script run asks for the result of its selection state and waits for it while yielding to
+    Streamlit, so a newer click stops the run instead of letting it finish stale work. Every
+    session owns the state it asked for last: asking for another state releases the previous
+    one, whose computation is cancelled if it has not started, and skipped if it starts after
+    being released. A computation already running is left to finish, and its result is kept for
+    a later return to that state, but no run waits for it. New states are only submitted once
+    the session has been idle for debounce seconds, so the states a burst of clicks passes
+    through are never computed, and the latency of a burst follows its last click.
+
+    Results are shared by the sessions landing on the same state, like the entries of a
+    FilterCache. Create one instance per process, e.g. with st.cache_resource, and pass it to
+    the filters:
+
+        @st.cache_resource
+        def background_results():
+            return BackgroundResults(max_workers=4)
+
+        dynamic_filters = DynamicFilters(df, filters=['region', 'country'], background=background_results())
+
+    Results are shared between sessions and must not be modified.
+
+    Attributes
+    ----------
+    max_workers : int
+        Number of threads computing results.
+    max_entries : int
+        Maximum number of finished results kept.
+    debounce : float
+        Seconds a session must be idle before a new state is submitted.
+    poll : float
+        Seconds between two yields to Streamlit while a result is awaited.
+    submitted : int
+        Number of computations submitted.
+    reused : int
+        Number of states answered by a computation submitted before.
+    cancelled : int
+        Number of computations cancelled or skipped because their state was released.
+    """
+
+    def __init__(self, max_workers=2, max_entries=32, debounce=0.1, poll=0.05):
+        """
+        Constructs the thread pool and an empty set of results.
+
+        Parameters
+        ----------
+            max_workers : int, optional
+                Number of threads computing results. Default is 2, so the newest state starts
+                while the computation of a released one finishes.
+            max_entries : int, optional
+                Maximum number of finished results kept, least recently used first out.
+            debounce : float, optional
+                Seconds a session must be idle before a new state is submitted. 0 submits at once.
+            poll : float, optional
+                Seconds between two yields to Streamlit while a result is awaited.
+        """
+        self.max_workers = max_workers
+        self.max_entries = max_entries
+        self.debounce = debounce
+        self.poll = poll
+        self.submitted = 0
+        self.reused = 0
+        self.cancelled = 0
+        self._executor = futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="dynamic-filters-background"
+        )
+        self._futures = OrderedDict()
+        self._owners = OrderedDict()
+        self._lock = threading.Lock()
+
+    def claim(self, owner, key):
+        """
+        Makes key the state of owner, releasing its previous state, and returns the future of key if any.
+
+        A released state no other owner holds has its computation cancelled if it has not started.
+        """
+        with self._lock:
+            previous = self._owners.get(owner)
+            self._owners[owner] = key
+            self._owners.move_to_end(owner)
+            while len(self._owners) > MAX_OWNERS:
+                self._owners.popitem(last=False)
+            if previous is not None and previous != key and previous not in self._owners.values():
+                future = self._futures.get(previous)
+                if future is not None and future.cancel():
+                    del self._futures[previous]
+                    self.cancelled += 1
+            future = self._futures.get(key)
+            if future is not None:
+                self._futures.move_to_end(key)
+                self.reused += 1
+            return future
+
+    def submit(self, owner, key, compute):
+        """Returns the future of key for owner, submitting compute if no computation of key is pending or kept."""
+        future = self.claim(owner, key)
+        if future is not None:
+            return future
+        with self._lock:
+            if key not in self._futures:
+                self._futures[key] = self._executor.submit(self.run, key, compute)
+                self.submitted += 1
+                self.evict()
+            return self._futures[key]
+
+    def run(self, key, compute):
+        """Computes the result of key on a pool thread, unless no owner holds key anymore."""
+        with self._lock:
+            if key not in self._owners.values():
+                self._futures.pop(key, None)
+                self.cancelled += 1
+                raise futures.CancelledError()
+        try:
+            return compute()
+        except BaseException:
+            # failures are not kept, so the next run computes the state again
+            with self._lock:
+                self._futures.pop(key, None)
+            raise
+
+    def evict(self):
+        """Drops the least recently used finished results beyond max_entries. Called with the lock held."""
+        excess = len(self._futures) - self.max_entries
+        for key in [key for key, future in self._futures.items() if future.done()][: max(excess, 0)]:
+            del self._futures[key]
+
+    def result(self, owner, key, compute, idle=None):
+        """
+        Returns the result of key, computed in the background, waiting for it in steps of poll seconds.
+
+        Parameters
+        ----------
+            owner : hashable
+                The session asking, e.g. its session id and the filters name.
+            key : hashable
+                The selection state and what is computed for it.
+            compute : callable
+                Function without arguments returning the result. It runs on a pool thread, so it
+                must not read the session state.
+            idle : callable, optional
+                Function called at every step of the wait, e.g. reading the session state, which
+                lets Streamlit stop a run superseded by a newer click.
+
+        Returns
+        -------
+            object
+                The result of compute, possibly computed for another run or session.
+        """
+        future = self.claim(owner, key)
+        if future is None and self.debounce > 0:
+            deadline = time.monotonic() + self.debounce
+            while time.monotonic() < deadline:
+                time.sleep(min(self.poll, max(deadline - time.monotonic(), 0)))
+                if idle is not None:
+                    idle()
+        while True:
+            if future is None:
+                future = self.submit(owner, key, compute)
+            try:
+                return future.result(timeout=self.poll)
+            except futures.TimeoutError:
+                if idle is not None:
+                    idle()
+            except futures.CancelledError:
+                # released by another run of the owner between two steps, or skipped at start
+                future = None
+
+    def clear(self):
+        """Cancels the pending computations, removes all results and resets the counters."""
+        with self._lock:
+            for future in self._futures.values():
+                future.cancel()
+            self._futures.clear()
+            self._owners.clear()
+            self.submitted = 0
+            self.reused = 0
+            self.cancelled = 0
+
+    def stats(self):
+        """
+        Returns the counters of the background computations.
+
+        Returns
+        -------
+            dict
+                Dictionary with the keys 'submitted', 'reused', 'cancelled', 'pending' and 'entries'.
+        """
+        with self._lock:
+            return {
+                "submitted": self.submitted,
+                "reused": self.reused,
+                "cancelled": self.cancelled,
+                "pending": sum(not future.done() for future in self._futures.values()),
+                "entries": len(self._futures),
+            }
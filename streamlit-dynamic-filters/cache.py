@@ -0,0 +1,261 @@
+import hashlib
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+
+_fingerprints = {}
+
+
+def fingerprint(df):
+    """
+    Returns a fingerprint of the contents of a dataframe.
+
+    The fingerprint is computed from the values of the columns, the index, the column names
+    and the dtypes, see hash_values(), and is memoized for as long as the dataframe object is
+    alive. The memo is dropped when the shape,
+    the columns or the dtypes of the dataframe change, but not when values are overwritten in
+    place, e.g. with df.loc[...] = ..., so a fingerprinted dataframe must not be modified:
+    build a new one, or pass a version to the filters instead of relying on the fingerprint.
+
+    Parameters
+    ----------
+        df : DataFrame
+            The dataframe to fingerprint.
+
+    Returns
+    -------
+        str
+            Hex digest identifying the dataframe contents.
+    """
+    key = id(df)
+    layout = structure(df)
+    if key not in _fingerprints or _fingerprints[key][0] != layout:
+        digest = hashlib.sha256()
+        digest.update(repr((list(df.columns), [str(dtype) for dtype in df.dtypes])).encode())
+        hash_rows(digest, df)
+        if key not in _fingerprints:
+            weakref.finalize(df, _fingerprints.pop, key, None)
+        _fingerprints[key] = (layout, digest.hexdigest()[:32])
+    return _fingerprints[key][1]
+
+
+def hash_rows(digest, df):
+    """Feeds the index and the columns of a dataframe to digest, see hash_values()."""
+    hash_values(digest, df.index)
+    for position in range(df.shape[1]):
+        hash_values(digest, df.iloc[:, position])
+
+
+def hash_values(digest, values):
+    """
+    Feeds the values of a column or an index to digest.
+
+    Columns without Python objects, e.g. numbers and dates, are hashed from their memory and
+    Arrow-backed columns, e.g. the default strings of pandas with pyarrow installed, from their
+    buffers serialised as an Arrow stream, at the speed of the hash. Other columns are hashed
+    value by value with pd.util.hash_pandas_object(), several times slower. A RangeIndex is
+    hashed from its bounds. The same values held in other chunks or dtypes may hash
+    differently, which only costs a rebuild.
+
+    Parameters
+    ----------
+        digest : hashlib hash object
+            The hash updated with the values.
+        values : Series or Index
+            The column or the index to hash.
+    """
+    if isinstance(values, pd.RangeIndex):
+        digest.update(repr((values.start, values.stop, values.step)).encode())
+    elif isinstance(values, pd.MultiIndex):
+        digest.update(pd.util.hash_pandas_object(values).to_numpy().tobytes())
+    elif pa is not None and isinstance(values.array, pd.arrays.ArrowExtensionArray):
+        sink = pa.BufferOutputStream()
+        table = pa.table({"values": pa.array(values.array)})
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        digest.update(sink.getvalue())
+    elif isinstance(values.dtype, np.dtype) and not values.dtype.hasobject:
+        digest.update(np.ascontiguousarray(values.to_numpy()).view(np.uint8))
+    else:
+        digest.update(pd.util.hash_pandas_object(values, index=False).to_numpy().tobytes())
+
+
+def structure(df):
+    """Returns the shape, the column names and the dtypes of a dataframe, checked before a memoized fingerprint is reused."""
+    return (df.shape, tuple(df.columns), tuple(str(dtype) for dtype in df.dtypes))
+
+
+def append_fingerprint(df, previous):
+    """
+    Memoizes the fingerprint of df, made of previous with rows appended, from the fingerprint of previous.
+
+    Only the appended rows are hashed. Nothing is memoized if previous has no fingerprint yet,
+    since computing it would hash all rows; fingerprint(df) then computes it on first use.
+
+    Parameters
+    ----------
+        df : DataFrame
+            The dataframe with the appended rows.
+        previous : DataFrame
+            The dataframe before the rows were appended, the first rows of df.
+    """
+    if id(previous) not in _fingerprints or _fingerprints[id(previous)][0] != structure(previous):
+        return
+    digest = hashlib.sha256()
+    digest.update(_fingerprints[id(previous)][1].encode())
+    hash_rows(digest, df.iloc[len(previous) :])
+    key = id(df)
+    if key not in _fingerprints:
+        weakref.finalize(df, _fingerprints.pop, key, None)
+    _fingerprints[key] = (structure(df), digest.hexdigest()[:32])
+
+
+def estimate_size(value, skip=()):
+    """
+    Returns an estimate in bytes of the memory held by a cached value.
+
+    Objects in skip, compared by identity, are not counted, e.g. data shared with other values.
+    """
+    if any(value is skipped for skipped in skip):
+        return 0
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_size(key, skip) + estimate_size(item, skip) for key, item in value.items()
+        )
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item, skip) for item in value)
+    return sys.getsizeof(value)
+
+
+class FilterCache:
+    """
+    A thread-safe LRU cache of filter options and filtered rows, shared across sessions.
+
+    Entries are keyed by the fingerprint of the dataframe and the normalised selection state,
+    so sessions landing on identical selections reuse each other's results. The cache is
+    bounded both by number of entries and by estimated size in bytes.
+
+    Create one instance per process, e.g. with st.cache_resource, and pass it to the filters:
+
+        @st.cache_resource
+        def filter_cache():
+            return FilterCache(max_entries=1024, max_bytes=256 * 2**20)
+
+        dynamic_filters = DynamicFilters(df, filters=['region', 'country'], cache=filter_cache())
+
+    Cached values are shared between sessions and must not be modified.
+
+    Attributes
+    ----------
+    max_entries : int
+        Maximum number of entries kept in the cache.
+    max_bytes : int
+        Maximum estimated size of all entries in bytes.
+    hits : int
+        Number of lookups answered from the cache.
+    misses : int
+        Number of lookups that had to be computed.
+    evictions : int
+        Number of entries evicted to respect the bounds.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=64 * 2**20):
+        """
+        Constructs an empty cache.
+
+        Parameters
+        ----------
+            max_entries : int, optional
+                Maximum number of entries kept in the cache.
+            max_bytes : int, optional
+                Maximum estimated size of all entries in bytes.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        """
+        Returns the cached value for a key, computing and storing it on a miss.
+
+        Parameters
+        ----------
+            key : hashable
+                Cache key.
+            compute : callable
+                Function without arguments returning the value for the key.
+
+        Returns
+        -------
+            object
+                The cached or freshly computed value.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+
+        value = compute()
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return value
+
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.nbytes += size
+            while len(self._entries) > self.max_entries or self.nbytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.nbytes -= evicted_size
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        """Removes all entries from the cache and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        """
+        Returns the cache counters.
+
+        Returns
+        -------
+            dict
+                Dictionary with the keys 'hits', 'misses', 'evictions', 'entries' and 'bytes'.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self.nbytes,
+            }
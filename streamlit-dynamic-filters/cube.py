@@ -0,0 +1,259 @@
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+from streamlit.errors import StreamlitAPIException
+
+# partial aggregates stored in the rollups for each aggregation, and how they are re-aggregated
+PARTIALS = {
+    "sum": ["sum"],
+    "mean": ["sum", "count"],
+    "min": ["min"],
+    "max": ["max"],
+    "count": ["count"],
+}
+REAGGREGATE = {"sum": "sum", "count": "sum", "min": "min", "max": "max"}
+
+
+class AggregationCube:
+    """
+    Pre-aggregated rollups of a dataframe over its filter dimensions.
+
+    A rollup groups the dataframe by a subset of the dimensions and stores partial aggregates of
+    the numeric columns (sum, count, min or max). A filtered group-by is answered from the
+    smallest rollup covering both the grouping columns and the filtered dimensions, by filtering
+    the rollup and re-aggregating its partials, instead of scanning the dataframe. Means are
+    derived from sums and counts so they stay exact.
+
+    Rollups are built lazily for the dimensions queries need, or at construction for all
+    dimensions, and evicted least recently used first when they exceed the memory budget.
+    The cube is safe to share across sessions, e.g. with st.cache_resource.
+
+    Attributes
+    ----------
+    df : DataFrame
+        The dataframe that is aggregated.
+    dimensions : list
+        Columns of df the rollups can group and filter by.
+    numerics : list
+        Columns of df that are aggregated.
+    aggregation : str
+        One of 'sum', 'mean', 'min', 'max' or 'count'.
+    max_bytes : int
+        Memory budget of all rollups in bytes.
+    """
+
+    def __init__(self, df, dimensions, numerics, aggregation="sum", max_bytes=256 * 2**20, eager=False):
+        """
+        Constructs the cube, building the rollup over all dimensions if eager is set.
+
+        Parameters
+        ----------
+            df : DataFrame
+                The dataframe that is aggregated.
+            dimensions : list of str
+                Columns of df the rollups can group and filter by, usually the filters.
+            numerics : list of str
+                Columns of df that are aggregated.
+            aggregation : str, optional
+                One of 'sum', 'mean', 'min', 'max' or 'count'. Default is 'sum'.
+            max_bytes : int, optional
+                Memory budget of all rollups in bytes.
+            eager : bool, optional
+                If True, the rollup over all dimensions is built at construction.
+        """
+        if aggregation not in PARTIALS:
+            raise StreamlitAPIException(
+                "aggregation must be either 'sum', 'mean', 'min', 'max' or 'count'"
+            )
+        self.df = df
+        self.dimensions = list(dimensions)
+        self.numerics = list(numerics)
+        self.aggregation = aggregation
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._rollups = OrderedDict()
+        self._lock = threading.Lock()
+        if eager:
+            self.rollup(self.dimensions)
+
+    def build(self, dimensions, df=None):
+        """Groups df, or the given rows, by the given dimensions and computes the partial aggregates of the numerics."""
+        partials = PARTIALS[self.aggregation]
+        df = self.df if df is None else df
+        rollup = df.groupby(dimensions, dropna=False, sort=False, observed=True)[self.numerics].agg(partials)
+        rollup.columns = [f"{column}__{partial}" for column, partial in rollup.columns]
+        return rollup.reset_index()
+
+    def answers(self, columns, numerics, aggregation):
+        """
+        Returns True if the rollups can answer an aggregation of numerics grouped or filtered by columns.
+
+        Parameters
+        ----------
+            columns : list of str
+                Columns grouped by and filtered on.
+            numerics : list of str
+                Columns that are aggregated.
+            aggregation : str
+                How the numerics are aggregated.
+        """
+        return (
+            aggregation == self.aggregation
+            and set(columns) <= set(self.dimensions)
+            and set(numerics) <= set(self.numerics)
+        )
+
+    def rollup(self, dimensions):
+        """
+        Returns the smallest rollup covering the given dimensions, building it if none exists.
+
+        Parameters
+        ----------
+            dimensions : list of str
+                Dimensions the rollup must contain.
+
+        Returns
+        -------
+            DataFrame
+                The rollup, with one column per dimension and per partial aggregate.
+
+        Exceptions
+        ----------
+        Raises StreamlitAPIException if a column is not among the dimensions of the cube.
+        """
+        needed = frozenset(dimensions)
+        if not needed <= set(self.dimensions):
+            raise StreamlitAPIException(
+                f"columns {sorted(needed - set(self.dimensions))} are not dimensions of the cube"
+            )
+        with self._lock:
+            covering = [key for key in self._rollups if needed <= key]
+            if covering:
+                key = min(covering, key=lambda key: len(self._rollups[key][0]))
+                self._rollups.move_to_end(key)
+                return self._rollups[key][0]
+
+        ordered = [dimension for dimension in self.dimensions if dimension in needed]
+        rollup = self.build(ordered)
+        size = int(rollup.memory_usage(deep=True).sum())
+        if size > self.max_bytes:
+            return rollup
+
+        with self._lock:
+            if needed not in self._rollups:
+                self._rollups[needed] = (rollup, size)
+                self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted_size) = self._rollups.popitem(last=False)
+                self.nbytes -= evicted_size
+        return rollup
+
+    def append(self, rows, df=None):
+        """
+        Returns the cube of df with rows appended, updating its rollups from the new rows only.
+
+        Each rollup is combined with the rollup of the new rows by re-aggregating their partials,
+        so no rollup is rebuilt from df. The cube itself is not modified.
+
+        Parameters
+        ----------
+            rows : DataFrame
+                The new rows, with the dimensions and numerics of df.
+            df : DataFrame, optional
+                df with the rows appended, if already built, e.g. by FilterIndex.append().
+
+        Returns
+        -------
+            AggregationCube
+                The cube over the dataframe with the new rows appended.
+        """
+        if df is None:
+            df = pd.concat([self.df, rows], ignore_index=isinstance(self.df.index, pd.RangeIndex))
+        cube = AggregationCube(df, self.dimensions, self.numerics, self.aggregation, self.max_bytes)
+        with self._lock:
+            rollups = list(self._rollups.items())
+        for key, (rollup, _) in rollups:
+            ordered = [dimension for dimension in self.dimensions if dimension in key]
+            combined = (
+                pd.concat([rollup, self.build(ordered, rows)], ignore_index=True)
+                .groupby(ordered, dropna=False, sort=False, observed=True)
+                .agg(
+                    {
+                        f"{column}__{partial}": REAGGREGATE[partial]
+                        for column in self.numerics
+                        for partial in PARTIALS[self.aggregation]
+                    }
+                )
+                .reset_index()
+            )
+            size = int(combined.memory_usage(deep=True).sum())
+            cube._rollups[key] = (combined, size)
+            cube.nbytes += size
+        while cube.nbytes > cube.max_bytes:
+            _, (_, evicted_size) = cube._rollups.popitem(last=False)
+            cube.nbytes -= evicted_size
+        return cube
+
+    def query(self, selections, group_by):
+        """
+        Aggregates the numerics by the given columns over the rows matching the selections.
+
+        Parameters
+        ----------
+            selections : dict
+                Dictionary with dimension names as keys and selected values as values. Empty
+                selections do not restrict the rows.
+            group_by : list of str
+                Dimensions to group by.
+
+        Returns
+        -------
+            DataFrame
+                One row per group, sorted by the group columns, with the group columns followed
+                by the aggregated numerics.
+
+        Exceptions
+        ----------
+        Raises StreamlitAPIException if a grouped or selected column is not a dimension of the cube.
+        """
+        active = {key: values for key, values in selections.items() if values}
+        rollup = self.rollup(list(group_by) + [key for key in active if key not in group_by])
+
+        mask = None
+        for key, values in active.items():
+            matches = rollup[key].isin(values)
+            mask = matches if mask is None else mask & matches
+        if mask is not None:
+            rollup = rollup[mask]
+
+        grouped = rollup.groupby(list(group_by))
+        result = pd.DataFrame(
+            {
+                f"{column}__{partial}": grouped[f"{column}__{partial}"].agg(REAGGREGATE[partial])
+                for column in self.numerics
+                for partial in PARTIALS[self.aggregation]
+            }
+        )
+        for column in self.numerics:
+            if self.aggregation == "mean":
+                result[column] = result[f"{column}__sum"] / result[f"{column}__count"]
+            else:
+                result[column] = result[f"{column}__{self.aggregation}"]
+        return result[self.numerics].reset_index()
+
+    def stats(self):
+        """
+        Returns the rollups held by the cube.
+
+        Returns
+        -------
+            dict
+                Dictionary with the keys 'rollups' (list of dimension lists), 'rows' and 'bytes'.
+        """
+        with self._lock:
+            return {
+                "rollups": [sorted(key) for key in self._rollups],
+                "rows": sum(len(rollup) for rollup, _ in self._rollups.values()),
+                "bytes": self.nbytes,
+            }
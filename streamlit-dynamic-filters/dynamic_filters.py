@@ -1,5 +1,23 @@
+import contextlib
+
+import numpy as np
+import pandas as pd
 import streamlit as st
 from streamlit.errors import StreamlitAPIException
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from .cache import estimate_size, fingerprint
+from .cube import PARTIALS
+from .engine import FilterEngine, FilterIndex, sort_values
+
+
+# the indexes of the last dataframes filtered in the process; older ones are dropped first
+@st.cache_resource(show_spinner=False, max_entries=16)
+def shared_filter_index(key, _df, _filters, _ranges, _texts, _dimensions, _index_path=None, _version=None):
+    """Returns the FilterIndex of the process for a key built from the fingerprints, or the version, of the data and the filters."""
+    if _index_path is not None:
+        return FilterIndex.open(_index_path, _df, _filters, _ranges, _texts, _dimensions, _version)
+    return FilterIndex(_df, _filters, _ranges, _texts, _dimensions, _version)
 
 
 class DynamicFilters:
@@ -14,6 +32,33 @@ class DynamicFilters:
         The dataframe on which filters are applied.
     filters : dict
         Dictionary with filter names as keys and their selected values as values.
+    data : FilterIndex
+        The dataframe and the value indexes, possibly shared with other sessions.
+    engine : FilterEngine
+        The filtering logic, evaluating the selections held in session state.
+    shared : bool
+        True if data is shared by all sessions of the process.
+    index : dict
+        Dictionary with filter names as keys and the ColumnIndex of their column, the
+        SortedIndex of range filters, the TextIndex of contains filters or the LinkedIndex of
+        filters on dimension columns, as values.
+    ranges : set
+        Names of the filters selecting a range of values instead of a list.
+    texts : set
+        Names of the filters selecting the values that contain a query.
+    dimensions : dict
+        Dictionary with key columns of df as keys and the dimension dataframes they refer to as values.
+    linked : dict
+        Dictionary with the names of the filters on dimension columns as keys and their key columns as values.
+    cache : FilterCache or None
+        Cache of options and filtered rows shared across sessions.
+    profiler : FilterProfiler or None
+        Instrumentation recording the stages of every run.
+    background : BackgroundResults or None
+        Thread pool computing the rows rendered by display_df(), keyed by selection state.
+    presence : dict
+        Dictionary with filter names as keys and boolean arrays over the value codes of the
+        last computed options as values.
 
     Methods
     -------
@@ -21,26 +66,235 @@ class DynamicFilters:
         Initializes the session state with filters if not already set.
     filter_df(except_filter=None):
         Returns the dataframe filtered based on session state excluding the specified filter.
-    display():
+    filtered_positions(except_filters=()):
+        Returns the row positions matching session state excluding the specified filters.
+    display(location=None, num_columns=0, gap='small', use_callbacks=False, fragment=False, **kwargs):
         Renders the dynamic filters and the filtered dataframe in Streamlit.
     """
 
-    def __init__(self, df, filters, filters_name="filters"):
+    def __init__(
+        self,
+        df,
+        filters,
+        filters_name="filters",
+        cache=None,
+        high_cardinality=None,
+        profiler=None,
+        show_counts=False,
+        order_by="label",
+        hide_empty=True,
+        max_workers=None,
+        ranges=None,
+        texts=None,
+        dimensions=None,
+        shared=True,
+        row_sets="masks",
+        background=None,
+        index_path=None,
+        version=None,
+    ):
         """
         Constructs all the necessary attributes for the DynamicFilters object.
 
         Parameters
         ----------
-            df : DataFrame
-                The dataframe on which filters are applied.
+            df : DataFrame or FilterIndex
+                The dataframe on which filters are applied, or a FilterIndex built beforehand
+                for these filters, whose ranges, texts and dimensions are then used.
             filters : list of filters
                 List of columns names in df for which filters are to be created.
             filters_name: str, optional
                 Name of the filters object in session state.
+            cache: FilterCache, optional
+                Cache shared across sessions for options and filtered rows. Disabled by default.
+            high_cardinality: dict, optional
+                Dictionary with filter names as keys and a maximum number of options as values.
+                These filters only offer the values with the most rows, plus a search box to find
+                the others.
+            profiler: FilterProfiler, optional
+                Instrumentation recording timings and counters of every run. Disabled by default.
+            show_counts: bool, optional
+                If True, every option is labelled with the number of rows it would return given
+                the selections of the other filters, e.g. "EMEA (12,304)". Default is False.
+            order_by: str, optional
+                Order of the options: 'label' (alphabetical) or 'count' (descending row count).
+                Default is 'label'.
+            hide_empty: bool, optional
+                If False, values without rows given the selections of the other filters are still
+                offered, with a count of 0. Default is True.
+            max_workers: int, optional
+                If set, the masks, counts, options and valid selections of the filters are computed
+                concurrently on a thread pool of this size, shared by all sessions. The widgets are
+                still rendered in order. Default computes them one filter after the other.
+            ranges: list of str, optional
+                Filters among filters that select a range of values with a slider, or a date range
+                input for datetime columns, instead of a multiselect. Their columns must be numeric
+                or datetime. The bounds offered follow the selections of the other filters.
+            texts: list of str, optional
+                Filters among filters that select the rows whose value contains a query typed in a
+                text input, ignoring case, instead of a multiselect. A trigram index over the
+                distinct values of their columns is built here, so a query never scans the rows.
+            dimensions: dict, optional
+                Dictionary with key columns of df as keys and dimension dataframes as values, for
+                data split into a fact table and dimension tables. A dimension holds one row per
+                key, with the key in a column of the same name or as its index. Filters that are
+                not columns of df are looked up among the columns of the dimensions, and filter
+                the rows of df through the key column, without merging the dimension into df.
+            shared: bool, optional
+                If True, df and the indexes are built once per process with st.cache_resource,
+                keyed by the fingerprints of df, the dimensions and the filter arguments, and
+                shared read-only by all sessions and script runs, so a rerun only fingerprints df,
+                or nothing if version is given or df is the same object as in the previous run.
+                The indexes of the last 16 dataframes are kept. If False, they are built for every
+                instance, i.e. on every script run. Default is True.
+            row_sets: str, optional
+                How the rows matching the selections are combined while computing the options
+                and the filtered rows: 'masks' (boolean masks, one byte per row) or 'bitmaps'
+                (compressed RowSets). A RowSet stores the sorted positions of a selective set and
+                a bitmap of one bit per row otherwise, so 'bitmaps' suits tables with tens of
+                millions of rows and many concurrent sessions. 'auto' picks RowSets for the
+                selection states holding a selection of less than 1/64 of the rows, counted
+                from the runs of its values, and masks for the others. Default is 'masks'.
+            background: BackgroundResults, optional
+                If set, the rows rendered by display_df() are computed on its thread pool, keyed
+                by selection state, while the script run waits yielding to Streamlit. A click
+                stops the waiting run, and the computation of the state it replaces is cancelled
+                unless it has started, so a burst of clicks only waits for its last state. Works
+                best with use_callbacks, which saves the extra script run. Default computes them
+                in the script run.
+            index_path: str, optional
+                Directory of on-disk artifacts of the indexes, see FilterIndex.open(). The indexes
+                are memory-mapped from the artifact of df and the filter arguments, which is
+                built and saved first if missing, so a new process does not build them again.
+                It implies shared: the artifact is opened once per process with st.cache_resource
+                and shared by all sessions, instead of being read again on every rerun. Only
+                write artifacts to a directory trusted by the app. Default builds them in memory.
+            version: hashable, optional
+                Version of df and the dimensions, e.g. the modification time of their source or
+                the date of the query loading them. It identifies the data in the keys of shared,
+                cache, background and index_path instead of fingerprints, which hash every row
+                of every new dataframe, e.g. every copy returned by st.cache_data. It must change
+                whenever the data does. Default uses fingerprints, in which case df must not be
+                modified in place after the filters are constructed.
+
+        Exceptions
+        ----------
+        Raises StreamlitAPIException if order_by is neither 'label' nor 'count', if row_sets is
+        neither 'masks', 'bitmaps' nor 'auto', if a range or contains filter is not among
+        filters, if a filter is both, if the column of a range filter is neither numeric nor
+        datetime, if a filter is neither a column of df nor of exactly one dimension, or if a
+        filter is not indexed by the FilterIndex passed as df.
+        """
+        if order_by not in ["label", "count"]:
+            raise StreamlitAPIException("order_by must be either 'label' or 'count'")
+        if isinstance(df, FilterIndex):
+            if not set(filters) <= set(df.filters):
+                raise StreamlitAPIException("filters must be among the filters of the FilterIndex")
+            self.data = df
+        elif shared or index_path is not None:
+            if version is None:
+                data = (fingerprint(df),) + tuple(
+                    (column, fingerprint(dimension)) for column, dimension in (dimensions or {}).items()
+                )
+            else:
+                data = ("version", version, tuple(dimensions or {}))
+            key = (
+                data,
+                tuple(filters),
+                tuple(sorted(ranges or [])),
+                tuple(sorted(texts or [])),
+                index_path,
+            )
+            self.data = shared_filter_index(key, df, list(filters), ranges, texts, dimensions, index_path, version)
+        else:
+            self.data = FilterIndex(df, filters, ranges, texts, dimensions, version)
+        self.init_filters(
+            filters,
+            filters_name,
+            data=self.data,
+            shared=shared or index_path is not None or isinstance(df, FilterIndex),
+            cache=cache,
+            high_cardinality=high_cardinality,
+            profiler=profiler,
+            show_counts=show_counts,
+            order_by=order_by,
+            hide_empty=hide_empty,
+            max_workers=max_workers,
+            row_sets=row_sets,
+            background=background,
+        )
+
+    def init_filters(
+        self,
+        filters,
+        filters_name="filters",
+        data=None,
+        shared=False,
+        cache=None,
+        high_cardinality=None,
+        profiler=None,
+        show_counts=False,
+        order_by="label",
+        hide_empty=True,
+        max_workers=None,
+        row_sets="masks",
+        background=None,
+    ):
         """
-        self.df = df
+        Sets the attributes of the filters and initializes the session state.
+
+        Called by the constructors of every backend. Backends querying their source instead of
+        a FilterIndex, such as DynamicFiltersDuckDB, pass no data: they get no engine, no df and
+        no indexes, and override the methods that use them.
+
+        Parameters
+        ----------
+            filters : list of str
+                Names of the filters.
+            filters_name : str, optional
+                Name of the filters object in session state.
+            data : FilterIndex, optional
+                The dataframe and the value indexes of the filters.
+            shared : bool, optional
+                True if data is shared by all sessions of the process.
+            cache, high_cardinality, profiler, show_counts, order_by, hide_empty : optional
+                See __init__().
+            max_workers, row_sets, background : optional
+                See __init__().
+        """
+        self.data = data
+        self.shared = shared
+        self.df = data.df if data is not None else None
+        self.ranges = data.ranges if data is not None else set()
+        self.texts = data.texts if data is not None else set()
+        self.dimensions = data.dimensions if data is not None else {}
+        self.linked = data.linked if data is not None else {}
+        self.index = data.index if data is not None else {}
         self.filters_name = filters_name
+        self.cache = cache
+        self.profiler = profiler
+        self.show_counts = show_counts
+        self.order_by = order_by
+        self.hide_empty = hide_empty
+        self.max_workers = max_workers
+        self.background = background
+        self.option_counts = {}
+        self.high_cardinality = dict(high_cardinality or {})
         self.filters = {filter_name: [] for filter_name in filters}
+        self.range_bounds = {}
+        self.presence = {}
+        self.engine = None
+        if data is not None:
+            self.engine = FilterEngine(
+                data,
+                cache=cache,
+                profiler=profiler,
+                hide_empty=hide_empty,
+                high_cardinality=self.high_cardinality,
+                count_options=show_counts or order_by == "count",
+                max_workers=max_workers,
+                row_sets=row_sets,
+            )
         self.check_state()
 
     def check_state(self):
@@ -74,15 +328,626 @@ class DynamicFilters:
         Returns
         -------
             DataFrame
-                Filtered dataframe.
+                Filtered dataframe. Without active selections it is a shallow copy of df, which
+                may be shared by every session: columns can be added or replaced, but values of
+                existing columns must not be modified in place, e.g. with .loc, unless pandas
+                copy-on-write is enabled, as it is by default from pandas 3.
+        """
+        return self.take_rows(self.filtered_positions([except_filter]))
+
+    def selections(self):
+        """Returns the selections of the filters held in session state."""
+        return st.session_state[self.filters_name]
+
+    def column_index(self, filter_name):
+        """Returns the value index of a column, building it on first use for columns outside of filters."""
+        return self.engine.column_index(filter_name)
+
+    def memory_report(self):
+        """
+        Returns the memory held by the filters, split into the data shared by all sessions and the current session.
+
+        The shared part is the dataframe, the dimensions and the indexes, plus the entries of the
+        cache and the rollups of the cube when they are configured. It is only shared across
+        sessions when shared is set or a FilterIndex is passed as df. The session part is what
+        the session state holds under the keys of the filters, see session_keys(): the
+        selections, the widget values and the row positions kept across reruns. References to
+        the shared data are not counted in it.
+
+        Returns
+        -------
+            dict
+                Dictionary with the keys 'shared' (bytes per shared component), 'session' (bytes
+                per session state key), 'shared_bytes' and 'session_bytes' (totals), and
+                'shared_across_sessions' (True if the data is built once per process).
+        """
+        shared = self.data.nbytes() if self.data is not None else {}
+        if self.cache is not None:
+            shared["cache"] = self.cache.stats()["bytes"]
+        if getattr(self, "cube", None) is not None:
+            shared["cube"] = self.cube.stats()["bytes"]
+        skip = [self.df, *self.dimensions.values()]
+        session = {
+            key: estimate_size(st.session_state[key], skip)
+            for key in self.session_keys()
+            if key in st.session_state
+        }
+        return {
+            "shared": shared,
+            "session": session,
+            "shared_bytes": sum(shared.values()),
+            "session_bytes": sum(session.values()),
+            "shared_across_sessions": self.shared,
+        }
+
+    def session_keys(self):
+        """Returns the session state keys the filters may write: selections, widget values and states kept across reruns."""
+        keys = [self.filters_name]
+        keys += [self.filters_name + filter_name for filter_name in self.filters]
+        keys += [self.search_key(filter_name) for filter_name in self.high_cardinality]
+        keys += [
+            f"{self.filters_name}{suffix}"
+            for suffix in ["_sort", "_cascade", "_page", "_page_selections", "_sort_by", "_descending"]
+        ]
+        return keys
+
+    def append(self, rows):
+        """
+        Appends rows to the data, updating the indexes from the new rows only.
+
+        The selections in session state stay valid, since appending only adds values, and the
+        options follow the new rows on the next run. Rows cached per session for the previous
+        data are recomputed. A shared FilterIndex is not modified: the new one is returned, to
+        be shared in its place.
+
+        Parameters
+        ----------
+            rows : DataFrame
+                The new rows, with the columns of df.
+
+        Returns
+        -------
+            FilterIndex
+                The data with the new rows appended.
+        """
+        self.data = self.engine.append(rows)
+        self.df = self.data.df
+        self.index = self.data.index
+        return self.data
+
+    def warm_up(self, states=None, per_filter=10):
+        """
+        Precomputes the options and rows of the most common selection states into the cache.
+
+        Call it once per process, e.g. in the function building the shared cache, so the first
+        sessions after a deploy are answered from the cache, see FilterEngine.warm_up().
+
+        Parameters
+        ----------
+            states : list of dict, optional
+                Selection states to precompute. Default is the state without selections and the
+                selections of one of the per_filter most frequent values of a filter.
+            per_filter : int, optional
+                Number of single-value selections per filter of the default states.
+
+        Returns
+        -------
+            int
+                Number of states precomputed.
+
+        Exceptions
+        ----------
+        Raises StreamlitAPIException if no cache is configured.
+        """
+        return self.engine.warm_up(states, list(self.filters), per_filter)
+
+    def filtered_positions(self, except_filters=()):
+        """
+        Looks up the row positions matching the session state values except for the specified filters.
+
+        Parameters
+        ----------
+            except_filters : list of str, optional
+                Filter names that should be excluded from the current filtering operation.
+
+        Returns
+        -------
+            ndarray or None
+                Sorted row positions, or None if no filter restricts the rows.
+        """
+        return self.engine.positions(self.selections(), except_filters)
+
+    def selection_key(self, except_filters=()):
+        """Returns the active session state selections except for the specified filters in a hashable form."""
+        return self.engine.selection_key(self.selections(), except_filters)
+
+    def map_filters(self, func, filter_names=None):
+        """
+        Applies a function to every filter, on the shared thread pool if max_workers is set.
+
+        No script run context is attached to the pool threads, so the function must not read
+        the session state or call Streamlit: read the selections beforehand and pass them in,
+        see FilterEngine.map_filters(). Most of the work per filter is NumPy code that releases
+        the GIL.
+
+        Parameters
+        ----------
+            func : callable
+                Function taking a filter name.
+            filter_names : list of str, optional
+                Filters to apply the function to. Default is all filters.
+
+        Returns
+        -------
+            dict
+                Dictionary with filter names as keys and the results of func as values, in the
+                order of filter_names.
+        """
+        if filter_names is None:
+            filter_names = list(self.selections())
+        if self.engine is None:
+            return {filter_name: func(filter_name) for filter_name in filter_names}
+        return self.engine.map_filters(func, filter_names)
+
+    def profile_stage(self, name, filter_name=None):
+        """
+        Returns a context manager timing a stage in the profiler, starting a run if none is in progress.
+
+        Without a profiler it does nothing.
+        """
+        if self.profiler is None:
+            return contextlib.nullcontext()
+        if self.profiler.current_run() is None:
+            self.profiler.start_run(self.filters_name)
+        return self.profiler.stage(name, filter_name)
+
+    def profile_count(self, **counters):
+        """Increments counters of the profiler run in progress, if any."""
+        if self.profiler is not None:
+            self.profiler.add(**counters)
+
+    def start_profile(self):
+        """Starts a profiler run, if a profiler is configured."""
+        if self.profiler is not None:
+            self.profiler.start_run(self.filters_name)
+
+    def finish_profile(self, rerun=False):
+        """Finishes the profiler run in progress, if a profiler is configured."""
+        if self.profiler is not None:
+            self.profiler.finish_run(rerun)
+
+    def take_rows(self, positions):
+        """Returns the rows of df at the given positions, or all rows if positions is None, see FilterEngine.take_rows()."""
+        return self.engine.take_rows(positions)
+
+    def rows_task(self):
+        """Returns a function computing the rows rendered by display_df() for the current selections, without reading the session state."""
+        selections = {key: list(values) for key, values in self.selections().items()}
+        return lambda: self.engine.rows(selections)
+
+    def background_result(self, name, compute):
+        """
+        Returns the result of a computation over the current selections, on the background thread pool if one is configured.
+
+        The result is keyed by the fingerprint or version of the data, see
+        FilterIndex.fingerprint(), the rendered columns, the name and the active selections, so
+        reruns and sessions on the same data and selections reuse it even when each run builds
+        its own FilterIndex. It is awaited while reading the session state, so that a newer
+        click stops the run. Without background results compute runs in the script run.
+
+        Parameters
+        ----------
+            name : hashable
+                What is computed, e.g. 'rows'.
+            compute : callable
+                Function without arguments that does not read the session state.
+        """
+        if self.background is None:
+            return compute()
+        ctx = get_script_run_ctx(suppress_warning=True)
+        owner = (ctx.session_id if ctx is not None else None, self.filters_name)
+        key = (self.data.fingerprint(), tuple(self.column_names()), name, self.selection_key())
+        with st.spinner("Updating results..."):
+            return self.background.result(owner, key, compute, idle=self.selections)
+
+    def result_positions(self):
+        """Returns the row positions rendered by display_df(), or None for all rows."""
+        return self.filtered_positions()
+
+    def column_names(self):
+        """Returns the names of the columns rendered by display_df()."""
+        return list(self.df.columns)
+
+    def column_values(self, column_name):
+        """Returns a column of the data over all rows, used to sort pages."""
+        return self.df[column_name]
+
+    def count_rows(self):
+        """Returns the number of rows matching the session state values."""
+        positions = self.result_positions()
+        return len(self.df) if positions is None else len(positions)
+
+    def sorted_positions(self, sort_by, descending=False):
+        """
+        Returns the matching row positions ordered by a column.
+
+        Only the sort column is gathered and sorted; the other columns stay untouched. The order
+        is kept in session state per selection, so paging through it does not sort again.
+
+        Parameters
+        ----------
+            sort_by : str
+                The column to sort by. Missing values come last.
+            descending : bool, optional
+                If True, the rows are sorted in descending order.
+
+        Returns
+        -------
+            ndarray
+                Row positions in sort order.
+        """
+        key = (self.selection_key(), sort_by, descending)
+        cache_name = f"{self.filters_name}_sort"
+        cache = st.session_state.get(cache_name)
+        if cache is not None and cache["df"] is self.df and cache["key"] == key:
+            return cache["positions"]
+
+        positions = self.result_positions()
+        values = self.column_values(sort_by)
+        if positions is not None:
+            values = values.take(positions)
+        order = (
+            values.reset_index(drop=True)
+            .sort_values(ascending=not descending, kind="stable", na_position="last")
+            .index.to_numpy()
+        )
+        if positions is not None:
+            order = positions[order]
+        st.session_state[cache_name] = {"df": self.df, "key": key, "positions": order}
+        return order
+
+    def page_rows(self, start, stop, sort_by=None, descending=False):
+        """
+        Returns the matching rows between two positions of the result, optionally sorted.
+
+        Parameters
+        ----------
+            start : int
+                Position of the first row of the page in the result.
+            stop : int
+                Position after the last row of the page in the result.
+            sort_by : str, optional
+                The column the result is sorted by. Default is the order of df.
+            descending : bool, optional
+                If True, the result is sorted in descending order.
+
+        Returns
+        -------
+            DataFrame
+                The rows of the page.
+        """
+        if sort_by is not None:
+            return self.take_rows(self.sorted_positions(sort_by, descending)[start:stop])
+        positions = self.result_positions()
+        if positions is None:
+            positions = np.arange(start, min(stop, len(self.df)))
+        else:
+            positions = positions[start:stop]
+        return self.take_rows(positions)
+
+    def sample_rows(self, n):
+        """
+        Returns a random sample of at most n matching rows, in the order of df.
+
+        The sample is drawn with a fixed seed, so it is stable across reruns for a given selection.
+        """
+        positions = self.result_positions()
+        total = len(self.df) if positions is None else len(positions)
+        picks = np.sort(np.random.default_rng(0).choice(total, size=min(n, total), replace=False))
+        return self.take_rows(picks if positions is None else positions[picks])
+
+    def filter_masks(self):
+        """
+        Computes for every filter the mask of rows matching all the other filters, see FilterEngine.masks().
+
+        Returns
+        -------
+            dict
+                Dictionary with filter names as keys and boolean masks as values. A mask is None
+                if no other filter restricts the rows.
+        """
+        return self.engine.masks(self.selections())
+
+    def filter_counts(self):
+        """
+        Returns the row counts of the values of every filter based on the selections of the other filters.
+
+        Returns
+        -------
+            dict
+                Dictionary with filter names as keys and row counts over the value codes as values.
+        """
+        return self.engine.counts(self.selections())
+
+    def filter_options(self):
+        """
+        Returns the available options of every filter based on the selections of the other filters.
+
+        Returns
+        -------
+            dict
+                Dictionary with filter names as keys and lists of options as values.
+        """
+        return self.options_from_counts(self.filter_counts())
+
+    def options_from_counts(self, filter_counts):
+        """
+        Decodes the options of every filter from the row counts of its values, see FilterEngine.options().
+
+        The high-cardinality filters get the values matching their search boxes. The values a
+        selection may keep and the row counts of the options are kept for the widgets.
+
+        Parameters
+        ----------
+            filter_counts : dict
+                Dictionary with filter names as keys and row counts over the value codes as values.
+
+        Returns
+        -------
+            dict
+                Dictionary with filter names as keys and lists of options as values.
+        """
+        queries = {
+            filter_name: st.session_state.get(self.search_key(filter_name), "") for filter_name in self.high_cardinality
+        }
+        options, self.presence, self.option_counts = self.engine.options(filter_counts, self.selections(), queries)
+        return options
+
+    def search_key(self, filter_name):
+        """Returns the session state key of the search box of a high-cardinality filter."""
+        return f"{self.filters_name}{filter_name}_search"
+
+    def valid_selections(self, filter_name, options, selected=None):
+        """
+        Returns the selections of a filter that are among its options, see FilterEngine.valid_selections().
+
+        selected defaults to the selections in session state; pass it when called from map_filters().
+        """
+        if selected is None:
+            selected = self.selections()[filter_name]
+        return self.engine.valid_selections(filter_name, selected, options, self.presence)
+
+    def settle_selections(self):
+        """
+        Removes selected values that are no longer among the options until no selection changes.
+
+        Removing a value from one filter can narrow the options of the others, so the options are
+        recomputed until they are stable. This replaces the extra script run of st.rerun() when the
+        selections are kept up to date by widget callbacks.
+
+        Returns
+        -------
+            dict
+                Dictionary with filter names as keys and lists of options as values.
+        """
+        while True:
+            filter_options = self.filter_options()
+            selections = self.selections()
+            filter_selections = self.map_filters(
+                lambda filter_name: self.valid_selections(
+                    filter_name, filter_options[filter_name], selections[filter_name]
+                ),
+                list(filter_options),
+            )
+            changed = False
+            for filter_name, valid_selections in filter_selections.items():
+                if valid_selections != st.session_state[self.filters_name][filter_name]:
+                    st.session_state[self.filters_name][filter_name] = valid_selections
+                    changed = True
+            if not changed:
+                return filter_options
+
+    def sort_options(self, filter_name, options):
+        """
+        Sorts the options of a filter by label, missing values last, then by descending row count if order_by is 'count'.
+
+        When all the values of the filter are offered, as in the default state, their label order
+        is taken from the FilterIndex, which keeps it across runs and sessions.
+        """
+        index = self.index.get(filter_name)
+        if index is not None and len(options) == len(index.values):
+            options = list(self.data.sorted_options(filter_name))
+        else:
+            options = sort_values(options)
+        if self.order_by == "count" and filter_name in self.option_counts:
+            counts = self.option_counts[filter_name]
+            options.sort(key=lambda option: -counts.get(option, 0))
+        return options
+
+    def option_label(self, filter_name):
+        """Returns the function formatting the options of a filter, with their row counts if show_counts is set."""
+        if not self.show_counts or filter_name not in self.option_counts:
+            return str
+        counts = self.option_counts[filter_name]
+        return lambda option: f"{option} ({counts.get(option, 0):,})"
+
+    def update_selection(self, filter_name):
+        """Copies the value of a filter's widget into the session state. Used as on_change callback."""
+        value = st.session_state[self.filters_name + filter_name]
+        if filter_name in self.ranges:
+            value = self.range_selection(filter_name, value)
+        elif filter_name in self.texts:
+            value = [value] if value else []
+        st.session_state[self.filters_name][filter_name] = value
+
+    def range_selection(self, filter_name, value):
+        """
+        Converts the value of a range widget into the selection of a range filter.
+
+        A range covering all the bounds offered does not restrict the rows and is stored as an
+        empty selection, so it follows the bounds when the other filters change. Date ranges span
+        whole days, and a date range input with a single date keeps the previous selection.
+        """
+        selected = st.session_state[self.filters_name][filter_name]
+        bounds = self.range_bounds.get(filter_name, [])
+        if len(value) != 2:
+            return selected
+        low, high = value
+        if self.index[filter_name].dates:
+            low = pd.Timestamp(low)
+            high = pd.Timestamp(high) + pd.Timedelta(days=1) - pd.Timedelta(1, unit="ns")
+        if selected and [low, high] == list(selected):
+            return selected
+        if bounds and low <= bounds[0] and high >= bounds[1]:
+            return []
+        return [low, high]
+
+    def range_input(self, filter_name, bounds, use_callbacks=False):
+        """
+        Renders the slider, or the date range input for datetime columns, of a range filter.
+
+        The widget spans the bounds of the values available given the other filters, widened to
+        the current selection.
+
+        Parameters
+        ----------
+            filter_name : str
+                The range filter to render.
+            bounds : list
+                Smallest and largest value available, or an empty list if no row is available.
+            use_callbacks : bool, optional
+                If True, the widget value is set from the session state and changes are written
+                back by the on_change callback.
+
+        Returns
+        -------
+            list
+                The selected bounds, or an empty list if the range does not restrict the rows.
+        """
+        widget_key = self.filters_name + filter_name
+        label = f"Select {filter_name}"
+        selected = st.session_state[self.filters_name][filter_name]
+        self.range_bounds[filter_name] = bounds
+        if not bounds and not selected:
+            st.caption(f"{label}: no values")
+            return selected
+        low, high = bounds if bounds else selected
+        if selected:
+            low, high = min(low, selected[0]), max(high, selected[1])
+        value = tuple(selected) if selected else (low, high)
+        if self.index[filter_name].dates:
+            low, high = low.date(), high.date()
+            value = (value[0].date(), value[1].date())
+            widget = st.date_input
+        elif low == high:
+            st.caption(f"{label}: {low}")
+            return selected
+        else:
+            widget = st.slider
+        if use_callbacks:
+            st.session_state[widget_key] = value
+            value = widget(
+                label,
+                min_value=low,
+                max_value=high,
+                key=widget_key,
+                on_change=self.update_selection,
+                args=(filter_name,),
+            )
+        else:
+            value = widget(label, value=value, min_value=low, max_value=high, key=widget_key)
+        return self.range_selection(filter_name, value)
+
+    def text_input(self, filter_name, counts, use_callbacks=False):
+        """
+        Renders the text input of a contains filter, with the number of rows its query matches.
+
+        Parameters
+        ----------
+            filter_name : str
+                The contains filter to render.
+            counts : ndarray
+                Row counts over the value codes of the filter given the other filters.
+            use_callbacks : bool, optional
+                If True, the widget value is set from the session state and changes are written
+                back by the on_change callback.
+
+        Returns
+        -------
+            list
+                A list holding the query, or an empty list if no query is typed.
+        """
+        widget_key = self.filters_name + filter_name
+        selected = st.session_state[self.filters_name][filter_name]
+        label = f"Search {filter_name}"
+        if use_callbacks:
+            st.session_state[widget_key] = selected[0] if selected else ""
+            query = st.text_input(
+                label, key=widget_key, placeholder="Contains...", on_change=self.update_selection, args=(filter_name,)
+            )
+        else:
+            query = st.text_input(
+                label, value=selected[0] if selected else "", key=widget_key, placeholder="Contains..."
+            )
+        if query:
+            matched = int(counts[self.index[filter_name].match(query)].sum())
+            st.caption(f"{matched:,} matching rows")
+        return [query] if query else []
+
+    def multiselect(self, filter_name, options, use_callbacks=False):
+        """
+        Renders the multiselect widget of a filter and returns the selected values.
+
+        Range filters are rendered by range_input() and contains filters by text_input() instead.
+
+        Parameters
+        ----------
+            filter_name : str
+                The filter to render.
+            options : list
+                The available options of the filter.
+            use_callbacks : bool, optional
+                If True, the widget value is set from the session state and changes are written
+                back by the on_change callback, instead of passing the selection as default.
+
+        Returns
+        -------
+            list
+                The selected values.
         """
-        filtered_df = self.df.copy()
-        for key, values in st.session_state[self.filters_name].items():
-            if key != except_filter and values:
-                filtered_df = filtered_df[filtered_df[key].isin(values)]
-        return filtered_df
+        widget_key = self.filters_name + filter_name
+        with self.profile_stage("widgets", filter_name):
+            if filter_name in self.ranges:
+                return self.range_input(filter_name, options, use_callbacks)
+            if filter_name in self.texts:
+                return self.text_input(filter_name, options, use_callbacks)
+            with self.profile_stage("sort", filter_name):
+                options = self.sort_options(filter_name, options)
+            if filter_name in self.high_cardinality:
+                st.text_input(
+                    f"Search {filter_name}",
+                    key=self.search_key(filter_name),
+                    placeholder="Starts with...",
+                )
+            if use_callbacks:
+                st.session_state[widget_key] = st.session_state[self.filters_name][filter_name]
+                return st.multiselect(
+                    f"Select {filter_name}",
+                    options,
+                    format_func=self.option_label(filter_name),
+                    key=widget_key,
+                    on_change=self.update_selection,
+                    args=(filter_name,),
+                )
+            return st.multiselect(
+                f"Select {filter_name}",
+                options,
+                default=st.session_state[self.filters_name][filter_name],
+                format_func=self.option_label(filter_name),
+                key=widget_key,
+            )
 
-    def display_filters(self, location=None, num_columns=0, gap="small"):
+    def display_filters(self, location=None, num_columns=0, gap="small", use_callbacks=False):
         """
         Renders dynamic multiselect filters for user selection.
 
@@ -111,6 +976,11 @@ class DynamicFilters:
             - 'large': Maximum gap between columns.
             Default is 'small'.
 
+        use_callbacks : bool, optional
+            If True, selections are written to the session state by the widgets' on_change
+            callbacks before the script runs, so the options are up to date in a single pass
+            and no extra st.rerun() is needed. Default is False.
+
         Behavior:
         ---------
         - The function iterates through session-state filters.
@@ -120,7 +990,7 @@ class DynamicFilters:
             3. Updates the session state with the user's selection.
         - If any filter value changes, the application triggers an update to adjust other filter options based on the current selection.
         - If a user's previous selection is no longer valid based on the dataset, it's removed.
-        - If any filters are updated, the application will rerun for the changes to take effect.
+        - If any filters are updated, the application will rerun for the changes to take effect, unless use_callbacks is set.
 
         Exceptions:
         -----------
@@ -156,6 +1026,7 @@ class DynamicFilters:
                 "gap must be either 'small', 'medium' or 'large'"
             )
 
+        self.start_profile()
         filters_changed = False
 
         # initiate counter and max_value for columns
@@ -164,36 +1035,32 @@ class DynamicFilters:
             max_value = num_columns
             col_list = st.columns(num_columns, gap=gap)
 
+        with self.profile_stage("options"):
+            if use_callbacks:
+                filter_options = self.settle_selections()
+            else:
+                filter_options = self.filter_options()
+            selections = self.selections()
+            filter_selections = self.map_filters(
+                lambda filter_name: self.valid_selections(
+                    filter_name, filter_options[filter_name], selections[filter_name]
+                )
+            )
         for filter_name in st.session_state[self.filters_name].keys():
-            filtered_df = self.filter_df(filter_name)
-            options = filtered_df[filter_name].unique().tolist()
+            options = filter_options[filter_name]
 
             # Remove selected values that are not in options anymore
-            valid_selections = [
-                v
-                for v in st.session_state[self.filters_name][filter_name]
-                if v in options
-            ]
+            valid_selections = filter_selections[filter_name]
             if valid_selections != st.session_state[self.filters_name][filter_name]:
                 st.session_state[self.filters_name][filter_name] = valid_selections
                 filters_changed = True
 
             if location == "sidebar":
                 with st.sidebar:
-                    selected = st.multiselect(
-                        f"Select {filter_name}",
-                        sorted(options),
-                        default=st.session_state[self.filters_name][filter_name],
-                        key=self.filters_name + filter_name,
-                    )
+                    selected = self.multiselect(filter_name, options, use_callbacks)
             elif location == "columns" and num_columns > 0:
                 with col_list[counter - 1]:
-                    selected = st.multiselect(
-                        f"Select {filter_name}",
-                        sorted(options),
-                        default=st.session_state[self.filters_name][filter_name],
-                        key=self.filters_name + filter_name,
-                    )
+                    selected = self.multiselect(filter_name, options, use_callbacks)
 
                 # increase counter and reset to 1 if max_value is reached
                 counter += 1
@@ -201,24 +1068,131 @@ class DynamicFilters:
                 if counter == 0:
                     counter = 1
             else:
-                selected = st.multiselect(
-                    f"Select {filter_name}",
-                    sorted(options),
-                    default=st.session_state[self.filters_name][filter_name],
-                    key=self.filters_name + filter_name,
-                )
+                selected = self.multiselect(filter_name, options, use_callbacks)
 
             if selected != st.session_state[self.filters_name][filter_name]:
                 st.session_state[self.filters_name][filter_name] = selected
                 filters_changed = True
 
         if filters_changed:
+            self.finish_profile(rerun=True)
             st.rerun()
 
-    def display_df(self, **kwargs):
-        """Renders the filtered dataframe in the main area."""
-        # Display filtered DataFrame
-        st.dataframe(self.filter_df(), **kwargs)
+    def display_df(self, page_size=None, sample=None, **kwargs):
+        """
+        Renders the filtered dataframe in the main area.
+
+        Parameters
+        ----------
+        page_size : int, optional
+            If set, only one page of this many rows is rendered, with the total row count and
+            controls to pick the page and the sort column. Default renders all rows.
+        sample : int, optional
+            If set, a random sample of this many rows is rendered as a fast preview instead.
+        **kwargs
+            Additional keyword arguments passed to st.dataframe().
+
+        With background results, the rows are computed on their thread pool, see background_result().
+        """
+        with self.profile_stage("display_df"):
+            if page_size is None and sample is None:
+                # Display filtered DataFrame
+                st.dataframe(self.background_result("rows", self.rows_task()), **kwargs)
+            else:
+                self.display_page(page_size, sample, **kwargs)
+        self.finish_profile()
+
+    def display_page(self, page_size=None, sample=None, **kwargs):
+        """
+        Renders one page or a random sample of the filtered rows with the total row count.
+
+        Only the rendered rows are materialised, so the size of the rendered frame does not
+        depend on the number of matching rows. The page and sort controls are stored in session
+        state under the filters name. The first page is shown again whenever the selections
+        change, since the rows of the previous page number no longer follow from what was shown.
+
+        Parameters
+        ----------
+        page_size : int, optional
+            Number of rows per page. Default is 100.
+        sample : int, optional
+            If set, a random sample of this many rows is rendered instead of a page.
+        **kwargs
+            Additional keyword arguments passed to st.dataframe().
+
+        Exceptions
+        ----------
+        Raises StreamlitAPIException if page_size or sample is not a positive integer.
+        """
+        if page_size is None:
+            page_size = 100
+        if page_size < 1 or (sample is not None and sample < 1):
+            raise StreamlitAPIException("page_size and sample must be positive integers")
+
+        total = self.count_rows()
+        if sample is not None:
+            st.caption(f"Random sample of {min(sample, total):,} out of {total:,} rows")
+            st.dataframe(self.sample_rows(sample), **kwargs)
+            return
+
+        pages = max(1, -(-total // page_size))
+        page_key = f"{self.filters_name}_page"
+        selections_key = f"{self.filters_name}_page_selections"
+        selection_key = self.selection_key()
+        if st.session_state.get(selections_key) != selection_key:
+            st.session_state[selections_key] = selection_key
+            st.session_state[page_key] = 1
+        elif st.session_state.get(page_key, 1) > pages:
+            st.session_state[page_key] = pages
+
+        sort_column, order_column, page_column = st.columns(3)
+        with sort_column:
+            sort_by = st.selectbox(
+                "Sort by",
+                [None] + self.column_names(),
+                format_func=lambda option: "-" if option is None else str(option),
+                key=f"{self.filters_name}_sort_by",
+            )
+        with order_column:
+            descending = st.checkbox("Descending", key=f"{self.filters_name}_descending")
+        with page_column:
+            page = st.number_input("Page", min_value=1, max_value=pages, step=1, key=page_key)
+
+        start = (page - 1) * page_size
+        stop = min(start + page_size, total)
+        st.caption(f"Rows {min(start + 1, total):,}-{stop:,} of {total:,}")
+        st.dataframe(self.page_rows(start, stop, sort_by, descending), **kwargs)
+
+    def display(self, location=None, num_columns=0, gap="small", use_callbacks=False, fragment=False, **kwargs):
+        """
+        Renders the dynamic filters and the filtered dataframe.
+
+        Parameters
+        ----------
+        location, num_columns, gap, use_callbacks :
+            Passed to display_filters(). use_callbacks is always enabled when fragment is True.
+        fragment : bool, optional
+            If True, the filters and the dataframe are rendered inside st.fragment, so that a filter
+            change only reruns them instead of the whole app. Cannot be used with location='sidebar'.
+            Default is False.
+        **kwargs
+            Additional keyword arguments passed to display_df().
+
+        Exceptions
+        ----------
+        Raises StreamlitAPIException if fragment is used with location='sidebar'.
+        """
+        if fragment and location == "sidebar":
+            raise StreamlitAPIException("fragment cannot be used with location 'sidebar'")
+
+        def panel():
+            self.display_filters(location, num_columns, gap, use_callbacks=use_callbacks or fragment)
+            self.display_df(**kwargs)
+
+        if fragment:
+            st.fragment(panel)()
+        else:
+            panel()
 
 
 class DynamicFiltersHierarchical(DynamicFilters):
@@ -235,6 +1209,10 @@ class DynamicFiltersHierarchical(DynamicFilters):
 
     Methods:
     Extends or overrides the following methods from DynamicFilters.
+
+    The levels are evaluated as a cascade: each level narrows the rows of the level above it.
+    The rows and options of every level are kept in session state and reused on the next rerun
+    for as long as the selections above that level are unchanged and df is the same object.
     """
 
     def filter_df(self, except_filter=None, except_filter_tab: list = None):
@@ -259,157 +1237,57 @@ class DynamicFiltersHierarchical(DynamicFilters):
 
         if except_filter_tab is None:
             except_filter_tab = []
-        filtered_df = self.df.copy()
-        for key, values in st.session_state[self.filters_name].items():
-            if key != except_filter and key not in except_filter_tab and values:
-                filtered_df = filtered_df[filtered_df[key].isin(values)]
-        return filtered_df
+        return self.take_rows(self.filtered_positions([except_filter, *except_filter_tab]))
 
-    def display_filters(self, location=None, num_columns=0, gap="small"):
+    def cascade(self):
         """
-        Renders dynamic multiselect filters for user selection.
+        Evaluates the filter hierarchy level by level, see FilterEngine.cascade().
 
-        Parameters:
-        -----------
-        location : str, optional
-            The location where the filters are to be displayed. Accepted values are:
-            - 'sidebar': Displays filters in the side panel of the application.
-            - 'columns': Displays filters in columns format in the main application area.
-            - None: Defaults to main application area without columns.
-            Default is None.
-
-        num_columns : int, optional
-            The number of columns in which filters are to be displayed when location is set to 'columns'.
-            Constraints:
-            - Must be an integer.
-            - Must be less than or equal to 8.
-            - Must be less than or equal to the number of filters + 1.
-            If location is 'columns', this value must be greater than 0.
-            Default is 0.
-
-        gap : str, optional
-            Specifies the gap between columns when location is set to 'columns'. Accepted values are:
-            - 'small': Minimal gap between columns.
-            - 'medium': Moderate gap between columns.
-            - 'large': Maximum gap between columns.
-            Default is 'small'.
-
-        Behavior:
-        ---------
-        - The function iterates through session-state filters.
-        - For each filter, the function:
-            1. Generates available filter options based on the current dataset.
-            2. Displays a multiselect box for the user to make selections.
-            3. Updates the session state with the user's selection.
-        - If any filter value changes, the application triggers an update to adjust other filter options based on the current selection.
-        - If a user's previous selection is no longer valid based on the dataset, it's removed.
-        - If any filters are updated, the application will rerun for the changes to take effect.
-
-        Exceptions:
-        -----------
-        Raises StreamlitAPIException if the provided arguments don't meet the required constraints.
+        The levels are kept in session state, so the next rerun reuses those whose selections
+        above are unchanged.
 
-        Notes:
-        ------
-        The function uses Streamlit's session state to maintain user's selections across reruns.
+        Returns
+        -------
+        list of dict
+            One entry per level with the keys 'filter', 'selected', 'positions' (rows available
+            to the level, None for all rows) and 'counts' (row counts over the level's value codes).
+        ndarray or None
+            Row positions matching the selections of all levels, None for all rows.
         """
-        # error handling
-        if location not in ["sidebar", "columns", None]:
-            raise StreamlitAPIException(
-                "location must be either 'sidebar' or 'columns'"
-            )
-        # if num_columns is not integer
-        if not isinstance(num_columns, int):
-            raise StreamlitAPIException("num_columns must be an integer")
-        # if num_columns is greater than 8
-        if num_columns > 8:
-            raise StreamlitAPIException("num_columns must be less than or equal to 8")
-        # if num_columns is greater than the number of filters
-        if num_columns > len(st.session_state[self.filters_name]) + 1:
-            raise StreamlitAPIException(
-                "num_columns must be less than or equal to the number of filters"
-            )
-        # if location is column and num_columns is 0
-        if location == "columns" and num_columns == 0:
-            raise StreamlitAPIException(
-                "num_columns must be greater than 0 when location is 'columns'"
-            )
-        if gap not in ["small", "medium", "large"]:
-            raise StreamlitAPIException(
-                "gap must be either 'small', 'medium' or 'large'"
-            )
-
-        filters_changed = False
-
-        # initiate counter and max_value for columns
-        if location == "columns" and num_columns > 0:
-            counter = 1
-            max_value = num_columns
-            col_list = st.columns(num_columns, gap=gap)
+        cache_name = f"{self.filters_name}_cascade"
+        state = self.engine.cascade(self.selections(), st.session_state.get(cache_name))
+        st.session_state[cache_name] = state
+        return state["levels"], state["positions"]
 
-        hierarchical_filter_name = list(st.session_state[self.filters_name].keys())
-        for filter_name in st.session_state[self.filters_name].keys():
-            filtered_df = self.filter_df(except_filter_tab=hierarchical_filter_name)
-            hierarchical_filter_name.remove(filter_name)
-            options = filtered_df[filter_name].unique().tolist()
-
-            # Remove selected values that are not in options anymore
-            valid_selections = [
-                v
-                for v in st.session_state[self.filters_name][filter_name]
-                if v in options
-            ]
-            if valid_selections != st.session_state[self.filters_name][filter_name]:
-                st.session_state[self.filters_name][filter_name] = valid_selections
-                filters_changed = True
-
-            if location == "sidebar":
-                with st.sidebar:
-                    selected = st.multiselect(
-                        f"Select {filter_name}",
-                        sorted(options),
-                        default=st.session_state[self.filters_name][filter_name],
-                        key=self.filters_name + filter_name,
-                    )
-            elif location == "columns" and num_columns > 0:
-                with col_list[counter - 1]:
-                    selected = st.multiselect(
-                        f"Select {filter_name}",
-                        sorted(options),
-                        default=st.session_state[self.filters_name][filter_name],
-                        key=self.filters_name + filter_name,
-                    )
-
-                # increase counter and reset to 1 if max_value is reached
-                counter += 1
-                counter = counter % (max_value + 1)
-                if counter == 0:
-                    counter = 1
-            else:
-                selected = st.multiselect(
-                    f"Select {filter_name}",
-                    sorted(options),
-                    default=st.session_state[self.filters_name][filter_name],
-                    key=self.filters_name + filter_name,
-                )
+    def filter_options(self):
+        """
+        Returns the available options of every level based on the selections of the levels above it.
 
-            if selected != st.session_state[self.filters_name][filter_name]:
-                st.session_state[self.filters_name][filter_name] = selected
-                filters_changed = True
+        Returns
+        -------
+            dict
+                Dictionary with filter names as keys and lists of options as values.
+        """
+        levels, _ = self.cascade()
+        return self.options_from_counts({level["filter"]: level["counts"] for level in levels})
 
-        if filters_changed:
-            st.rerun()
+    def result_positions(self):
+        """Returns the row positions left by the last level of the cascade, or None for all rows."""
+        _, positions = self.cascade()
+        return positions
 
-    def display_df(self, **kwargs):
-        """Renders the filtered dataframe in the main area."""
-        # Display filtered DataFrame
-        st.dataframe(self.filter_df(), **kwargs)
+    def rows_task(self):
+        """Returns a function taking the rows left by the cascade, which is evaluated in the script run where its levels are kept."""
+        positions = self.result_positions()
+        return lambda: self.take_rows(positions)
 
 
-class DynamicFiltersWithGroupby:
+class DynamicFiltersWithGroupby(DynamicFilters):
     """
     A class to create dynamic multi-select filters in Streamlit with optional groupby functionality.
 
+    Inherits the value index and filtering of DynamicFilters.
+
     ...
 
     Attributes
@@ -442,6 +1320,9 @@ class DynamicFiltersWithGroupby:
         numerics,
         filters_name="filters",
         aggregation_name="aggregation",
+        aggregation="sum",
+        cube=None,
+        **kwargs,
     ):
         """
         Constructs all the necessary attributes for the DynamicFiltersWithGroupby object.
@@ -458,14 +1339,38 @@ class DynamicFiltersWithGroupby:
                 Name of the filters object in session state.
             aggregation_name: str, optional
                 Name of the aggregation object in session state.
+            aggregation: str, optional
+                How numerics are aggregated: 'sum', 'mean', 'min', 'max' or 'count'. Default is 'sum'.
+            cube: AggregationCube, optional
+                Pre-aggregated rollups answering the group-by of display_df() when its dimensions
+                hold the aggregation columns and the active selections; other group-bys are
+                computed from the rows. It must aggregate numerics with the aggregation argument.
+            **kwargs:
+                The other arguments of DynamicFilters, e.g. cache, ranges, dimensions, shared or
+                version, passed on to it. The columns of dimensions can also be aggregation columns.
+
+        Exceptions
+        ----------
+        Raises StreamlitAPIException if aggregation is not supported, if the cube aggregates with
+        another aggregation or lacks some of the numerics, or for the reasons listed in
+        DynamicFilters.
         """
-        self.df = df
-        self.filters_name = filters_name
+        if aggregation not in PARTIALS:
+            raise StreamlitAPIException(
+                "aggregation must be either 'sum', 'mean', 'min', 'max' or 'count'"
+            )
+        if cube is not None and cube.aggregation != aggregation:
+            raise StreamlitAPIException(
+                f"the cube aggregates with '{cube.aggregation}', pass the same aggregation to the filters"
+            )
+        if cube is not None and not set(numerics) <= set(cube.numerics):
+            raise StreamlitAPIException("numerics must be among the numerics of the cube")
         self.aggregation_name = aggregation_name
         self.numerics = numerics
-        self.filters = {filter_name: [] for filter_name in filters}
+        self.cube = cube
+        self.aggregation = aggregation
         self.aggregations = {filter_name: False for filter_name in filters}
-        self.check_state()
+        super().__init__(df, filters, filters_name, **kwargs)
 
     def check_state(self):
         """Initializes the session state with filters and aggregations if not already set."""
@@ -487,30 +1392,49 @@ class DynamicFiltersWithGroupby:
         if self.filters_name in st.session_state:
             del st.session_state[self.filters_name]
 
-    def filter_df(self, except_filter=None):
+    def session_keys(self):
+        """Returns the session state keys the filters may write, including the aggregations and their checkboxes."""
+        return super().session_keys() + [self.aggregation_name] + list(self.filters)
+
+    def append(self, rows):
+        """Appends rows to the data and to the rollups of the cube, if one is configured, see DynamicFilters.append()."""
+        data = super().append(rows)
+        if self.cube is not None:
+            self.cube = self.cube.append(rows, self.df)
+        return data
+
+    def update_aggregation(self, filter_name):
+        """Copies the value of a filter's aggregation checkbox into the session state. Used as on_change callback."""
+        st.session_state[self.aggregation_name][filter_name] = st.session_state[filter_name]
+
+    def display(self, use_callbacks=False, **kwargs):
         """
-        Filters the dataframe based on session state values except for the specified filter.
+        Renders the dynamic filters in the sidebar and the filtered dataframe in the main area.
+
+        The filters live in the sidebar, which cannot be part of a fragment, so this class does not
+        support the fragment option of DynamicFilters.display().
 
         Parameters
         ----------
-            except_filter : str, optional
-                The filter name that should be excluded from the current filtering operation.
-
-        Returns
-        -------
-            DataFrame
-                Filtered dataframe.
+        use_callbacks : bool, optional
+            Passed to display_filters().
+        **kwargs
+            Additional keyword arguments passed to display_df().
         """
-        filtered_df = self.df.copy()
-        for key, values in st.session_state[self.filters_name].items():
-            if key != except_filter and values:
-                filtered_df = filtered_df[filtered_df[key].isin(values)]
-        return filtered_df
+        self.display_filters(use_callbacks=use_callbacks)
+        self.display_df(**kwargs)
 
-    def display_filters(self):
+    def display_filters(self, use_callbacks=False):
         """
         Renders dynamic multiselect filters for user selection.
 
+        Parameters
+        ----------
+        use_callbacks : bool, optional
+            If True, selections and aggregations are written to the session state by the widgets'
+            on_change callbacks before the script runs, so the options are up to date in a single
+            pass and no extra st.rerun() is needed. Default is False.
+
         Behavior
         --------
         - The function iterates through session-state filters.
@@ -527,19 +1451,26 @@ class DynamicFiltersWithGroupby:
         -----
         The function uses Streamlit's session state to maintain user's selections across reruns.
         """
+        self.start_profile()
         filters_changed = False
 
         aggregation_status = {}
+        with self.profile_stage("options"):
+            if use_callbacks:
+                filter_options = self.settle_selections()
+            else:
+                filter_options = self.filter_options()
+            selections = self.selections()
+            filter_selections = self.map_filters(
+                lambda filter_name: self.valid_selections(
+                    filter_name, filter_options[filter_name], selections[filter_name]
+                )
+            )
         for filter_name in st.session_state[self.filters_name].keys():
-            filtered_df = self.filter_df(filter_name)
-            options = filtered_df[filter_name].unique().tolist()
+            options = filter_options[filter_name]
 
             # Remove selected values that are not in options anymore
-            valid_selections = [
-                v
-                for v in st.session_state[self.filters_name][filter_name]
-                if v in options
-            ]
+            valid_selections = filter_selections[filter_name]
             if valid_selections != st.session_state[self.filters_name][filter_name]:
                 st.session_state[self.filters_name][filter_name] = valid_selections
                 filters_changed = True
@@ -549,17 +1480,16 @@ class DynamicFiltersWithGroupby:
                     agg_location, filters_location = st.columns([0.2, 0.8])
                     with agg_location:
                         selected_aggregation = st.checkbox(
-                            label="🔗", label_visibility="visible", key=filter_name
+                            label="🔗",
+                            label_visibility="visible",
+                            key=filter_name,
+                            on_change=self.update_aggregation if use_callbacks else None,
+                            args=(filter_name,),
                         )
                         aggregation_status[filter_name] = selected_aggregation
 
                     with filters_location:
-                        selected = st.multiselect(
-                            f"Select {filter_name}",
-                            sorted(options),
-                            default=st.session_state[self.filters_name][filter_name],
-                            key=self.filters_name + filter_name,
-                        )
+                        selected = self.multiselect(filter_name, options, use_callbacks)
             if selected != st.session_state[self.filters_name][filter_name]:
                 st.session_state[self.filters_name][filter_name] = selected
                 filters_changed = True
@@ -569,21 +1499,49 @@ class DynamicFiltersWithGroupby:
             filters_changed = True
 
         if filters_changed:
+            self.finish_profile(rerun=True)
             st.rerun()
 
-    def display_df(self, **kwargs):
-        """Renders the filtered dataframe with optional groupby aggregation in the main area."""
-        df = self.filter_df()
+    def display_df(self, page_size=None, sample=None, **kwargs):
+        """
+        Renders the filtered dataframe with optional groupby aggregation in the main area.
+
+        When a cube is configured, the group-by is answered from its rollups instead of the rows
+        if its dimensions hold the aggregation columns and the active selections.
+        page_size and sample render a page or a random sample of the rows while no aggregation
+        column is checked, see DynamicFilters.display_df(); aggregated results are rendered whole.
+        With background results, the rows and aggregations are computed on their thread pool.
+        """
         aggregation_columns = [
             column_name
             for column_name in st.session_state[self.aggregation_name].keys()
             if st.session_state[self.aggregation_name][column_name] is True
         ]
-        if aggregation_columns and df.shape[0] > 0:
-            df = (
-                df[aggregation_columns + self.numerics]
-                .groupby(aggregation_columns, as_index=False)
-                .sum()
-            )
-        df.index += 1
-        st.dataframe(df, **kwargs)
+        with self.profile_stage("display_df"):
+            if not aggregation_columns and (page_size is not None or sample is not None):
+                self.display_page(page_size, sample, **kwargs)
+            else:
+                name = ("aggregate", tuple(aggregation_columns), self.aggregation, self.cube)
+                with self.profile_stage("aggregate") if aggregation_columns else contextlib.nullcontext():
+                    df = self.background_result(name, self.aggregate_task(aggregation_columns))
+                st.dataframe(df, **kwargs)
+        self.finish_profile()
+
+    def aggregate_task(self, aggregation_columns):
+        """
+        Returns a function computing the frame rendered by display_df() for the current selections, without reading the session state.
+
+        The numerics are aggregated by the aggregation columns, or the matching rows are returned
+        if no column is checked or no row matches, indexed from 1.
+        """
+        selections = {key: list(values) for key, values in self.selections().items()}
+
+        def aggregate():
+            df = None
+            if aggregation_columns:
+                df = self.engine.aggregate(selections, aggregation_columns, self.numerics, self.aggregation, self.cube)
+            if df is None or df.shape[0] == 0:
+                df = self.engine.rows(selections)
+            return df.set_axis(df.index + 1)
+
+        return aggregate
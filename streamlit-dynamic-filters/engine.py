@@ -0,0 +1,2012 @@
+import contextlib
+import copy
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from streamlit.errors import StreamlitAPIException
+
+from .cache import append_fingerprint, estimate_size, fingerprint
+from .cube import PARTIALS
+from .rowset import RowSet, intersect_positions
+from .store import artifact_key, load_artifact, save_artifact, storable
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def shared_executor(max_workers):
+    """Returns the thread pool of the process with the given number of workers, creating it on first use."""
+    with _executors_lock:
+        if max_workers not in _executors:
+            _executors[max_workers] = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="dynamic-filters"
+            )
+        return _executors[max_workers]
+
+
+def is_missing(value):
+    """Returns True if a value is a missing scalar, such as None, NaN, pd.NA or NaT."""
+    return pd.api.types.is_scalar(value) and bool(pd.isna(value))
+
+
+def sort_values(values):
+    """Returns the values sorted, with missing values last, in the order the options of a filter are offered."""
+    values = list(values)
+    return sorted(value for value in values if not is_missing(value)) + [value for value in values if is_missing(value)]
+
+
+# attributes of the ColumnIndexes that are not saved: the caches of searches, reset by load(),
+# and the dictionaries of values and of dimension keys, taken back from the columns by load()
+UNSAVED_ATTRIBUTES = {"label_order", "sorted_labels", "matches", "values", "keys"}
+
+
+class ColumnIndex:
+    """
+    An index mapping every distinct value of a column to the row positions holding it.
+
+    The column is dictionary-encoded once into integer codes and a dictionary of values, the way
+    categoricals work, and the row positions are grouped by code. Row lookups, masks, distinct
+    values and validity checks all run on the codes; values are decoded only for widget labels.
+
+    Attributes
+    ----------
+    values : Index
+        The distinct values of the column, in order of first appearance.
+    codes : ndarray
+        Position of each row's value in values, in the smallest unsigned integer dtype that fits.
+    order : ndarray
+        Row positions sorted by value code, stable within each value.
+    offsets : ndarray
+        Boundaries of each value's run of positions in order.
+    """
+
+    def __init__(self, column):
+        """
+        Builds the index for a single column.
+
+        Parameters
+        ----------
+            column : Series
+                The column to be indexed.
+        """
+        codes, uniques = pd.factorize(column, use_na_sentinel=False)
+        self.values = pd.Index(uniques)
+        self.codes = codes.astype(np.min_scalar_type(max(len(uniques) - 1, 0)))
+        self.order = np.argsort(codes, kind="stable")
+        counts = np.bincount(codes, minlength=len(uniques))
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+        self.label_order = None
+        self.sorted_labels = None
+
+    def append(self, column):
+        """
+        Returns the index of the column with rows appended, built from the appended rows only.
+
+        The appended rows are indexed on their own, their distinct values are matched against the
+        dictionary, unseen values get the next codes, and the runs of positions of both indexes
+        are interleaved by code. Nothing is hashed or sorted over the existing rows. The index
+        itself is not modified, so it can still be read while the new one is built.
+
+        Parameters
+        ----------
+            column : Series
+                The appended rows of the column.
+
+        Returns
+        -------
+            ColumnIndex
+                The index over the existing and the appended rows.
+        """
+        delta = ColumnIndex(column)
+        mapping = self.values.get_indexer(delta.values)
+        unseen = mapping < 0
+        mapping[unseen] = len(self.values) + np.arange(int(unseen.sum()))
+
+        appended = copy.copy(self)
+        appended.values = self.values.append(delta.values[unseen])
+        appended.codes = np.concatenate((self.codes, mapping[delta.codes])).astype(
+            np.min_scalar_type(max(len(appended.values) - 1, 0))
+        )
+        counts = np.diff(self.offsets)
+        old_counts = np.zeros(len(appended.values), dtype=np.intp)
+        old_counts[: len(counts)] = counts
+        new_counts = np.bincount(mapping, weights=np.diff(delta.offsets), minlength=len(appended.values)).astype(np.intp)
+        appended.offsets = np.concatenate(([0], np.cumsum(old_counts + new_counts)))
+
+        # existing rows keep their place within their run, appended rows follow them
+        appended.order = np.empty(len(appended.codes), dtype=np.intp)
+        old_code = np.repeat(np.arange(len(counts)), counts)
+        shift = appended.offsets[: len(counts)] - self.offsets[:-1]
+        appended.order[np.arange(len(self.order)) + shift[old_code]] = self.order
+        delta_code = np.repeat(np.arange(len(delta.values)), np.diff(delta.offsets))
+        code = mapping[delta_code]
+        target = appended.offsets[code] + old_counts[code] + np.arange(len(delta.order)) - delta.offsets[delta_code]
+        appended.order[target] = len(self.codes) + delta.order
+        appended.label_order = None
+        appended.sorted_labels = None
+        return appended
+
+    def positions(self, values):
+        """
+        Returns the sorted row positions holding any of the given values.
+
+        Parameters
+        ----------
+            values : list
+                Values to look up. Values not present in the column are ignored.
+
+        Returns
+        -------
+            ndarray
+                Sorted array of row positions.
+        """
+        return self.code_positions(np.unique(self.value_codes(values)))
+
+    def keep_positions(self, keep):
+        """Returns the sorted row positions holding any of the values marked in a boolean array over the value codes."""
+        codes = np.flatnonzero(keep)
+        if len(codes) <= 64:
+            return self.code_positions(codes)
+        # merging many runs costs more than one pass over the codes of all rows
+        return np.flatnonzero(keep[self.codes])
+
+    def code_positions(self, codes):
+        """Returns the sorted row positions holding any of the values with the given codes, ignoring codes below 0."""
+        runs = [self.order[self.offsets[code] : self.offsets[code + 1]] for code in codes if code >= 0]
+        if not runs:
+            return np.empty(0, dtype=np.intp)
+        if len(runs) == 1:
+            return runs[0]
+        return np.sort(np.concatenate(runs))
+
+    def narrow(self, positions, values):
+        """
+        Returns the subset of the given row positions holding any of the given values.
+
+        Parameters
+        ----------
+            positions : ndarray or None
+                Sorted row positions to narrow down. None stands for all rows.
+            values : list
+                Values to keep.
+
+        Returns
+        -------
+            ndarray
+                Sorted array of row positions.
+        """
+        if positions is None:
+            return self.positions(values)
+        return positions[self.keep(values)[self.codes[positions]]]
+
+    def value_codes(self, values):
+        """
+        Returns the codes of the given values, -1 for values not in the column.
+
+        Missing values share one code: the column is factorized with None and NaN encoded alike,
+        and a missing value looked up, whether None, NaN, pd.NA or NaT, gets that code.
+        """
+        values = list(values)
+        codes = self.values.get_indexer(values)
+        missing = [position for position, value in enumerate(values) if codes[position] < 0 and is_missing(value)]
+        if missing:
+            codes[missing] = self.missing_code()
+        return codes
+
+    def missing_code(self):
+        """Returns the code of the missing value, -1 if the column has no missing values."""
+        codes = np.flatnonzero(self.values.isna())
+        return int(codes[0]) if len(codes) else -1
+
+    def canonical(self, values):
+        """Returns the values with every missing value, whether NaN, pd.NA or NaT, replaced by None, the form options hold it in."""
+        return [None if is_missing(value) else value for value in values]
+
+    def take(self, codes):
+        """
+        Returns the values with the given codes, the missing value as None.
+
+        None is the one missing value equal to itself, so a selected missing value is still among
+        the options the next script run decodes, which a NaN, a new object on every run, is not.
+        """
+        values = self.values.take(codes).tolist()
+        missing = self.missing_code()
+        if missing >= 0:
+            for position in np.flatnonzero(np.asarray(codes) == missing):
+                values[position] = None
+        return values
+
+    def keep(self, values):
+        """Returns a boolean array over the value codes marking the given values."""
+        codes = self.value_codes(values)
+        keep = np.zeros(len(self.values), dtype=bool)
+        keep[codes[codes >= 0]] = True
+        return keep
+
+    def mask(self, values):
+        """Returns a boolean mask of the rows holding any of the given values."""
+        mask = np.zeros(len(self.codes), dtype=bool)
+        mask[self.positions(values)] = True
+        return mask
+
+    def row_set(self, values):
+        """Returns the RowSet of the rows holding any of the given values."""
+        return self.keep_row_set(self.keep(values))
+
+    def count(self, values):
+        """Returns the number of rows holding any of the given values, from the runs of the values."""
+        return int(np.diff(self.offsets)[self.keep(values)].sum())
+
+    def keep_row_set(self, keep):
+        """
+        Returns the RowSet of the rows holding any of the values marked in a boolean array over the value codes.
+
+        The row count is known from the runs of the values, so a sparse set is built from their
+        positions and a dense one is packed from the codes chunk by chunk.
+        """
+        size = len(self.codes)
+        if RowSet.sparse(int(np.diff(self.offsets)[keep].sum()), size):
+            return RowSet(size, rows=self.keep_positions(keep))
+        return RowSet.from_chunks(size, lambda start, stop: keep[self.codes[start:stop]])
+
+    def counts(self, mask=None):
+        """
+        Returns the number of rows holding each value among the rows selected by a mask.
+
+        Parameters
+        ----------
+            mask : ndarray or RowSet, optional
+                Boolean mask, array of positions or RowSet of rows. None selects all rows.
+
+        Returns
+        -------
+            ndarray
+                Row counts over the value codes.
+        """
+        if mask is None:
+            return np.diff(self.offsets)
+        if isinstance(mask, RowSet):
+            return mask.bincount(self.codes, len(self.values))
+        return np.bincount(self.codes[mask], minlength=len(self.values))
+
+    def row_codes(self, rows=None):
+        """Returns the value codes of the given rows, or of all rows if rows is None."""
+        return self.codes if rows is None else self.codes[rows]
+
+    def present(self, mask=None):
+        """Returns a boolean array over the value codes marking the values present in the rows selected by a mask."""
+        return self.counts(mask) > 0
+
+    def decode(self, present):
+        """Returns the values marked in a boolean array over the value codes, in order of first appearance."""
+        return self.take(np.flatnonzero(present))
+
+    def options(self, mask=None):
+        """
+        Returns the distinct values present in the rows selected by a mask.
+
+        Parameters
+        ----------
+            mask : ndarray, optional
+                Boolean mask or array of positions of rows. None selects all rows.
+
+        Returns
+        -------
+            list
+                Distinct values, in order of first appearance in the column.
+        """
+        return self.decode(self.present(mask))
+
+    def contains(self, values, present):
+        """
+        Checks which of the given values are marked in a boolean array over the value codes.
+
+        Parameters
+        ----------
+            values : list
+                Values to check. Values not present in the column are never marked.
+            present : ndarray
+                Boolean array over the value codes, as returned by present().
+
+        Returns
+        -------
+            ndarray
+                Boolean array with one entry per value.
+        """
+        codes = self.value_codes(values)
+        return np.append(present, False)[codes]
+
+    def search(self, query):
+        """
+        Returns the codes of the values whose label starts with query, ignoring case.
+
+        The labels are sorted once on the first search, so every search is a binary search
+        over the sorted labels instead of a scan over the values.
+        """
+        if self.label_order is None:
+            labels = np.asarray(self.values.astype(str).str.casefold(), dtype=object)
+            self.label_order = np.argsort(labels, kind="stable")
+            self.sorted_labels = labels[self.label_order]
+        query = query.casefold()
+        start = np.searchsorted(self.sorted_labels, query, side="left")
+        end = np.searchsorted(self.sorted_labels, query + "\U0010ffff", side="left")
+        return self.label_order[start:end]
+
+    def top(self, counts, k, query=None):
+        """
+        Returns the codes of up to k present values with the highest row counts.
+
+        Parameters
+        ----------
+            counts : ndarray
+                Row counts over the value codes, as returned by counts().
+            k : int
+                Maximum number of codes to return.
+            query : str, optional
+                If given, only values whose label starts with query are considered.
+
+        Returns
+        -------
+            ndarray
+                Value codes ordered by descending row count.
+        """
+        codes = self.search(query) if query else np.arange(len(counts))
+        codes = codes[counts[codes] > 0]
+        if len(codes) > k:
+            codes = codes[np.argpartition(-counts[codes], k - 1)[:k]]
+        return codes[np.argsort(-counts[codes], kind="stable")]
+
+
+class TextIndex(ColumnIndex):
+    """
+    A ColumnIndex with a trigram index over the labels of its distinct values, backing contains filters.
+
+    Every distinct value is labelled once with its casefolded string. Each trigram of a label is
+    packed into an integer from the code points of its three characters, and the value codes
+    holding each trigram are stored sorted, as postings in one array. A query resolves to the
+    values holding all of its trigrams, and only those candidate labels are checked for the
+    query, so neither the rows nor all the labels are scanned. Queries shorter than a trigram
+    check every label, which is still one check per distinct value rather than per row.
+
+    The selection of a contains filter is a list holding the query.
+
+    Attributes
+    ----------
+    labels : list
+        The casefolded labels of the values, empty for missing values.
+    grams : ndarray
+        The distinct trigrams of all labels, sorted.
+    postings : ndarray
+        The value codes holding each trigram, grouped by trigram in the order of grams.
+    gram_offsets : ndarray
+        Boundaries of each trigram's run of codes in postings.
+    """
+
+    def __init__(self, column):
+        """
+        Builds the index for a single column.
+
+        Parameters
+        ----------
+            column : Series
+                The column to be indexed. Values are matched by their string representation.
+        """
+        super().__init__(column)
+        self.labels = self.label(self.values)
+        self.matches = {}
+        self.build_postings(*self.trigrams(self.labels, 0))
+
+    @staticmethod
+    def label(values):
+        """Returns the casefolded labels of values, empty for missing values."""
+        return ["" if pd.isna(value) else str(value).casefold() for value in values]
+
+    def trigrams(self, labels, first):
+        """Returns the trigrams of the labels and the codes of the values holding them, the first label having code first."""
+        lengths = np.fromiter((len(label) for label in labels), dtype=np.intp, count=len(labels))
+        # one separator character between labels, owned by no value, so no trigram spans two labels
+        owners = np.repeat(np.arange(first, first + len(labels)), lengths + 1)
+        owners[np.cumsum(lengths + 1) - 1] = -1
+        grams = self.pack(self.code_points("\0".join(labels) + "\0"))
+        valid = (owners[:-2] >= 0) & (owners[:-2] == owners[2:])
+        return grams[valid], owners[:-2][valid]
+
+    def build_postings(self, grams, owners):
+        """Sorts pairs of trigrams and value codes into the postings of every distinct trigram."""
+        order = np.lexsort((owners, grams))
+        grams, owners = grams[order], owners[order]
+        distinct = np.ones(len(grams), dtype=bool)
+        distinct[1:] = (grams[1:] != grams[:-1]) | (owners[1:] != owners[:-1])
+        grams, self.postings = grams[distinct], owners[distinct]
+        starts = np.flatnonzero(np.append(True, grams[1:] != grams[:-1]))[: len(grams)]
+        self.grams = grams[starts]
+        self.gram_offsets = np.append(starts, len(grams))
+
+    def append(self, column):
+        """Returns the index of the column with rows appended, adding the trigrams of the new distinct values only."""
+        appended = super().append(column)
+        labels = self.label(appended.values[len(self.values) :])
+        appended.labels = self.labels + labels
+        appended.matches = {}
+        grams, owners = self.trigrams(labels, len(self.values))
+        appended.build_postings(
+            np.concatenate((np.repeat(self.grams, np.diff(self.gram_offsets)), grams)),
+            np.concatenate((self.postings, owners)),
+        )
+        return appended
+
+    @staticmethod
+    def code_points(text):
+        """Returns the Unicode code points of a string as an unsigned integer array."""
+        return np.frombuffer(text.encode("utf-32-le", "surrogatepass"), dtype=np.uint32).astype(np.uint64)
+
+    @staticmethod
+    def pack(points):
+        """Packs every run of three consecutive code points into one integer, 21 bits per code point."""
+        if len(points) < 3:
+            return np.empty(0, dtype=np.uint64)
+        return (points[:-2] << np.uint64(42)) | (points[1:-1] << np.uint64(21)) | points[2:]
+
+    def match(self, query):
+        """
+        Returns the codes of the values whose label contains query, ignoring case.
+
+        Parameters
+        ----------
+            query : str
+                The text to look for.
+
+        Returns
+        -------
+            ndarray
+                Sorted value codes.
+        """
+        query = str(query).casefold()
+        if query in self.matches:
+            return self.matches[query]
+
+        candidates = None
+        for gram in np.unique(self.pack(self.code_points(query))):
+            position = np.searchsorted(self.grams, gram)
+            if position == len(self.grams) or self.grams[position] != gram:
+                candidates = np.empty(0, dtype=np.intp)
+                break
+            codes = self.postings[self.gram_offsets[position] : self.gram_offsets[position + 1]]
+            candidates = codes if candidates is None else np.intersect1d(candidates, codes, assume_unique=True)
+        if candidates is None:
+            candidates = np.arange(len(self.labels))
+        # trigrams only narrow the candidates down; the labels confirm the match
+        codes = np.array([code for code in candidates if query in self.labels[code]], dtype=np.intp)
+
+        if len(self.matches) >= 256:
+            self.matches.clear()
+        self.matches[query] = codes
+        return codes
+
+    def positions(self, values):
+        """Returns the sorted row positions whose value contains the query in values, ignoring case."""
+        return self.keep_positions(self.keep(values))
+
+    def keep(self, values):
+        """Returns a boolean array over the value codes marking the values that contain the query in values."""
+        keep = np.zeros(len(self.values), dtype=bool)
+        keep[self.match(values[0])] = True
+        return keep
+
+
+class LinkedIndex(ColumnIndex):
+    """
+    An index of a column of a dimension dataframe over the rows of the fact dataframe, backing linked filters.
+
+    The dimension holds one row per key, and the fact dataframe refers to it through a key
+    column. The dimension column is dictionary-encoded over the dimension rows, and every
+    distinct key of the fact dataframe is mapped to the value code of its dimension row. A
+    selection marks the keys of the dimension rows holding the selected values, and the rows
+    of the fact dataframe are looked up by key in the ColumnIndex of its key column: a semi-join
+    through both indexes, without copying the dimension column into the fact dataframe. Row
+    counts of the values are the row counts of the keys, summed per value.
+
+    Fact rows whose key has no dimension row never match a selection of a linked filter.
+
+    Attributes
+    ----------
+    key : str
+        The key column of the fact dataframe.
+    keys : Index
+        The key of every dimension row.
+    key_index : ColumnIndex
+        The index of the key column of the fact dataframe.
+    key_codes : ndarray
+        The value code of the dimension row of every distinct key of the fact dataframe, -1 for
+        keys without a dimension row.
+    """
+
+    def __init__(self, column, keys, key, key_index):
+        """
+        Builds the index for a single dimension column.
+
+        Parameters
+        ----------
+            column : Series
+                The dimension column to be indexed.
+            keys : Series or Index
+                The key of every dimension row, aligned with column.
+            key : str
+                The key column of the fact dataframe.
+            key_index : ColumnIndex
+                The index of the key column of the fact dataframe.
+
+        Exceptions
+        ----------
+        Raises StreamlitAPIException if the keys of the dimension are not unique.
+        """
+        keys = pd.Index(keys)
+        if not keys.is_unique:
+            raise StreamlitAPIException(f"the keys {key} of the dimension of {column.name} must be unique")
+        super().__init__(column)
+        self.key = key
+        self.keys = keys
+        self.key_index = key_index
+        self.key_codes = self.map_keys(key_index.values)
+
+    def map_keys(self, keys):
+        """Returns the value codes of the dimension rows of the given keys, -1 for keys without a dimension row."""
+        rows = self.keys.get_indexer(keys)
+        codes = np.full(len(rows), -1, dtype=np.intp)
+        codes[rows >= 0] = self.codes[rows[rows >= 0]]
+        return codes
+
+    def relink(self, key_index):
+        """
+        Returns the index linked to the key index of the fact dataframe with rows appended.
+
+        The dimension is unchanged, so only the keys that are new to the key index are mapped.
+        """
+        linked = copy.copy(self)
+        linked.key_index = key_index
+        linked.key_codes = np.concatenate((self.key_codes, self.map_keys(key_index.values[len(self.key_codes) :])))
+        return linked
+
+    def key_keep(self, values):
+        """Returns a boolean array over the key codes of the fact dataframe marking the keys holding the given values."""
+        return np.append(self.keep(values), False)[self.key_codes]
+
+    def positions(self, values):
+        """Returns the sorted positions of the fact rows whose dimension row holds any of the given values."""
+        return self.key_index.keep_positions(self.key_keep(values))
+
+    def narrow(self, positions, values):
+        """Returns the subset of the given fact row positions, None for all rows, whose dimension row holds any of the values."""
+        if positions is None:
+            return self.positions(values)
+        return positions[self.key_keep(values)[self.key_index.codes[positions]]]
+
+    def mask(self, values):
+        """Returns a boolean mask of the fact rows whose dimension row holds any of the given values."""
+        return self.key_keep(values)[self.key_index.codes]
+
+    def row_set(self, values):
+        """Returns the RowSet of the fact rows whose dimension row holds any of the given values."""
+        return self.key_index.keep_row_set(self.key_keep(values))
+
+    def count(self, values):
+        """Returns the number of fact rows whose dimension row holds any of the given values."""
+        return int(np.diff(self.key_index.offsets)[self.key_keep(values)].sum())
+
+    def counts(self, mask=None):
+        """
+        Returns the number of fact rows holding each value among the fact rows selected by a mask.
+
+        Parameters
+        ----------
+            mask : ndarray or RowSet, optional
+                Boolean mask, array of positions or RowSet of fact rows. None selects all rows.
+
+        Returns
+        -------
+            ndarray
+                Row counts over the value codes.
+        """
+        key_counts = self.key_index.counts(mask)
+        linked = self.key_codes >= 0
+        return np.bincount(
+            self.key_codes[linked], weights=key_counts[linked], minlength=len(self.values)
+        ).astype(np.intp)
+
+    def row_codes(self, rows=None):
+        """Returns the value codes of the given fact rows, -1 for keys missing from the dimension."""
+        return self.key_codes[self.key_index.row_codes(rows)]
+
+    def lookup(self, keys):
+        """Returns the values of the dimension rows of the given keys, None for keys without a dimension row."""
+        codes = np.append(self.key_codes, -1)[self.key_index.values.get_indexer(keys)]
+        return np.append(self.values.to_numpy(dtype=object), None)[codes]
+
+
+class SortedIndex:
+    """
+    An index of a numeric or datetime column by sort order, backing range filters.
+
+    The rows are sorted by value once, so the rows within a range are a contiguous slice of the
+    sort order found with two binary searches, and the smallest and largest values among any
+    subset of rows are its first and last rows in sort order. Missing values sort last and never
+    fall within a range.
+
+    Attributes
+    ----------
+    keys : ndarray
+        The values of the column, as floats with NaN for missing numbers, or as datetime64.
+    order : ndarray
+        Row positions sorted by value, stable within equal values.
+    sorted : ndarray
+        The non-missing values in sort order.
+    dates : bool
+        True for datetime columns.
+    """
+
+    def __init__(self, column):
+        """
+        Builds the index for a single column.
+
+        Parameters
+        ----------
+            column : Series
+                The numeric or timezone-naive datetime column to be indexed.
+
+        Exceptions
+        ----------
+        Raises StreamlitAPIException if the column is neither numeric nor a timezone-naive datetime.
+        """
+        self.dates = pd.api.types.is_datetime64_dtype(column.dtype)
+        numeric = pd.api.types.is_numeric_dtype(column.dtype) and not pd.api.types.is_bool_dtype(column.dtype)
+        if not (self.dates or numeric):
+            raise StreamlitAPIException(
+                f"range filter {column.name} must be a numeric or timezone-naive datetime column"
+            )
+        if self.dates:
+            self.keys = column.to_numpy()
+            missing = np.isnat(self.keys)
+        elif column.hasnans or not pd.api.types.is_integer_dtype(column.dtype):
+            self.keys = column.to_numpy(dtype=np.float64, na_value=np.nan)
+            missing = np.isnan(self.keys)
+        else:
+            self.keys = column.to_numpy(dtype=np.int64)
+            missing = np.zeros(len(self.keys), dtype=bool)
+        self.order = np.argsort(self.keys, kind="stable")
+        self.sorted = self.keys[self.order[: len(self.keys) - int(missing.sum())]]
+
+    def append(self, column):
+        """
+        Returns the index of the column with rows appended, built from the appended rows only.
+
+        The appended rows are sorted on their own and merged into the sort order with one binary
+        search per row, after the existing rows holding equal values.
+
+        Parameters
+        ----------
+            column : Series
+                The appended rows of the column.
+
+        Returns
+        -------
+            SortedIndex
+                The index over the existing and the appended rows.
+
+        Exceptions
+        ----------
+        Raises StreamlitAPIException if the appended rows are not of the same kind, numeric or datetime.
+        """
+        delta = SortedIndex(column)
+        if delta.dates != self.dates:
+            raise StreamlitAPIException(f"appended range filter {column.name} must keep its dtype")
+        dtype = np.result_type(self.keys, delta.keys)
+        old_sorted = self.sorted.astype(dtype, copy=False)
+        new_sorted = delta.sorted.astype(dtype, copy=False)
+        inserts = np.searchsorted(old_sorted, new_sorted, side="right")
+        start = len(self.keys)
+
+        appended = copy.copy(self)
+        appended.keys = np.concatenate((self.keys.astype(dtype, copy=False), delta.keys.astype(dtype, copy=False)))
+        appended.sorted = np.insert(old_sorted, inserts, new_sorted)
+        # missing values keep sorting last
+        appended.order = np.concatenate(
+            (
+                np.insert(self.order[: len(old_sorted)], inserts, start + delta.order[: len(new_sorted)]),
+                self.order[len(old_sorted) :],
+                start + delta.order[len(new_sorted) :],
+            )
+        )
+        return appended
+
+    def encode(self, bounds):
+        """Converts the bounds of a range to the dtype of keys."""
+        if self.dates:
+            return np.array([pd.Timestamp(bound).to_datetime64() for bound in bounds]).astype(self.keys.dtype)
+        return np.asarray(bounds)
+
+    def span(self, bounds):
+        """Returns the slice of the sort order holding the values within the bounds, inclusive."""
+        low, high = self.encode(bounds)
+        start = np.searchsorted(self.sorted, low, side="left")
+        end = np.searchsorted(self.sorted, high, side="right")
+        return start, max(start, end)
+
+    def positions(self, bounds):
+        """
+        Returns the sorted row positions holding values within the bounds.
+
+        Parameters
+        ----------
+            bounds : list
+                Smallest and largest value of the range, inclusive.
+
+        Returns
+        -------
+            ndarray
+                Sorted array of row positions.
+        """
+        start, end = self.span(bounds)
+        return np.sort(self.order[start:end])
+
+    def narrow(self, positions, bounds):
+        """Returns the subset of the given row positions, None for all rows, holding values within the bounds."""
+        if positions is None:
+            return self.positions(bounds)
+        low, high = self.encode(bounds)
+        keys = self.keys[positions]
+        return positions[(keys >= low) & (keys <= high)]
+
+    def mask(self, bounds):
+        """Returns a boolean mask of the rows holding values within the bounds."""
+        start, end = self.span(bounds)
+        mask = np.zeros(len(self.keys), dtype=bool)
+        mask[self.order[start:end]] = True
+        return mask
+
+    def count(self, bounds):
+        """Returns the number of rows holding values within the bounds."""
+        start, end = self.span(bounds)
+        return int(end - start)
+
+    def row_set(self, bounds):
+        """Returns the RowSet of the rows holding values within the bounds, compared chunk by chunk when it is dense."""
+        start, end = self.span(bounds)
+        size = len(self.keys)
+        if RowSet.sparse(end - start, size):
+            return RowSet(size, rows=np.sort(self.order[start:end]))
+        low, high = self.encode(bounds)
+
+        def within(first, stop):
+            keys = self.keys[first:stop]
+            return (keys >= low) & (keys <= high)
+
+        return RowSet.from_chunks(size, within)
+
+    def bounds(self, rows=None):
+        """
+        Returns the smallest and largest value among the rows selected by a mask or positions.
+
+        Parameters
+        ----------
+            rows : ndarray or RowSet, optional
+                Boolean mask, array of positions or RowSet of rows. None selects all rows.
+
+        Returns
+        -------
+            ndarray
+                The smallest and the largest value, or an empty array if no selected row has a value.
+        """
+        if rows is None:
+            return self.sorted[[0, -1]] if len(self.sorted) else self.sorted
+        if isinstance(rows, RowSet):
+            if rows.bits is None:
+                return self.bounds(rows.rows)
+            # the first and last rows of the set in sort order, found by testing the order in chunks
+            ordered = self.order[: len(self.sorted)]
+            first = rows.find(ordered)
+            if first < 0:
+                return self.sorted[:0]
+            return self.sorted[[first, rows.find(ordered, reverse=True)]]
+        if rows.dtype == bool:
+            hits = rows[self.order[: len(self.sorted)]]
+            first = int(hits.argmax()) if len(hits) else 0
+            if not len(hits) or not hits[first]:
+                return self.sorted[:0]
+            last = len(hits) - 1 - int(hits[::-1].argmax())
+            return self.sorted[[first, last]]
+        keys = self.keys[rows]
+        if self.dates:
+            keys = keys[~np.isnat(keys)]
+        elif keys.dtype.kind == "f":
+            keys = keys[~np.isnan(keys)]
+        if not len(keys):
+            return keys
+        return np.array([keys.min(), keys.max()])
+
+    def decode(self, bounds):
+        """Returns bounds as Python numbers or Timestamps."""
+        return pd.Series(bounds).tolist()
+
+
+class FilterIndex:
+    """
+    The dataframe, the dimensions and the value indexes of a set of filters, built once and only read afterwards.
+
+    Building the indexes is the expensive part of constructing the filters. A FilterIndex holds
+    no session state, so one instance can back the filters of every session of the process:
+
+        @st.cache_resource
+        def filter_index():
+            return FilterIndex(load_sales(), filters=['region', 'country', 'price'], ranges=['price'])
+
+        dynamic_filters = DynamicFilters(filter_index(), filters=['region', 'country', 'price'])
+
+    Each session then holds only its selections and the row positions of its results. Passing
+    shared=True to the filters does the same with the fingerprint of df as cache key.
+
+    The indexes can also be saved to disk once, e.g. at deploy time, and memory-mapped by every
+    new process instead of being built again, see open():
+
+        FilterIndex.open('indexes/', load_sales(), filters=['region', 'country', 'price'], ranges=['price'])
+
+    Attributes
+    ----------
+    df : DataFrame
+        The dataframe on which filters are applied.
+    filters : list
+        Names of the indexed filters.
+    ranges : set
+        Names of the filters selecting a range of values instead of a list.
+    texts : set
+        Names of the filters selecting the values that contain a query.
+    dimensions : dict
+        Dictionary with key columns of df as keys and the dimension dataframes they refer to as values.
+    linked : dict
+        Dictionary with the names of the filters on dimension columns as keys and their key columns as values.
+    index : dict
+        Dictionary with column names as keys and their ColumnIndex, SortedIndex, TextIndex or
+        LinkedIndex as values.
+    sorted_values : dict
+        Dictionary with filter names as keys and their distinct values sorted by label as values,
+        filled by sorted_options().
+    version : hashable or None
+        Version of df and the dimensions identifying them in cache keys instead of their fingerprints.
+    """
+
+    def __init__(self, df, filters, ranges=None, texts=None, dimensions=None, version=None):
+        """
+        Builds the indexes of the filters.
+
+        Parameters
+        ----------
+            df : DataFrame
+                The dataframe on which filters are applied.
+            filters : list of str
+                List of column names in df, or in the dimensions, for which filters are to be created.
+            ranges, texts, dimensions : optional
+                Range filters, contains filters and dimension dataframes, see DynamicFilters.
+            version : hashable, optional
+                Version of df and the dimensions, e.g. the modification time of their source,
+                identifying them in cache keys and artifact names instead of fingerprints, which
+                hash every row. It must change whenever the data does. Default uses fingerprints.
+
+        Exceptions
+        ----------
+        Raises StreamlitAPIException if a range or contains filter is not among filters, if a
+        filter is both, if the column of a range filter is neither numeric nor datetime, or if a
+        filter is neither a column of df nor of exactly one dimension.
+        """
+        self.ranges = set(ranges or [])
+        self.texts = set(texts or [])
+        if not self.ranges <= set(filters):
+            raise StreamlitAPIException("ranges must be a subset of filters")
+        if not self.texts <= set(filters):
+            raise StreamlitAPIException("texts must be a subset of filters")
+        if self.ranges & self.texts:
+            raise StreamlitAPIException("a filter cannot be in both ranges and texts")
+        self.dimensions = dict(dimensions or {})
+        if not set(self.dimensions) <= set(df.columns):
+            raise StreamlitAPIException("the keys of dimensions must be columns of df")
+        self.linked = {}
+        for filter_name in filters:
+            if filter_name in df.columns:
+                continue
+            keys = [key for key, dimension in self.dimensions.items() if filter_name in dimension.columns]
+            if len(keys) != 1:
+                raise StreamlitAPIException(
+                    f"filter {filter_name} must be a column of df or of exactly one dimension"
+                )
+            self.linked[filter_name] = keys[0]
+        if set(self.linked) & (self.ranges | self.texts):
+            raise StreamlitAPIException("range and contains filters must be columns of df")
+        self.df = df
+        self.filters = list(filters)
+        self.version = version
+        self.sorted_values = {}
+        self.index = {}
+        for filter_name in filters:
+            self.index[filter_name] = self.build_index(filter_name)
+
+    def fingerprint(self):
+        """
+        Returns the tuple identifying df and the dimensions in cache keys.
+
+        It holds version if set, and the fingerprints of df and of the dimensions otherwise.
+        """
+        if self.version is not None:
+            return ("version", self.version)
+        return (fingerprint(self.df),) + tuple(fingerprint(dimension) for dimension in self.dimensions.values())
+
+    @staticmethod
+    def artifact_key(df, filters, ranges=None, texts=None, dimensions=None, version=None):
+        """
+        Returns the key of the on-disk artifact of the indexes, see save().
+
+        The key is made of the fingerprints of df and the dimensions, or of version if given, and
+        of the filter arguments, so an artifact is only loaded for the data it was built from.
+        """
+        dimensions = dimensions or {}
+        if version is None:
+            data = (fingerprint(df), [(column, fingerprint(dimension)) for column, dimension in dimensions.items()])
+        else:
+            data = (version, list(dimensions))
+        return artifact_key(data, list(filters), sorted(ranges or []), sorted(texts or []))
+
+    def save(self, path, version=None):
+        """
+        Saves the indexes and the sorted options of the filters to an artifact under path.
+
+        Every array of every index, such as the value codes of the rows and the sort orders, is
+        saved to a .npy file that load() memory-maps, and the other attributes go into the JSON
+        manifest; nothing is pickled. The dictionaries of values are not saved either: load()
+        takes them back from the columns at the first row of every value, and the sorted options
+        are saved as value codes. The caches of searches are dropped. The artifact lives in a
+        directory named after artifact_key(), so the artifacts of several versions of the data
+        can sit side by side under path. df and the dimensions are not saved: they are passed
+        again to load().
+
+        Parameters
+        ----------
+            path : str
+                Directory holding the artifacts, created if missing.
+            version : str, optional
+                Version of the data, e.g. the modification time of its source, used in the key
+                instead of the fingerprints of df and the dimensions. Default is the version of
+                the FilterIndex, or the fingerprints if it has none.
+
+        Returns
+        -------
+            str
+                Directory of the artifact.
+        """
+        for filter_name in self.filters:
+            if filter_name not in self.ranges and filter_name not in self.texts:
+                with contextlib.suppress(TypeError):
+                    self.sorted_options(filter_name)
+        arrays = {}
+        indexes = []
+        sorted_values = []
+        for number, (column_name, index) in enumerate(self.index.items()):
+            attributes, stored, references = {}, {}, {}
+            for name, value in vars(index).items():
+                if isinstance(index, ColumnIndex) and name in UNSAVED_ATTRIBUTES:
+                    continue
+                if name == "labels":
+                    value = np.array(value, dtype=str)
+                if isinstance(value, ColumnIndex):
+                    references[name] = next(column for column, other in self.index.items() if other is value)
+                elif storable(value):
+                    stored[name] = f"{number}-{name}"
+                    arrays[stored[name]] = value
+                else:
+                    attributes[name] = value
+            if column_name in self.sorted_values:
+                sorted_values.append((column_name, f"{number}-sorted_values"))
+                arrays[f"{number}-sorted_values"] = index.value_codes(self.sorted_values[column_name])
+            indexes.append([column_name, type(index).__name__, attributes, stored, references])
+        manifest = {
+            "rows": len(self.df),
+            "filters": self.filters,
+            "ranges": sorted(self.ranges),
+            "texts": sorted(self.texts),
+            "linked": list(self.linked.items()),
+            "sorted_values": sorted_values,
+            "indexes": indexes,
+        }
+        if version is None:
+            version = self.version
+        key = self.artifact_key(self.df, self.filters, self.ranges, self.texts, self.dimensions, version)
+        return save_artifact(path, key, manifest, arrays)
+
+    @classmethod
+    def load(cls, path, df, filters, ranges=None, texts=None, dimensions=None, version=None):
+        """
+        Loads the FilterIndex of df from its artifact under path, memory-mapping its arrays.
+
+        The mapped arrays are read-only and shared with every process mapping the same artifact,
+        and their pages are only read from disk when a filter touches them.
+
+        Parameters
+        ----------
+            path : str
+                Directory holding the artifacts.
+            df : DataFrame
+                The dataframe the artifact was built from.
+            filters, ranges, texts, dimensions : optional
+                The arguments the artifact was built with, see FilterIndex.
+            version : str, optional
+                The version passed to save(), if any.
+
+        Returns
+        -------
+            FilterIndex or None
+                The indexes, or None if no artifact of this format exists for the data and the
+                filter arguments.
+        """
+        loaded = load_artifact(path, cls.artifact_key(df, filters, ranges, texts, dimensions, version))
+        if loaded is None:
+            return None
+        manifest, arrays = loaded
+        if manifest["rows"] != len(df):
+            return None
+        classes = {index_class.__name__: index_class for index_class in [ColumnIndex, TextIndex, LinkedIndex, SortedIndex]}
+        data = cls.__new__(cls)
+        data.df = df
+        data.dimensions = dict(dimensions or {})
+        data.filters = manifest["filters"]
+        data.version = version
+        data.ranges = set(manifest["ranges"])
+        data.texts = set(manifest["texts"])
+        data.linked = dict(manifest["linked"])
+        data.sorted_values = {}
+        data.index = {}
+        for column_name, class_name, attributes, stored, _ in manifest["indexes"]:
+            index = classes[class_name].__new__(classes[class_name])
+            vars(index).update(attributes)
+            vars(index).update({name: arrays[file_name] for name, file_name in stored.items()})
+            if isinstance(index, ColumnIndex):
+                index.label_order = None
+                index.sorted_labels = None
+                # the dictionary of values is taken from the column at the first row of every value
+                if isinstance(index, LinkedIndex):
+                    dimension = data.dimensions[index.key]
+                    column = dimension[column_name]
+                    index.keys = pd.Index(dimension[index.key] if index.key in dimension.columns else dimension.index)
+                else:
+                    column = df[column_name]
+                index.values = pd.Index(column.array.take(index.order[index.offsets[:-1]]))
+            if isinstance(index, TextIndex):
+                index.labels = index.labels.tolist()
+                index.matches = {}
+            data.index[column_name] = index
+        for column_name, _, _, _, references in manifest["indexes"]:
+            for name, referenced in references.items():
+                setattr(data.index[column_name], name, data.index[referenced])
+        for column_name, file_name in manifest["sorted_values"]:
+            data.sorted_values[column_name] = data.index[column_name].take(arrays[file_name])
+        return data
+
+    @classmethod
+    def open(cls, path, df, filters, ranges=None, texts=None, dimensions=None, version=None):
+        """
+        Loads the FilterIndex of df from its artifact under path, building and saving it first if there is none.
+
+        The first process to start on new data builds the artifact; every later process, and
+        every restart, maps it at once. Building the artifact ahead of a deploy makes the first
+        start fast as well.
+
+            @st.cache_resource
+            def filter_index():
+                return FilterIndex.open('indexes/', load_sales(), filters=['region', 'country'])
+
+        Parameters
+        ----------
+            path : str
+                Directory holding the artifacts, created if missing.
+            df, filters, ranges, texts, dimensions :
+                The data and the filter arguments, see FilterIndex.
+            version : str, optional
+                Version of the data used in the key instead of the fingerprints, see save().
+
+        Returns
+        -------
+            FilterIndex
+                The loaded or freshly built indexes.
+        """
+        data = cls.load(path, df, filters, ranges, texts, dimensions, version)
+        if data is None:
+            data = cls(df, filters, ranges, texts, dimensions, version)
+            data.save(path)
+        return data
+
+    def sorted_options(self, filter_name):
+        """
+        Returns the distinct values of a filter sorted by label, the options of the default state.
+
+        The values are sorted on first use and kept, so every session offering all the values of
+        the filter reuses the order. Saved artifacts hold the order of every multiselect filter.
+        """
+        if filter_name not in self.sorted_values:
+            index = self.column_index(filter_name)
+            self.sorted_values[filter_name] = sort_values(index.take(np.arange(len(index.values))))
+        return self.sorted_values[filter_name]
+
+    def build_index(self, filter_name):
+        """Builds the SortedIndex, TextIndex or LinkedIndex of a range, contains or linked filter, or the ColumnIndex of any other filter."""
+        if filter_name in self.linked:
+            key = self.linked[filter_name]
+            dimension = self.dimensions[key]
+            keys = dimension[key] if key in dimension.columns else dimension.index
+            return LinkedIndex(dimension[filter_name], keys, key, self.column_index(key))
+        if filter_name in self.ranges:
+            return SortedIndex(self.df[filter_name])
+        if filter_name in self.texts:
+            return TextIndex(self.df[filter_name])
+        return self.column_index(filter_name)
+
+    def column_index(self, filter_name):
+        """Returns the value index of a column, building it on first use for columns outside of filters."""
+        if filter_name not in self.index:
+            self.index[filter_name] = ColumnIndex(self.df[filter_name])
+        return self.index[filter_name]
+
+    def append(self, rows):
+        """
+        Returns the FilterIndex of df with rows appended, updating every index from the new rows only.
+
+        The FilterIndex itself is not modified, so sessions still reading it are not affected.
+        Appending only adds values, so existing selections stay valid. The dimensions are
+        unchanged: keys of the new rows missing from their dimension never match a linked filter.
+
+        Parameters
+        ----------
+            rows : DataFrame
+                The new rows, with the columns of df.
+
+        Returns
+        -------
+            FilterIndex
+                The index of the dataframe with the new rows appended. A default RangeIndex of df
+                is continued; otherwise the index of rows is kept.
+
+        Exceptions
+        ----------
+        Raises StreamlitAPIException if rows lack columns of df.
+        """
+        missing = [column_name for column_name in self.df.columns if column_name not in rows.columns]
+        if missing:
+            raise StreamlitAPIException(f"appended rows must have the columns of df, missing {missing}")
+        df = pd.concat(
+            [self.df, rows[list(self.df.columns)]], ignore_index=isinstance(self.df.index, pd.RangeIndex)
+        )
+        append_fingerprint(df, self.df)
+
+        appended = copy.copy(self)
+        appended.df = df
+        if self.version is not None:
+            appended.version = (self.version, len(df))
+        appended.sorted_values = {}
+        appended.index = {}
+        for column_name, index in self.index.items():
+            if not isinstance(index, LinkedIndex):
+                appended.index[column_name] = index.append(df[column_name].iloc[len(self.df) :])
+        for column_name, index in self.index.items():
+            if isinstance(index, LinkedIndex):
+                appended.index[column_name] = index.relink(appended.index[index.key])
+        return appended
+
+    def nbytes(self):
+        """
+        Returns an estimate of the memory held by the dataframe, the dimensions and every index.
+
+        Returns
+        -------
+            dict
+                Bytes per component: 'df', 'dimensions' and one entry per indexed column. Indexes
+                referred to by other indexes are only counted under their own column.
+        """
+        sizes = {
+            "df": estimate_size(self.df),
+            "dimensions": sum(estimate_size(dimension) for dimension in self.dimensions.values()),
+        }
+        for column_name, index in list(self.index.items()):
+            if column_name not in sizes:
+                sizes[column_name] = sum(
+                    estimate_size(value) for value in vars(index).values() if not isinstance(value, ColumnIndex)
+                )
+        return sizes
+
+
+class FilterEngine:
+    """
+    The filtering logic of the dynamic filters, without Streamlit.
+
+    The engine takes the selections as a dictionary with filter names as keys and lists of
+    selected values as values, laid out like the session state of the filters, and returns row
+    positions, masks, options and filtered or aggregated rows. It reads no session state and
+    renders no widget, so it runs in any thread or process, e.g. to precompute exports or to
+    serve the filter logic from a worker pool. DynamicFilters and its subclasses are front-ends
+    reading the selections from the session state and rendering the results of an engine.
+
+        engine = FilterEngine(FilterIndex(df, filters=['region', 'country']))
+        result = engine.evaluate({'region': ['EMEA'], 'country': ['France', 'Japan']})
+        result['selections']        # {'region': ['EMEA'], 'country': ['France']}
+        result['options']           # options of both filters
+        engine.rows(result['selections'])
+
+    Batches of selection states are evaluated together by batch_positions(), batch_counts()
+    and batch_aggregate(), which look up each distinct selection of a filter once for the
+    whole batch and count or aggregate all states in a single NumPy or pandas call.
+
+    Attributes
+    ----------
+    data : FilterIndex
+        The dataframe and the value indexes.
+    cache : FilterCache or None
+        Cache of options and row positions shared across sessions.
+    profiler : FilterProfiler or None
+        Instrumentation whose run in progress in the calling thread gets the counters.
+    hide_empty : bool
+        If False, values without rows given the other selections are still offered.
+    high_cardinality : dict
+        Dictionary with filter names as keys and a maximum number of options as values.
+    count_options : bool
+        If True, the row count of every option is returned with the options.
+    max_workers : int or None
+        Size of the shared thread pool computing the filters concurrently.
+    row_sets : str
+        'masks' to combine the selections as boolean masks, or 'bitmaps' as compressed RowSets.
+    """
+
+    def __init__(
+        self,
+        data,
+        cache=None,
+        profiler=None,
+        hide_empty=True,
+        high_cardinality=None,
+        count_options=False,
+        max_workers=None,
+        row_sets="masks",
+    ):
+        """
+        Constructs the engine over a FilterIndex.
+
+        Parameters
+        ----------
+            data : FilterIndex
+                The dataframe and the value indexes of the filters.
+            cache : FilterCache, optional
+                Cache shared across engines for options and row positions. Disabled by default.
+            profiler : FilterProfiler, optional
+                Instrumentation counting the rows scanned and copied. Disabled by default.
+            hide_empty : bool, optional
+                If False, values without rows given the other selections are still offered.
+            high_cardinality : dict, optional
+                Dictionary with filter names as keys and a maximum number of options as values.
+            count_options : bool, optional
+                If True, options() also returns the row count of every option.
+            max_workers : int, optional
+                If set, the filters are computed concurrently on a shared thread pool of this size.
+            row_sets : str, optional
+                How the rows matching the selections are combined: 'masks' (boolean masks of one
+                byte per row), 'bitmaps' (RowSets, which store sorted positions for selective
+                sets and bitmaps of one bit per row otherwise) or 'auto' (either, picked for
+                every selection state, see use_row_sets()). 'bitmaps' keeps the intermediate
+                sets of tables with tens of millions of rows small, and only lists positions
+                for the rows that are returned. Default is 'masks'.
+
+        Exceptions
+        ----------
+        Raises StreamlitAPIException if row_sets is neither 'masks', 'bitmaps' nor 'auto'.
+        """
+        if row_sets not in ["masks", "bitmaps", "auto"]:
+            raise StreamlitAPIException("row_sets must be either 'masks', 'bitmaps' or 'auto'")
+        self.data = data
+        self.cache = cache
+        self.profiler = profiler
+        self.hide_empty = hide_empty
+        self.high_cardinality = high_cardinality if high_cardinality is not None else {}
+        self.count_options = count_options
+        self.max_workers = max_workers
+        self.row_sets = row_sets
+
+    @property
+    def df(self):
+        """The dataframe on which filters are applied."""
+        return self.data.df
+
+    @property
+    def index(self):
+        """The value indexes of the filters by filter name."""
+        return self.data.index
+
+    @property
+    def ranges(self):
+        """Names of the range filters."""
+        return self.data.ranges
+
+    @property
+    def texts(self):
+        """Names of the contains filters."""
+        return self.data.texts
+
+    @property
+    def linked(self):
+        """Key columns of the filters on dimension columns, by filter name."""
+        return self.data.linked
+
+    @property
+    def dimensions(self):
+        """Dimension dataframes by key column of df."""
+        return self.data.dimensions
+
+    def append(self, rows):
+        """Appends rows to the data, see FilterIndex.append(), and returns the new FilterIndex."""
+        self.data = self.data.append(rows)
+        return self.data
+
+    def column_index(self, filter_name):
+        """Returns the value index of a column, building it on first use for columns outside of filters."""
+        return self.data.column_index(filter_name)
+
+    def selection_key(self, selections, except_filters=()):
+        """
+        Returns the active selections except for the specified filters in a hashable form.
+
+        The order of values within a selection does not matter, so it is normalised to a frozenset.
+        """
+        return tuple(
+            (key, self.normalize_selection(key, values))
+            for key, values in selections.items()
+            if values and key not in except_filters
+        )
+
+    def normalize_selection(self, filter_name, values):
+        """Returns a selection in hashable form: the bounds of a range filter, the query of a contains filter, or the set of selected values."""
+        if filter_name in self.ranges or filter_name in self.texts:
+            return tuple(values)
+        return frozenset(values)
+
+    def summarize(self, filter_name, rows=None):
+        """
+        Returns the row counts over the value codes of a filter, or the bounds of a range filter, among the given rows.
+
+        Parameters
+        ----------
+            filter_name : str
+                The filter to summarize.
+            rows : ndarray or RowSet, optional
+                Boolean mask, array of positions or RowSet of rows. None selects all rows.
+        """
+        if filter_name in self.ranges:
+            return self.index[filter_name].bounds(rows)
+        return self.column_index(filter_name).counts(rows)
+
+    def cached(self, key, compute):
+        """
+        Returns the value for a key from the shared cache, computing it on a miss.
+
+        The key is prefixed with the version, or the fingerprints, of df and of the dimensions, see
+        FilterIndex.fingerprint(). Without a cache the value is always computed.
+        """
+        if self.cache is None:
+            return compute()
+        return self.cache.get_or_compute(self.data.fingerprint() + key, compute)
+
+    def map_filters(self, func, filter_names):
+        """
+        Applies a function to every filter, on the shared thread pool if max_workers is set.
+
+        The pool threads have no Streamlit script run context, so func must only use the engine
+        and its arguments. The profiler counters they add are collected and added to the run of
+        the calling thread.
+
+        Returns
+        -------
+            dict
+                Dictionary with filter names as keys and the results of func as values, in the
+                order of filter_names.
+        """
+        if self.max_workers is None or len(filter_names) < 2:
+            return {filter_name: func(filter_name) for filter_name in filter_names}
+        if self.profiler is None:
+            results = shared_executor(self.max_workers).map(func, filter_names)
+            return dict(zip(filter_names, results))
+
+        def task(filter_name):
+            with self.profiler.collect() as counters:
+                result = func(filter_name)
+            return result, counters
+
+        results = dict(zip(filter_names, shared_executor(self.max_workers).map(task, filter_names)))
+        for _, counters in results.values():
+            self.profiler.add(**counters)
+        return {filter_name: result for filter_name, (result, _) in results.items()}
+
+    def profile_count(self, **counters):
+        """Increments counters of the profiler run in progress in the calling thread, if any."""
+        if self.profiler is not None:
+            self.profiler.add(**counters)
+
+    def take_rows(self, positions):
+        """
+        Returns the rows of df at the given positions, or all rows if positions is None.
+
+        All rows are returned as a shallow copy of df, since df may be shared by every session:
+        adding or replacing columns of the result leaves df unchanged, without copying the data.
+        """
+        if positions is None:
+            return self.df.copy(deep=False)
+        self.profile_count(copies=1, rows_copied=len(positions))
+        return self.df.iloc[positions]
+
+    def use_row_sets(self, key):
+        """
+        Tells whether the selections of a selection key are combined as RowSets rather than masks.
+
+        With row_sets='auto', the rows of every selection are counted from the runs of its values
+        or its span in the sort order, without touching the rows. RowSets are used if one of
+        the selections is sparse, since every set combining it then stays a short list of
+        positions; dense selections are combined as boolean masks, which are counted faster.
+        """
+        if self.row_sets != "auto":
+            return self.row_sets == "bitmaps"
+        size = len(self.df)
+        return any(RowSet.sparse(self.column_index(filter_name).count(values), size) for filter_name, values in key)
+
+    def positions(self, selections, except_filters=()):
+        """
+        Looks up the row positions matching the selections except for the specified filters.
+
+        Parameters
+        ----------
+            selections : dict
+                Dictionary with filter names as keys and selected values as values.
+            except_filters : list of str, optional
+                Filter names that should be excluded from the current filtering operation.
+
+        Returns
+        -------
+            ndarray or None
+                Sorted row positions, or None if no filter restricts the rows.
+        """
+        key = self.selection_key(selections, except_filters)
+
+        def intersect():
+            if self.use_row_sets(key):
+                rows = None
+                for filter_name, values in key:
+                    index = self.column_index(filter_name)
+                    if rows is not None and rows.bits is None:
+                        # a sparse set is narrowed down directly instead of intersected
+                        self.profile_count(rows_scanned=len(rows))
+                        rows = RowSet(rows.size, rows=index.narrow(rows.rows, values))
+                        continue
+                    row_set = index.row_set(values)
+                    self.profile_count(rows_scanned=len(row_set))
+                    rows = row_set if rows is None else rows & row_set
+                return None if rows is None else rows.positions()
+            positions = None
+            for filter_name, values in key:
+                rows = self.column_index(filter_name).positions(values)
+                self.profile_count(rows_scanned=len(rows))
+                positions = rows if positions is None else intersect_positions(positions, rows)
+            return positions
+
+        return self.cached(("positions", key), intersect)
+
+    def rows(self, selections, except_filters=()):
+        """Returns the rows of df matching the selections except for the specified filters."""
+        return self.take_rows(self.positions(selections, except_filters))
+
+    def masks(self, selections):
+        """
+        Computes for every filter the mask of rows matching all the other filters.
+
+        The mask of each active filter is computed once. The mask excluding a filter is the AND
+        of the prefix of masks before it and the suffix of masks after it, so all filters are
+        covered with a linear number of mask operations. The masks are RowSets when
+        use_row_sets() tells so.
+
+        Returns
+        -------
+            dict
+                Dictionary with filter names as keys and boolean masks or RowSets as values. A
+                mask is None if no other filter restricts the rows.
+        """
+        active = [key for key, values in selections.items() if values]
+        method = "row_set" if self.use_row_sets([(key, selections[key]) for key in active]) else "mask"
+        masks = list(
+            self.map_filters(lambda key: getattr(self.column_index(key), method)(selections[key]), active).values()
+        )
+        self.profile_count(rows_scanned=len(self.df) * len(masks))
+
+        prefix = [None]
+        for mask in masks:
+            prefix.append(mask if prefix[-1] is None else prefix[-1] & mask)
+        suffix = [None]
+        for mask in reversed(masks):
+            suffix.append(mask if suffix[-1] is None else suffix[-1] & mask)
+        suffix.reverse()
+
+        position = {key: i for i, key in enumerate(active)}
+
+        def except_mask(key):
+            if key not in position:
+                return prefix[-1]
+            i = position[key]
+            before, after = prefix[i], suffix[i + 1]
+            if before is None or after is None:
+                return after if before is None else before
+            return before & after
+
+        return self.map_filters(except_mask, list(selections))
+
+    def counts(self, selections):
+        """
+        Returns the row counts of the values of every filter based on the selections of the other filters.
+
+        Returns
+        -------
+            dict
+                Dictionary with filter names as keys and row counts over the value codes, or the
+                bounds of range filters, as values.
+        """
+        def count():
+            masks = self.masks(selections)
+            self.profile_count(rows_scanned=sum(mask.size for mask in masks.values() if mask is not None))
+            return self.map_filters(lambda key: self.summarize(key, masks[key]), list(masks))
+
+        return self.cached(("counts", tuple(selections), self.selection_key(selections)), count)
+
+    def cascade(self, selections, previous=None):
+        """
+        Evaluates the selections as a hierarchy, level by level in the order of the filters.
+
+        Level k starts from the rows left by level k-1 and narrows them by the selection of
+        level k-1, so no level re-applies the filters above it. Levels whose selections above
+        are unchanged since the previous cascade are taken from it, and from the shared cache
+        otherwise, when one is configured.
+
+        Parameters
+        ----------
+            selections : dict
+                Dictionary with filter names as keys and selected values as values.
+            previous : dict, optional
+                The result of the previous call, whose levels are reused.
+
+        Returns
+        -------
+            dict
+                Dictionary with the keys 'levels', one entry per level with the keys 'filter',
+                'selected', 'positions' (rows available to the level, None for all rows) and
+                'counts' (row counts over the level's value codes), 'positions' (rows matching
+                the selections of all levels, None for all rows) and 'df'.
+        """
+        cached_levels = previous["levels"] if previous is not None and previous["df"] is self.df else []
+
+        levels = []
+        positions = None
+        reusable = True
+        selections_above = ()
+        for depth, (filter_name, values) in enumerate(selections.items()):
+            reusable = (
+                reusable
+                and depth < len(cached_levels)
+                and cached_levels[depth]["filter"] == filter_name
+            )
+            if reusable:
+                positions = cached_levels[depth]["positions"]
+                counts = cached_levels[depth]["counts"]
+            else:
+                above = levels[-1] if levels else None
+
+                def evaluate_level():
+                    rows = positions
+                    if above is not None and above["selected"]:
+                        self.profile_count(rows_scanned=len(self.df) if rows is None else len(rows))
+                        rows = self.column_index(above["filter"]).narrow(rows, above["selected"])
+                    return rows, self.summarize(filter_name, rows)
+
+                positions, counts = self.cached(("level", filter_name, selections_above), evaluate_level)
+
+            levels.append(
+                {
+                    "filter": filter_name,
+                    "selected": list(values),
+                    "positions": positions,
+                    "counts": counts,
+                }
+            )
+            reusable = reusable and cached_levels[depth]["selected"] == levels[-1]["selected"]
+            if values:
+                selections_above += ((filter_name, self.normalize_selection(filter_name, values)),)
+
+        if reusable and len(cached_levels) == len(levels):
+            positions = previous["positions"]
+        elif levels and levels[-1]["selected"]:
+            last = levels[-1]
+            positions = self.cached(
+                ("positions", selections_above),
+                lambda: self.column_index(last["filter"]).narrow(positions, last["selected"]),
+            )
+
+        return {"df": self.df, "levels": levels, "positions": positions}
+
+    def options(self, filter_counts, selections, queries=None):
+        """
+        Decodes the options of every filter from the row counts of its values.
+
+        The same counts mark the values a selection may keep, and label and order the options.
+        Range filters get their bounds instead, and contains filters their row counts.
+
+        Parameters
+        ----------
+            filter_counts : dict
+                Dictionary with filter names as keys and row counts over the value codes as values.
+            selections : dict
+                Dictionary with filter names as keys and selected values as values.
+            queries : dict, optional
+                Dictionary with high-cardinality filter names as keys and search queries as values.
+
+        Returns
+        -------
+            dict
+                Dictionary with filter names as keys and lists of options as values.
+            dict
+                Dictionary with filter names as keys and boolean arrays over the value codes
+                marking the values a selection may keep.
+            dict
+                Dictionary with filter names as keys and dictionaries of row counts by option as
+                values, if count_options is set.
+        """
+        queries = queries or {}
+
+        def decode(key):
+            counts = filter_counts[key]
+            if key in self.ranges:
+                return self.index[key].decode(counts), None, None
+            if key in self.texts:
+                return counts, None, None
+            options = self.decode_options(key, counts, selections[key], queries.get(key, ""))
+            presence = counts > 0 if self.hide_empty else np.ones(len(counts), dtype=bool)
+            option_counts = None
+            if self.count_options:
+                codes = self.column_index(key).value_codes(options)
+                option_counts = dict(zip(options, counts[codes].tolist()))
+            return options, presence, option_counts
+
+        decoded = self.map_filters(decode, list(filter_counts))
+        return (
+            {key: options for key, (options, _, _) in decoded.items()},
+            {key: presence for key, (_, presence, _) in decoded.items() if presence is not None},
+            {key: option_counts for key, (_, _, option_counts) in decoded.items() if option_counts is not None},
+        )
+
+    def decode_options(self, filter_name, counts, selected=(), query=""):
+        """
+        Decodes the options of a filter from the row counts of its values.
+
+        High-cardinality filters only get the values with the most rows among those matching the
+        query, plus the selected values. Selected values without rows are only dropped when
+        hide_empty is set, so the options hold every selection valid_selections() keeps.
+        """
+        index = self.column_index(filter_name)
+        if filter_name not in self.high_cardinality:
+            return index.decode(counts > 0 if self.hide_empty else np.ones(len(counts), dtype=bool))
+        codes = index.top(counts, self.high_cardinality[filter_name], query)
+        selected = index.value_codes(selected)
+        selected = selected[selected >= 0]
+        if self.hide_empty:
+            selected = selected[counts[selected] > 0]
+        codes = np.concatenate((selected, codes))
+        return index.take(pd.unique(codes))
+
+    def valid_selections(self, filter_name, selected, options, presence=None):
+        """
+        Returns the selected values of a filter that are among its options.
+
+        The check runs on the value codes when presence holds the filter, and on the values
+        themselves otherwise. Range and contains selections are kept as they are, since a range
+        or a query stays meaningful when the values offered change. A missing value selected in any
+        form, e.g. NaN or NaT, is replaced by None, the form the options hold it in.
+        """
+        if filter_name in self.ranges or filter_name in self.texts:
+            return list(selected)
+        selected = self.column_index(filter_name).canonical(selected)
+        if presence is not None and filter_name in presence:
+            keep = self.column_index(filter_name).contains(selected, presence[filter_name])
+        else:
+            keep = pd.Index(options).get_indexer(selected) >= 0
+        return [value for value, valid in zip(selected, keep) if valid]
+
+    def evaluate(self, selections, hierarchical=False, queries=None):
+        """
+        Settles the selections and returns the options and the matching rows.
+
+        Selected values that are not among the options are removed until no selection changes,
+        as the front-ends do between script runs.
+
+        Parameters
+        ----------
+            selections : dict
+                Dictionary with filter names as keys and selected values as values, in filter order.
+            hierarchical : bool, optional
+                If True, the options of every filter follow the selections above it only, as in
+                DynamicFiltersHierarchical. Default follows the selections of all other filters.
+            queries : dict, optional
+                Dictionary with high-cardinality filter names as keys and search queries as values.
+
+        Returns
+        -------
+            dict
+                Dictionary with the keys 'selections' (the settled selections), 'options',
+                'option_counts' (if count_options is set) and 'positions' (the matching rows,
+                None for all rows).
+        """
+        selections = {key: list(values) for key, values in selections.items()}
+        state = None
+        while True:
+            if hierarchical:
+                state = self.cascade(selections, state)
+                filter_counts = {level["filter"]: level["counts"] for level in state["levels"]}
+            else:
+                filter_counts = self.counts(selections)
+            options, presence, option_counts = self.options(filter_counts, selections, queries)
+            valid = self.map_filters(
+                lambda key: self.valid_selections(key, selections[key], options[key], presence), list(selections)
+            )
+            if valid == selections:
+                break
+            selections = valid
+        return {
+            "selections": selections,
+            "options": options,
+            "option_counts": option_counts,
+            "positions": state["positions"] if hierarchical else self.positions(selections),
+        }
+
+    def aggregate(self, selections, group_by, numerics, aggregation="sum", cube=None):
+        """
+        Aggregates the numerics by the given columns over the rows matching the selections.
+
+        The group-by is answered from the rollups of the cube when one is given and it holds the
+        grouped and selected columns and the numerics, aggregated the same way, see
+        AggregationCube.answers(). It is not used while a range, contains or linked selection is
+        active or a dimension column is grouped by, since the rollups match the values of df.
+        Otherwise the matching rows are grouped, looking up dimension columns for them only.
+
+        Parameters
+        ----------
+            selections : dict
+                Dictionary with filter names as keys and selected values as values.
+            group_by : list of str
+                Columns to group by.
+            numerics : list of str
+                Columns of df that are aggregated.
+            aggregation : str, optional
+                One of 'sum', 'mean', 'min', 'max' or 'count'. Default is 'sum'.
+            cube : AggregationCube, optional
+                Pre-aggregated rollups of df.
+
+        Returns
+        -------
+            DataFrame
+                One row per group with the group columns followed by the aggregated numerics.
+        """
+        through_rows = any(
+            selections.get(name) for name in self.ranges | self.texts | set(self.linked)
+        ) or any(column_name in self.linked for column_name in group_by)
+        active = [name for name, values in selections.items() if values]
+        if cube is not None and not through_rows and cube.answers(list(group_by) + active, numerics, aggregation):
+            df = cube.query(selections, group_by)
+            if df.shape[0] > 0:
+                return df[list(group_by) + list(numerics)]
+        return self.group(self.rows(selections), group_by, numerics, aggregation)
+
+    def group(self, df, group_by, numerics, aggregation):
+        """Aggregates the numerics of rows of df by the given columns, looking up dimension columns by key."""
+        df = df.assign(
+            **{
+                column_name: self.index[column_name].lookup(df[self.linked[column_name]])
+                for column_name in group_by
+                if column_name in self.linked
+            }
+        )
+        return df[list(group_by) + list(numerics)].groupby(list(group_by), as_index=False).agg(aggregation)
+
+    def batch_positions(self, states, except_filters=()):
+        """
+        Looks up the row positions matching each of a batch of selection states.
+
+        Each distinct selection of a filter is looked up once for the whole batch, and states
+        starting with the same active selections share the intersection of their rows.
+
+        Parameters
+        ----------
+            states : list of dict
+                Selection states, each a dictionary with filter names as keys and selected values
+                as values.
+            except_filters : list of str, optional
+                Filter names that are excluded in every state.
+
+        Returns
+        -------
+            list
+                Sorted row positions per state, or None for the states restricting no rows.
+        """
+        lookups = {}
+        prefixes = {(): None}
+        batch = []
+        for selections in states:
+            key = self.selection_key(selections, except_filters)
+            for depth, selection in enumerate(key):
+                if key[: depth + 1] in prefixes:
+                    continue
+                if selection not in lookups:
+                    lookups[selection] = self.column_index(selection[0]).positions(selection[1])
+                    self.profile_count(rows_scanned=len(lookups[selection]))
+                positions = prefixes[key[:depth]]
+                rows = lookups[selection]
+                prefixes[key[: depth + 1]] = rows if positions is None else intersect_positions(positions, rows)
+            batch.append(prefixes[key])
+        return batch
+
+    def batch_counts(self, states):
+        """
+        Returns, for a batch of selection states, the row counts of the values of every filter based on the selections of the other filters.
+
+        The counts of a filter over all states come from one bincount over the value codes of
+        the rows of every state, offset by the position of the state.
+
+        Parameters
+        ----------
+            states : list of dict
+                Selection states with the same filters, e.g. every option of a filter selected in turn.
+
+        Returns
+        -------
+            dict
+                Dictionary with filter names as keys and arrays of shape (states, values) of row
+                counts over the value codes as values. Range filters get a list of bounds per
+                state instead.
+        """
+        results = {}
+        for filter_name in (states[0] if states else {}):
+            batch = self.batch_positions(states, [filter_name])
+            if filter_name in self.ranges:
+                results[filter_name] = [self.summarize(filter_name, rows) for rows in batch]
+                continue
+            index = self.column_index(filter_name)
+            width = len(index.values)
+            counts = np.zeros((len(states), width), dtype=np.intp)
+            unrestricted = [state for state, rows in enumerate(batch) if rows is None]
+            if unrestricted:
+                counts[unrestricted] = index.counts()
+            restricted = [state for state, rows in enumerate(batch) if rows is not None]
+            if restricted:
+                codes = [index.row_codes(batch[state]) for state in restricted]
+                self.profile_count(rows_scanned=sum(len(state_codes) for state_codes in codes))
+                offsets = np.repeat(np.array(restricted) * width, [len(state_codes) for state_codes in codes])
+                codes = np.concatenate(codes)
+                linked = codes >= 0
+                counts += np.bincount(
+                    (codes + offsets)[linked], minlength=len(states) * width
+                ).reshape(len(states), width)
+            results[filter_name] = counts
+        return results
+
+    def batch_aggregate(self, states, group_by, numerics, aggregation="sum"):
+        """
+        Aggregates the numerics by the given columns over the rows matching each of a batch of selection states.
+
+        The rows of all states are gathered once and aggregated by a single group-by on the
+        position of the state and the group columns.
+
+        Parameters
+        ----------
+            states : list of dict
+                Selection states, each a dictionary with filter names as keys and selected values as values.
+            group_by : list of str
+                Columns to group by.
+            numerics : list of str
+                Columns of df that are aggregated.
+            aggregation : str, optional
+                One of 'sum', 'mean', 'min', 'max' or 'count'. Default is 'sum'.
+
+        Returns
+        -------
+            DataFrame
+                One row per state and group, with a 'selection_state' column holding the position of the
+                state in states, followed by the group columns and the aggregated numerics.
+
+        Exceptions
+        ----------
+        Raises StreamlitAPIException if aggregation is not supported.
+        """
+        if aggregation not in PARTIALS:
+            raise StreamlitAPIException(
+                "aggregation must be either 'sum', 'mean', 'min', 'max' or 'count'"
+            )
+        batch = [np.arange(len(self.df)) if rows is None else rows for rows in self.batch_positions(states)]
+        positions = np.concatenate(batch) if batch else np.array([], dtype=np.intp)
+        df = self.take_rows(positions)
+        df = df.assign(selection_state=np.repeat(np.arange(len(batch)), [len(rows) for rows in batch]))
+        return self.group(df, ["selection_state"] + list(group_by), numerics, aggregation)
+
+    def common_states(self, filters=None, per_filter=10):
+        """
+        Returns the selection states users land on most: the default state and single-value selections.
+
+        Parameters
+        ----------
+            filters : list of str, optional
+                The filters of the states, in the order of the front-end. Default is all filters
+                of the data.
+            per_filter : int, optional
+                Number of values of every multiselect filter selected alone, those with the most
+                rows first.
+
+        Returns
+        -------
+            list of dict
+                The state without selections, followed by the states selecting one value of one filter.
+        """
+        filters = list(filters) if filters is not None else list(self.data.filters)
+        default = {filter_name: [] for filter_name in filters}
+        states = [default]
+        for filter_name in filters:
+            if filter_name in self.ranges or filter_name in self.texts:
+                continue
+            index = self.column_index(filter_name)
+            for value in index.take(index.top(index.counts(), per_filter)):
+                states.append({**default, filter_name: [value]})
+        return states
+
+    def warm_up(self, states=None, filters=None, per_filter=10):
+        """
+        Precomputes the option counts and the row positions of selection states into the cache.
+
+        The states are evaluated as one batch, see batch_counts() and batch_positions(), and
+        stored under the keys counts() and positions() look up, so the first sessions landing on
+        them, e.g. right after a deploy, are answered from the cache.
+
+        Parameters
+        ----------
+            states : list of dict, optional
+                Selection states to precompute. Filters missing from a state are not selected.
+                Default is common_states().
+            filters : list of str, optional
+                The filters of the front-end, in its order. Default is all filters of the data.
+            per_filter : int, optional
+                Number of single-value selections per filter of the default states.
+
+        Returns
+        -------
+            int
+                Number of states precomputed.
+
+        Exceptions
+        ----------
+        Raises StreamlitAPIException if the engine has no cache.
+        """
+        if self.cache is None:
+            raise StreamlitAPIException("warm_up requires a cache to store the states in")
+        filters = list(filters) if filters is not None else list(self.data.filters)
+        if states is None:
+            states = self.common_states(filters, per_filter)
+        states = [{filter_name: list(state.get(filter_name, [])) for filter_name in filters} for state in states]
+        counts = self.batch_counts(states)
+        positions = self.batch_positions(states)
+        for number, selections in enumerate(states):
+            key = self.selection_key(selections)
+            state_counts = {
+                filter_name: value[number] if filter_name in self.ranges else value[number].copy()
+                for filter_name, value in counts.items()
+            }
+            self.cached(("counts", tuple(selections), key), lambda: state_counts)
+            self.cached(("positions", key), lambda: positions[number])
+        return len(states)
@@ -0,0 +1,243 @@
+import contextlib
+import threading
+import time
+from collections import deque
+
+import pandas as pd
+import streamlit as st
+
+# counters of a run incremented by the filters
+COUNTERS = ("rows_scanned", "rows_copied", "copies")
+
+
+class FilterProfiler:
+    """
+    Opt-in instrumentation of the script runs of dynamic filters.
+
+    A run starts when display_filters() is called and ends after display_df(), or when
+    display_filters() requests a rerun because a selection changed. Each run is recorded as a
+    dictionary with the keys:
+
+        filters_name   name of the filters object in session state
+        started        wall clock time at which the run started
+        seconds        duration of the run
+        stages         seconds spent per stage: 'options' (options and counts of all filters),
+                       'sort' (sorting options), 'widgets' (rendering widgets), 'display_df'
+                       (filtering and rendering the dataframe) and 'aggregate' (group-bys).
+                       Nested stages are not counted in the stage around them.
+        filters        seconds spent per filter on sorting its options and rendering its widget
+        rows_scanned   rows visited by lookups, masks and counts
+        rows_copied    rows copied out of the dataframe
+        copies         number of copies of the dataframe
+        rerun          True if the run ended with st.rerun()
+
+    Runs are kept per thread, so one profiler can be shared by all sessions, e.g. with
+    st.cache_resource. Counters added by pool threads working for a run are collected with
+    collect() and added to the run by the thread that waits for them. Finished runs are
+    appended to a bounded history and passed to the callback, which can export them to a
+    metrics system:
+
+        profiler = FilterProfiler(callback=lambda run: metrics.record("filters", run))
+        dynamic_filters = DynamicFilters(df, filters=['region', 'country'], profiler=profiler)
+
+    Attributes
+    ----------
+    callback : callable or None
+        Function called with every finished run.
+    history : deque
+        The most recent finished runs of all threads.
+    runs : int
+        Number of finished runs.
+    reruns : int
+        Number of runs that ended with st.rerun().
+    """
+
+    def __init__(self, callback=None, history=100):
+        """
+        Constructs a profiler without runs.
+
+        Parameters
+        ----------
+            callback : callable, optional
+                Function called with the dictionary of every finished run.
+            history : int, optional
+                Number of finished runs kept in history.
+        """
+        self.callback = callback
+        self.history = deque(maxlen=history)
+        self.runs = 0
+        self.reruns = 0
+        self.totals = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def current_run(self):
+        """Returns the run in progress in the current thread, or None."""
+        return getattr(self._local, "run", None)
+
+    def last_run(self):
+        """Returns the last finished run of the current thread, or None."""
+        return getattr(self._local, "last", None)
+
+    def start_run(self, filters_name):
+        """Starts a run in the current thread, finishing the run in progress first."""
+        self.finish_run()
+        self._local.run = {
+            "filters_name": filters_name,
+            "started": time.time(),
+            "seconds": 0.0,
+            "stages": {},
+            "filters": {},
+            "rerun": False,
+            **{counter: 0 for counter in COUNTERS},
+        }
+        self._local.start = time.perf_counter()
+        self._local.stack = []
+
+    @contextlib.contextmanager
+    def stage(self, name, filter_name=None):
+        """
+        Times a stage of the run in progress, excluding the stages nested in it.
+
+        Parameters
+        ----------
+            name : str
+                Name of the stage.
+            filter_name : str, optional
+                Filter the time is also attributed to.
+        """
+        run = self.current_run()
+        if run is None:
+            yield
+            return
+        stack = self._local.stack
+        nested = [0.0]
+        stack.append(nested)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            stack.pop()
+            if stack:
+                stack[-1][0] += elapsed
+            own = elapsed - nested[0]
+            run["stages"][name] = run["stages"].get(name, 0.0) + own
+            if filter_name is not None:
+                run["filters"][filter_name] = run["filters"].get(filter_name, 0.0) + own
+
+    def add(self, **counters):
+        """Increments counters of the run in progress, or of the collection in progress, e.g. add(rows_scanned=1000)."""
+        collected = getattr(self._local, "collected", None)
+        if collected is not None:
+            for counter, value in counters.items():
+                collected[counter] = collected.get(counter, 0) + int(value)
+            return
+        run = self.current_run()
+        if run is not None:
+            for counter, value in counters.items():
+                run[counter] += int(value)
+
+    @contextlib.contextmanager
+    def collect(self):
+        """
+        Collects the counters added in the current thread instead of adding them to a run.
+
+        Used by pool threads computing part of a run of another thread: the dictionary yielded
+        holds the collected counters once the block exits, and the thread owning the run adds
+        them with add().
+        """
+        previous = getattr(self._local, "collected", None)
+        self._local.collected = collected = {}
+        try:
+            yield collected
+        finally:
+            self._local.collected = previous
+
+    def finish_run(self, rerun=False):
+        """
+        Finishes the run in progress in the current thread.
+
+        Parameters
+        ----------
+            rerun : bool, optional
+                True if the run ends with st.rerun().
+
+        Returns
+        -------
+            dict or None
+                The finished run, or None if no run was in progress.
+        """
+        run = self.current_run()
+        if run is None:
+            return None
+        self._local.run = None
+        run["seconds"] = time.perf_counter() - self._local.start
+        run["rerun"] = rerun
+        self._local.last = run
+        with self._lock:
+            self.history.append(run)
+            self.runs += 1
+            self.reruns += int(rerun)
+            for name, seconds in run["stages"].items():
+                self.totals[name] = self.totals.get(name, 0.0) + seconds
+        if self.callback is not None:
+            self.callback(run)
+        return run
+
+    def clear(self):
+        """Removes the history and resets the counters."""
+        with self._lock:
+            self.history.clear()
+            self.runs = 0
+            self.reruns = 0
+            self.totals = {}
+
+    def stats(self):
+        """
+        Returns the counters of all finished runs.
+
+        Returns
+        -------
+            dict
+                Dictionary with the keys 'runs', 'reruns' and 'stages' (total seconds per stage).
+        """
+        with self._lock:
+            return {"runs": self.runs, "reruns": self.reruns, "stages": dict(self.totals)}
+
+    def display_expander(self, label="Filter profile", expanded=False):
+        """
+        Renders the last finished run of the current session in an expander, for debugging.
+
+        Call it after display_df().
+
+        Parameters
+        ----------
+            label : str, optional
+                Label of the expander.
+            expanded : bool, optional
+                If True, the expander is open initially.
+        """
+        run = self.last_run()
+        with st.expander(label, expanded=expanded):
+            if run is None:
+                st.caption("No run recorded yet.")
+                return
+            st.caption(
+                f"{run['seconds'] * 1000:,.1f} ms, {run['rows_scanned']:,} rows scanned, "
+                f"{run['copies']} copies of {run['rows_copied']:,} rows, "
+                f"{self.reruns} reruns out of {self.runs} runs"
+            )
+            st.dataframe(
+                pd.DataFrame(
+                    {"stage": list(run["stages"]), "ms": [seconds * 1000 for seconds in run["stages"].values()]}
+                ),
+                hide_index=True,
+            )
+            if run["filters"]:
+                st.dataframe(
+                    pd.DataFrame(
+                        {"filter": list(run["filters"]), "ms": [seconds * 1000 for seconds in run["filters"].values()]}
+                    ),
+                    hide_index=True,
+                )
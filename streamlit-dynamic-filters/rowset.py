@@ -0,0 +1,203 @@
+import numpy as np
+
+# a row set holding fewer rows than this fraction of the table stores their positions, since
+# 8-byte positions only cost less than one bit per row of the table below 1/64
+SPARSE_DENSITY = 1 / 64
+# rows of a bitmap unpacked at once when it is scanned, a multiple of 8
+CHUNK_ROWS = 2**20
+# number of set bits of every byte, for NumPy versions without bitwise_count
+POPCOUNT = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.uint8)
+
+
+def intersect_positions(positions, rows):
+    """
+    Returns the positions found in both sorted arrays of unique positions.
+
+    The smaller array is searched in the larger one, unless both are of similar size, in which
+    case the larger one is scattered into a boolean mask.
+    """
+    if len(rows) < len(positions):
+        positions, rows = rows, positions
+    if not len(positions):
+        return positions
+    if len(positions) * 8 < len(rows):
+        found = np.minimum(np.searchsorted(rows, positions), len(rows) - 1)
+        return positions[rows[found] == positions]
+    keep = np.zeros(max(rows[-1], positions[-1]) + 1, dtype=bool)
+    keep[rows] = True
+    return positions[keep[positions]]
+
+
+def count_bits(bits):
+    """Returns the number of set bits in an array of bytes."""
+    if hasattr(np, "bitwise_count"):
+        return int(np.bitwise_count(bits).sum(dtype=np.int64))
+    return int(POPCOUNT[bits].sum(dtype=np.int64))
+
+
+class RowSet:
+    """
+    A set of rows of a table, compressed according to its density.
+
+    Like the containers of Roaring bitmaps, a sparse set is stored as its sorted row positions
+    and a dense one as a bitmap of one bit per row of the table, so a set never takes more than
+    one bit per row, against one byte per row for a boolean mask and eight for positions. AND
+    and OR combine sets without expanding them: bitmaps byte by byte, positions by merging, and
+    positions against a bitmap by testing their bits, and each result is stored in the form its
+    density calls for. Bitmaps are scanned in chunks of CHUNK_ROWS rows, so counting values or
+    listing positions never materialises a mask over the whole table.
+
+        selected = index.row_set(['EMEA']) & other_index.row_set(['Retail'])
+        counts = third_index.counts(selected)
+        rows = df.iloc[selected.positions()]
+
+    Attributes
+    ----------
+    size : int
+        Number of rows of the table.
+    rows : ndarray or None
+        Sorted row positions of a sparse set.
+    bits : ndarray or None
+        Bitmap of a dense set, packed into bytes with the first row in the lowest bit.
+    """
+
+    def __init__(self, size, rows=None, bits=None):
+        """
+        Constructs a set from either its sorted row positions or its packed bitmap.
+
+        Parameters
+        ----------
+            size : int
+                Number of rows of the table.
+            rows : ndarray, optional
+                Sorted unique row positions.
+            bits : ndarray, optional
+                Bitmap packed into (size + 7) // 8 bytes with np.packbits(mask, bitorder='little').
+        """
+        self.size = size
+        self.rows = rows
+        self.bits = bits
+        if rows is None and bits is None:
+            self.rows = np.empty(0, dtype=np.intp)
+
+    @staticmethod
+    def sparse(count, size):
+        """Returns True if a set of count rows out of size is stored as positions."""
+        return count < size * SPARSE_DENSITY
+
+    @classmethod
+    def from_positions(cls, positions, size):
+        """Returns the set of the given sorted unique row positions, packed into a bitmap if it is dense."""
+        if cls.sparse(len(positions), size):
+            return cls(size, rows=positions)
+        return cls(size, bits=cls.pack_positions(positions, size))
+
+    @classmethod
+    def from_chunks(cls, size, chunk):
+        """
+        Returns the set of the rows marked by a function, packing its masks chunk by chunk.
+
+        Parameters
+        ----------
+            size : int
+                Number of rows of the table.
+            chunk : callable
+                Function taking the first and the last row of a chunk, end excluded, and returning
+                a boolean mask over the rows of the chunk.
+        """
+        bits = np.empty((size + 7) // 8, dtype=np.uint8)
+        for start in range(0, size, CHUNK_ROWS):
+            stop = min(start + CHUNK_ROWS, size)
+            bits[start // 8 : (stop + 7) // 8] = np.packbits(chunk(start, stop), bitorder="little")
+        return cls(size, bits=bits).compact()
+
+    def compact(self):
+        """Returns the set stored as positions if it is sparse, or the set itself."""
+        if self.bits is not None and self.sparse(len(self), self.size):
+            return RowSet(self.size, rows=self.positions())
+        return self
+
+    def __len__(self):
+        if self.rows is not None:
+            return len(self.rows)
+        return count_bits(self.bits)
+
+    @property
+    def nbytes(self):
+        """Bytes held by the positions or the bitmap."""
+        return (self.rows if self.rows is not None else self.bits).nbytes
+
+    def chunks(self):
+        """Yields the first row of every chunk of the bitmap and the boolean mask over its rows."""
+        for start in range(0, self.size, CHUNK_ROWS):
+            stop = min(start + CHUNK_ROWS, self.size)
+            mask = np.unpackbits(
+                self.bits[start // 8 : (stop + 7) // 8], count=stop - start, bitorder="little"
+            ).view(bool)
+            yield start, mask
+
+    def positions(self):
+        """Returns the sorted row positions of the set."""
+        if self.rows is not None:
+            return self.rows
+        runs = [start + np.flatnonzero(mask) for start, mask in self.chunks()]
+        return np.concatenate(runs) if runs else np.empty(0, dtype=np.intp)
+
+    def contains(self, positions):
+        """Returns a boolean array telling for each of the given row positions whether the set holds it."""
+        if self.rows is not None:
+            found = np.minimum(np.searchsorted(self.rows, positions), max(len(self.rows) - 1, 0))
+            return self.rows[found] == positions if len(self.rows) else np.zeros(len(positions), dtype=bool)
+        return ((self.bits[positions >> 3] >> (positions & 7).astype(np.uint8)) & 1).astype(bool)
+
+    def find(self, positions, reverse=False):
+        """
+        Returns the index of the first, or last, of the given row positions held by the set, or -1.
+
+        The positions are tested in chunks, so the search stops at the first chunk with a hit.
+        """
+        steps = range(0, len(positions), CHUNK_ROWS)
+        for start in reversed(steps) if reverse else steps:
+            hits = np.flatnonzero(self.contains(positions[start : start + CHUNK_ROWS]))
+            if len(hits):
+                return start + int(hits[-1] if reverse else hits[0])
+        return -1
+
+    def bincount(self, codes, minlength):
+        """Returns the number of rows of the set holding each code, given the codes of all rows of the table."""
+        if self.rows is not None:
+            return np.bincount(codes[self.rows], minlength=minlength)
+        counts = np.zeros(minlength, dtype=np.intp)
+        for start, mask in self.chunks():
+            counts += np.bincount(codes[start : start + len(mask)][mask], minlength=minlength)
+        return counts
+
+    def __and__(self, other):
+        if self.rows is not None and other.rows is not None:
+            return RowSet(self.size, rows=intersect_positions(self.rows, other.rows))
+        if self.rows is not None or other.rows is not None:
+            sparse, dense = (self, other) if self.rows is not None else (other, self)
+            return RowSet(self.size, rows=sparse.rows[dense.contains(sparse.rows)])
+        return RowSet(self.size, bits=self.bits & other.bits).compact()
+
+    def __or__(self, other):
+        if self.rows is not None and other.rows is not None:
+            return RowSet.from_positions(np.union1d(self.rows, other.rows), self.size)
+        return RowSet(self.size, bits=self.pack() | other.pack())
+
+    def pack(self):
+        """Returns the bitmap of the set, packing its positions if it is sparse."""
+        if self.bits is not None:
+            return self.bits
+        return self.pack_positions(self.rows, self.size)
+
+    @staticmethod
+    def pack_positions(positions, size):
+        """Returns the bitmap of the given sorted unique row positions over a table of size rows."""
+        bits = np.zeros((size + 7) // 8, dtype=np.uint8)
+        if len(positions):
+            index = positions >> 3
+            flags = np.left_shift(1, positions & 7).astype(np.uint8)
+            starts = np.flatnonzero(np.concatenate(([True], index[1:] != index[:-1])))
+            bits[index[starts]] = np.bitwise_or.reduceat(flags, starts)
+        return bits
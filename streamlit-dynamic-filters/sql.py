@@ -0,0 +1,231 @@
+import pandas as pd
+import streamlit as st
+from streamlit.errors import StreamlitAPIException
+
+from .dynamic_filters import DynamicFilters
+from .engine import is_missing
+
+try:
+    import duckdb
+except ImportError:  # pragma: no cover - optional dependency
+    duckdb = None
+
+
+@st.cache_resource(show_spinner=False)
+def shared_connection(database=None):
+    """Returns the DuckDB connection of the process to a database file opened read-only, or to an in-memory database for None."""
+    if database is None:
+        return duckdb.connect()
+    return duckdb.connect(database, read_only=True)
+
+
+class DynamicFiltersDuckDB(DynamicFilters):
+    """
+    A class that extends DynamicFilters to filter a DuckDB relation instead of an in-memory dataframe.
+
+    Selections are pushed down to DuckDB as `col IN (...)` predicates and the options of every
+    filter come from `SELECT DISTINCT` queries, so only the final filtered result is pulled into
+    pandas. The widgets and the session state layout are the same as in DynamicFilters.
+
+    A database file is opened once per process, with st.cache_resource, and every instance
+    queries it through a cursor of its own, since a connection must not be used by several
+    threads at once.
+
+    Requires the optional duckdb dependency: pip install streamlit-dynamic-filters[duckdb]
+
+    Attributes
+    ----------
+    relation : DuckDBPyRelation
+        The relation on which filters are applied.
+    filters : dict
+        Dictionary with filter names as keys and their selected values as values.
+
+    Notes
+    -----
+    NULL values are offered as one None option, sorted last, like the missing values of the
+    pandas backends, and selecting it matches the rows where the column IS NULL.
+    """
+
+    def __init__(self, source, filters, filters_name="filters", table=None, connection=None, profiler=None):
+        """
+        Constructs all the necessary attributes for the DynamicFiltersDuckDB object.
+
+        Parameters
+        ----------
+            source : DuckDBPyRelation or str
+                The data on which filters are applied. Either a DuckDB relation, the path to a
+                DuckDB database file (together with table), or a SQL query.
+            filters : list of str
+                List of column names in source for which filters are to be created.
+            filters_name: str, optional
+                Name of the filters object in session state.
+            table: str, optional
+                Name of the table to filter when source is the path to a database file.
+            connection: DuckDBPyConnection, optional
+                Connection on which a SQL query source is run, owned by the caller, e.g. created
+                with st.cache_resource. Defaults to a cursor of an in-memory connection shared by
+                the process.
+            profiler: FilterProfiler, optional
+                Instrumentation recording timings and counters of every run. Disabled by default.
+        """
+        if duckdb is None:
+            raise ImportError(
+                "DynamicFiltersDuckDB requires duckdb: pip install streamlit-dynamic-filters[duckdb]"
+            )
+
+        if isinstance(source, duckdb.DuckDBPyRelation):
+            self.relation = source
+        elif not isinstance(source, str):
+            raise StreamlitAPIException(
+                "source must be a DuckDB relation, a database path or a SQL query"
+            )
+        elif table is not None:
+            self.relation = shared_connection(source).cursor().table(table)
+        else:
+            self.relation = (connection or shared_connection().cursor()).sql(source)
+
+        self.init_filters(filters, filters_name, profiler=profiler)
+
+    def filter_relation(self, except_filters=()):
+        """
+        Returns the relation filtered on session state values except for the specified filters.
+
+        Parameters
+        ----------
+            except_filters : list of str, optional
+                Filter names that should be excluded from the current filtering operation.
+
+        Returns
+        -------
+            DuckDBPyRelation
+                Lazily evaluated filtered relation.
+        """
+        condition = None
+        for key, values in st.session_state[self.filters_name].items():
+            if key in except_filters or not values:
+                continue
+            column = duckdb.ColumnExpression(key)
+            present = [duckdb.ConstantExpression(value) for value in values if not is_missing(value)]
+            predicate = column.isin(*present) if present else None
+            if len(present) < len(values):
+                predicate = column.isnull() if predicate is None else predicate | column.isnull()
+            condition = predicate if condition is None else condition & predicate
+        if condition is None:
+            return self.relation
+        return self.relation.filter(condition)
+
+    def filter_df(self, except_filter=None):
+        """
+        Filters the relation based on session state values except for the specified filter.
+
+        Parameters
+        ----------
+            except_filter : str, optional
+                The filter name that should be excluded from the current filtering operation.
+
+        Returns
+        -------
+            DataFrame
+                Filtered dataframe.
+        """
+        return self.filter_relation([except_filter]).df()
+
+    def rows_task(self):
+        """Returns a function pulling the rows matching the current selections, with the filtered relation built beforehand."""
+        return self.filter_relation().df
+
+    def append(self, rows):
+        """
+        Not supported: the relation is queried again on every run, so rows inserted into its tables are already read.
+
+        Exceptions
+        ----------
+        Raises StreamlitAPIException.
+        """
+        raise StreamlitAPIException("rows are appended to the tables of the relation, which is queried on every run")
+
+    def warm_up(self, states=None, per_filter=10):
+        """
+        Not supported: options and rows are queried from DuckDB on every run, without a cache to fill.
+
+        Exceptions
+        ----------
+        Raises StreamlitAPIException.
+        """
+        raise StreamlitAPIException("the relation is queried on every run, there is no cache to warm up")
+
+    def selection_key(self, except_filters=()):
+        """Returns the active session state selections except for the specified filters in a hashable form."""
+        return tuple(
+            (key, frozenset(values))
+            for key, values in st.session_state[self.filters_name].items()
+            if values and key not in except_filters
+        )
+
+    def column_names(self):
+        """Returns the names of the columns of the relation."""
+        return list(self.relation.columns)
+
+    def count_rows(self):
+        """Returns the number of rows matching the session state values, counted by DuckDB."""
+        return self.filter_relation().aggregate("count(*)").fetchone()[0]
+
+    def page_rows(self, start, stop, sort_by=None, descending=False):
+        """
+        Returns the matching rows between two positions of the result, with LIMIT and OFFSET pushed down.
+
+        Parameters
+        ----------
+            start : int
+                Position of the first row of the page in the result.
+            stop : int
+                Position after the last row of the page in the result.
+            sort_by : str, optional
+                The column the result is sorted by. Default is the order of the relation.
+            descending : bool, optional
+                If True, the result is sorted in descending order.
+
+        Returns
+        -------
+            DataFrame
+                The rows of the page.
+        """
+        relation = self.filter_relation()
+        if sort_by is not None:
+            column = duckdb.ColumnExpression(sort_by)
+            relation = relation.sort((column.desc() if descending else column.asc()).nulls_last())
+        return relation.limit(max(stop - start, 0), start).df()
+
+    def sample_rows(self, n):
+        """Returns a reservoir sample of at most n matching rows drawn by DuckDB."""
+        return self.filter_relation().query(
+            "filtered", f"SELECT * FROM filtered USING SAMPLE reservoir({int(n)} ROWS) REPEATABLE (0)"
+        ).df()
+
+    def valid_selections(self, filter_name, options, selected=None):
+        """
+        Returns the selections of a filter, by default those in session state, that are among the options returned by DuckDB.
+
+        A selected missing value, such as NaN, is kept as the None option while NULL is among the options.
+        """
+        if selected is None:
+            selected = st.session_state[self.filters_name][filter_name]
+        selected = [None if is_missing(value) else value for value in selected]
+        keep = pd.Index(options).get_indexer(selected) >= 0
+        return [value for value, valid in zip(selected, keep) if valid]
+
+    def filter_options(self):
+        """
+        Returns the available options of every filter based on the selections of the other filters.
+
+        Returns
+        -------
+            dict
+                Dictionary with filter names as keys and lists of options as values.
+        """
+        options = {}
+        for filter_name in st.session_state[self.filters_name]:
+            column = duckdb.ColumnExpression(filter_name)
+            distinct = self.filter_relation([filter_name]).project(column).distinct()
+            options[filter_name] = [row[0] for row in distinct.fetchall()]
+        return options
@@ -0,0 +1,97 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+# version of the layout of the artifacts; artifacts of another version are never loaded
+FORMAT_VERSION = 2
+
+
+def artifact_key(*parts):
+    """Returns the hex digest naming the artifact of the given parts, e.g. a data fingerprint and the filter arguments."""
+    return hashlib.blake2b(repr((FORMAT_VERSION,) + parts).encode(), digest_size=16).hexdigest()
+
+
+def storable(value):
+    """Returns True if a value is an array that can be saved to a .npy file and memory-mapped back."""
+    return isinstance(value, np.ndarray) and not value.dtype.hasobject
+
+
+def save_artifact(path, key, manifest, arrays):
+    """
+    Writes an artifact into its own directory under path, named after its key.
+
+    The arrays are saved as one .npy file each, so they can be memory-mapped when loaded, and
+    everything else goes into the JSON manifest. Nothing is pickled, so loading an artifact never
+    runs code, even from a directory others can write to. The artifact is written to a temporary
+    directory first and renamed, so processes never see a partial artifact; if another process
+    wrote the same artifact in the meantime, its copy is kept.
+
+    Parameters
+    ----------
+        path : str
+            Directory holding the artifacts, created if missing.
+        key : str
+            Name of the artifact, see artifact_key().
+        manifest : dict
+            JSON-serialisable description of the artifact, stored with its version and key.
+        arrays : dict
+            Dictionary with file names as keys and arrays without objects as values.
+
+    Returns
+    -------
+        str
+            Directory of the artifact.
+    """
+    os.makedirs(path, exist_ok=True)
+    directory = os.path.join(path, key)
+    staging = tempfile.mkdtemp(prefix=f".{key}-", dir=path)
+    try:
+        for name, array in arrays.items():
+            np.save(os.path.join(staging, f"{name}.npy"), array, allow_pickle=False)
+        # the manifest is written last and marks the artifact as complete
+        with open(os.path.join(staging, "manifest.json"), "w", encoding="utf-8") as file:
+            json.dump({**manifest, "format": FORMAT_VERSION, "key": key, "arrays": sorted(arrays)}, file)
+        os.rename(staging, directory)
+    except OSError:
+        if not os.path.exists(os.path.join(directory, "manifest.json")):
+            raise
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return directory
+
+
+def load_artifact(path, key):
+    """
+    Reads the artifact of a key under path, memory-mapping its arrays read-only.
+
+    Parameters
+    ----------
+        path : str
+            Directory holding the artifacts.
+        key : str
+            Name of the artifact, see artifact_key().
+
+    Returns
+    -------
+        tuple or None
+            The manifest and the dictionary of arrays by file name, or None if no complete
+            artifact of this version exists for the key.
+    """
+    directory = os.path.join(path, key)
+    try:
+        with open(os.path.join(directory, "manifest.json"), encoding="utf-8") as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("format") != FORMAT_VERSION or manifest.get("key") != key:
+        return None
+    # mapped pages are shared by all processes reading the artifact, and only read on access
+    arrays = {
+        name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r", allow_pickle=False).view(np.ndarray)
+        for name in manifest["arrays"]
+    }
+    return manifest, arrays
@@ -0,0 +1,20 @@
+import importlib.util
+import pathlib
+import sys
+
+PACKAGE = pathlib.Path(__file__).resolve().parent.parent / "streamlit-dynamic-filters"
+
+
+def load_package():
+    """Imports the package from its source directory as streamlit_dynamic_filters, like the installed distribution."""
+    if "streamlit_dynamic_filters" not in sys.modules:
+        spec = importlib.util.spec_from_file_location(
+            "streamlit_dynamic_filters", PACKAGE / "__init__.py", submodule_search_locations=[str(PACKAGE)]
+        )
+        module = importlib.util.module_from_spec(spec)
+        sys.modules["streamlit_dynamic_filters"] = module
+        spec.loader.exec_module(module)
+    return sys.modules["streamlit_dynamic_filters"]
+
+
+load_package()
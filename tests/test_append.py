@@ -0,0 +1,88 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+from test_cube import assert_same_groups
+
+from streamlit_dynamic_filters import FilterEngine, FilterIndex
+from streamlit_dynamic_filters.cube import PARTIALS, AggregationCube
+from streamlit_dynamic_filters.engine import ColumnIndex, SortedIndex, TextIndex
+
+# the appended rows bring values unseen in the first ones
+NEW_CHANNELS = ("web", "kiosk", "partner")
+
+
+def make_sales(rows=600, seed=0, channels=("web", "store", "phone", None)):
+    rng = np.random.default_rng(seed)
+    units = rng.normal(50, 20, rows).round()
+    units[rng.random(rows) < 0.05] = np.nan
+    return pd.DataFrame(
+        {
+            "product_id": rng.integers(0, 30, rows),
+            "channel": rng.choice(list(channels), rows),
+            "product": rng.choice(["road bike", "bike pump", "Helmet", "e-Bike", "helmet light"], rows),
+            "units": units,
+            "day": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, rows), unit="D"),
+        }
+    )
+
+
+def test_appended_indexes_match_indexes_built_over_all_rows():
+    df = pd.concat([make_sales(), make_sales(200, seed=1, channels=NEW_CHANNELS)], ignore_index=True)
+    head, tail = df.iloc[:600], df.iloc[600:]
+
+    appended, rebuilt = ColumnIndex(head["channel"]).append(tail["channel"]), ColumnIndex(df["channel"])
+    assert set(appended.take(np.arange(len(appended.values)))) == set(rebuilt.take(np.arange(len(rebuilt.values))))
+    for value in ["web", "store", "kiosk", None]:
+        assert np.array_equal(appended.positions([value]), rebuilt.positions([value])), value
+        assert appended.count([value]) == rebuilt.count([value]), value
+
+    for name in ["units", "day"]:
+        appended, rebuilt = SortedIndex(head[name]).append(tail[name]), SortedIndex(df[name])
+        values = df[name].dropna().sort_values().tolist()
+        for low, high in [(values[0], values[-1]), (values[100], values[500]), (values[-1], values[-1])]:
+            assert np.array_equal(appended.positions([low, high]), rebuilt.positions([low, high])), name
+        assert np.array_equal(appended.bounds(), rebuilt.bounds()), name
+
+    appended, rebuilt = TextIndex(head["product"]).append(tail["product"]), TextIndex(df["product"])
+    for query in ["bike", "HELMET", "e-b", "pump", "zzz", ""]:
+        assert np.array_equal(appended.positions([query]), rebuilt.positions([query])), query
+
+
+def test_appended_filter_index_evaluates_like_a_rebuilt_one():
+    head, tail = make_sales(), make_sales(200, seed=1, channels=NEW_CHANNELS)
+    products = pd.DataFrame({"product_id": np.arange(25), "category": np.arange(25) % 3})
+    arguments = {"ranges": ["units"], "texts": ["product"], "dimensions": {"product_id": products}}
+    filters = ["channel", "category", "product", "units"]
+    appended = FilterEngine(FilterIndex(head, filters, **arguments).append(tail))
+    rebuilt = FilterEngine(FilterIndex(pd.concat([head, tail], ignore_index=True), filters, **arguments))
+    assert appended.df.equals(rebuilt.df)
+    states = [
+        {"channel": [], "category": [], "product": [], "units": []},
+        {"channel": ["kiosk", "web"], "category": [], "product": [], "units": []},
+        {"channel": [None], "category": [1], "product": [], "units": [30, 60]},
+        {"channel": [], "category": [0, 2], "product": ["bike"], "units": []},
+    ]
+    for state in states:
+        result, expected = appended.evaluate(state), rebuilt.evaluate(state)
+        assert result["selections"] == expected["selections"]
+        assert {key: set(options) for key, options in result["options"].items()} == {
+            key: set(options) for key, options in expected["options"].items()
+        }
+        assert np.array_equal(appended.positions(state), rebuilt.positions(state))
+
+
+def test_appended_cube_matches_a_cube_over_all_rows():
+    head, tail = make_sales(), make_sales(200, seed=1, channels=NEW_CHANNELS)
+    df = pd.concat([head, tail], ignore_index=True)
+    dimensions = ["channel", "product"]
+    for aggregation in PARTIALS:
+        cube = AggregationCube(head, dimensions, ["units"], aggregation=aggregation, eager=True)
+        appended = cube.append(tail)
+        rebuilt = AggregationCube(df, dimensions, ["units"], aggregation=aggregation)
+        for size in [1, 2]:
+            for group_by in itertools.combinations(dimensions, size):
+                for selections in [{}, {"channel": ["web", "kiosk"]}]:
+                    result = appended.query(selections, list(group_by))
+                    expected = rebuilt.query(selections, list(group_by))
+                    assert_same_groups(result, expected, list(group_by))
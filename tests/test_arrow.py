@@ -0,0 +1,76 @@
+import os
+
+import pandas as pd
+import pytest
+from streamlit.testing.v1 import AppTest
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    path = str(tmp_path / "sales.parquet")
+    df = pd.DataFrame(
+        {
+            "region": ["EMEA", "EMEA", "APAC", None, "APAC"],
+            "country": ["FR", "DE", "JP", "US", None],
+            "units": [3, 5, 2, 7, 1],
+        }
+    )
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), path)
+    return path
+
+
+def test_filter_columns_are_read_once_per_process(dataset):
+    from streamlit_dynamic_filters import DynamicFiltersArrow
+
+    first = DynamicFiltersArrow(dataset, ["region", "country"], filters_name="arrow_shared")
+    rerun = DynamicFiltersArrow(dataset, ["region", "country"], filters_name="arrow_shared")
+    assert rerun.df is first.df
+    assert rerun.data is first.data
+    unshared = DynamicFiltersArrow(dataset, ["region", "country"], filters_name="arrow_shared", shared=False)
+    assert unshared.df is not first.df
+    assert unshared.data is not first.data
+
+
+def test_rewritten_files_are_read_again(dataset):
+    from streamlit_dynamic_filters import DynamicFiltersArrow
+
+    first = DynamicFiltersArrow(dataset, ["region", "country"], filters_name="arrow_rewritten")
+    pq.write_table(pa.table({"region": ["AMER"], "country": ["CA"], "units": [4]}), dataset)
+    os.utime(dataset, ns=(0, os.stat(dataset).st_mtime_ns + 10**9))
+    rerun = DynamicFiltersArrow(dataset, ["region", "country"], filters_name="arrow_rewritten")
+    assert rerun.df["region"].tolist() == ["AMER"]
+    assert rerun.data is not first.data
+
+
+def test_version_identifies_the_files(dataset):
+    from streamlit_dynamic_filters import DynamicFiltersArrow
+
+    first = DynamicFiltersArrow(dataset, ["region", "country"], filters_name="arrow_version", version=1)
+    os.utime(dataset, ns=(0, os.stat(dataset).st_mtime_ns + 10**9))
+    rerun = DynamicFiltersArrow(dataset, ["region", "country"], filters_name="arrow_version", version=1)
+    assert rerun.df is first.df
+    assert DynamicFiltersArrow(dataset, ["region", "country"], filters_name="arrow_version", version=2).df is not first.df
+
+
+def sales_app(path):
+    import streamlit as st
+
+    from streamlit_dynamic_filters import DynamicFiltersArrow
+
+    dynamic_filters = DynamicFiltersArrow(path, ["region", "country"])
+    dynamic_filters.display_filters()
+    st.text(sorted(dynamic_filters.filter_df()["units"].tolist()))
+
+
+def test_selections_are_pushed_down(dataset):
+    at = AppTest.from_function(sales_app, args=(dataset,)).run()
+    assert at.multiselect(key="filtersregion").options == ["APAC", "EMEA", "None"]
+    at.multiselect(key="filtersregion").select("APAC").run()
+    assert at.text[0].value == "[1, 2]"
+    at.multiselect(key="filtersregion").unselect("APAC").select(None).run()
+    at.run()
+    assert not at.exception
+    assert at.text[0].value == "[7]"
@@ -0,0 +1,113 @@
+import threading
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+from streamlit_dynamic_filters import BackgroundResults
+
+
+class Calls:
+    """A compute function recording how often it ran, optionally waiting for an event first."""
+
+    def __init__(self, result, event=None):
+        self.result = result
+        self.event = event
+        self.count = 0
+
+    def __call__(self):
+        if self.event is not None:
+            self.event.wait(5)
+        self.count += 1
+        return self.result
+
+
+class Stop(Exception):
+    """Raised by idle, as Streamlit stops a run superseded by a newer click."""
+
+
+def test_results_are_reused_by_key_across_owners():
+    background = BackgroundResults(debounce=0)
+    compute = Calls("rows")
+    assert background.result("first", ("rows", "EMEA"), compute) == "rows"
+    assert background.result("second", ("rows", "EMEA"), Calls("other")) == "rows"
+    assert compute.count == 1
+    assert background.stats()["submitted"] == 1
+    assert background.stats()["reused"] == 1
+
+
+def test_replaced_states_are_cancelled_before_they_start():
+    background = BackgroundResults(max_workers=1, debounce=0)
+    event = threading.Event()
+    busy = background.submit("other", "busy", Calls("busy", event))
+    stale = Calls("stale")
+    background.submit("session", "stale", stale)
+    latest = background.submit("session", "latest", Calls("latest"))
+    event.set()
+    assert busy.result(5) == "busy" and latest.result(5) == "latest"
+    assert stale.count == 0
+    assert background.stats()["cancelled"] == 1
+
+
+def test_states_held_by_another_owner_are_not_cancelled():
+    background = BackgroundResults(max_workers=1, debounce=0)
+    event = threading.Event()
+    background.submit("other", "busy", Calls("busy", event))
+    shared = Calls("shared")
+    background.submit("first", "shared", shared)
+    background.submit("second", "shared", shared)
+    background.submit("first", "latest", Calls("latest"))
+    event.set()
+    assert background.result("second", "shared", Calls("again")) == "shared"
+    assert shared.count == 1
+    assert background.stats()["cancelled"] == 0
+
+
+def test_a_burst_of_clicks_only_computes_the_last_state():
+    background = BackgroundResults(debounce=0.2, poll=0.01)
+    skipped = Calls("skipped")
+
+    def idle():
+        raise Stop()
+
+    with pytest.raises(Stop):
+        background.result("session", "skipped", skipped, idle=idle)
+    assert background.result("session", "last", Calls("last")) == "last"
+    assert skipped.count == 0
+    assert background.stats()["submitted"] == 1
+
+
+def test_failures_are_computed_again():
+    background = BackgroundResults(debounce=0)
+
+    def fail():
+        raise ValueError("failed")
+
+    with pytest.raises(ValueError):
+        background.result("session", "state", fail)
+    assert background.result("session", "state", Calls("rows")) == "rows"
+    assert background.stats()["submitted"] == 2
+
+
+def background_app():
+    import pandas as pd
+    import streamlit as st
+
+    from streamlit_dynamic_filters import BackgroundResults, DynamicFilters
+
+    if "background" not in st.session_state:
+        st.session_state["background"] = BackgroundResults(debounce=0)
+    df = pd.DataFrame({"region": ["EMEA", "EMEA", "APAC", "AMER"], "units": [3, 5, 2, 7]})
+    dynamic_filters = DynamicFilters(df, ["region"], background=st.session_state["background"])
+    dynamic_filters.display_filters()
+    dynamic_filters.display_df()
+
+
+def test_display_df_renders_the_rows_computed_in_the_background():
+    at = AppTest.from_function(background_app).run()
+    at.multiselect(key="filtersregion").select("EMEA").run()
+    assert not at.exception
+    assert at.dataframe[0].value["units"].tolist() == [3, 5]
+    at.multiselect(key="filtersregion").unselect("EMEA").run()
+    at.multiselect(key="filtersregion").select("EMEA").run()
+    assert at.dataframe[0].value["units"].tolist() == [3, 5]
+    assert at.session_state["background"].stats()["reused"] >= 1
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+from test_options import FILTERS, make_sales, random_states
+
+from streamlit_dynamic_filters import FilterCache, FilterEngine, FilterIndex
+
+
+def test_batches_match_evaluating_every_state_alone():
+    df = make_sales()
+    engine = FilterEngine(FilterIndex(df, FILTERS, ranges=["year"]))
+    states = list(random_states(df, 30))
+    for state in states:
+        state["year"] = sorted(state["year"]) if len(state["year"]) == 2 else []
+    positions = engine.batch_positions(states)
+    counts = engine.batch_counts(states)
+    for number, state in enumerate(states):
+        expected = engine.positions(state)
+        assert (positions[number] is None) == (expected is None)
+        assert expected is None or np.array_equal(positions[number], expected)
+        for filter_name, state_counts in engine.counts(state).items():
+            assert np.array_equal(np.asarray(counts[filter_name][number]), np.asarray(state_counts)), filter_name
+
+
+def test_batch_aggregate_matches_aggregating_every_state_alone():
+    df = make_sales()
+    df["units"] = np.arange(len(df)) % 7
+    engine = FilterEngine(FilterIndex(df, FILTERS))
+    states = list(random_states(df, 20))
+    for aggregation in ["sum", "mean", "count"]:
+        result = engine.batch_aggregate(states, ["region", "channel"], ["units"], aggregation)
+        for number, state in enumerate(states):
+            expected = engine.aggregate(state, ["region", "channel"], ["units"], aggregation)
+            rows = result[result["selection_state"] == number].drop(columns="selection_state")
+            pd.testing.assert_frame_equal(
+                rows.sort_values(["region", "channel"]).reset_index(drop=True),
+                expected.sort_values(["region", "channel"]).reset_index(drop=True),
+                check_dtype=False,
+            )
+
+
+def test_warm_up_answers_the_common_states_from_the_cache():
+    df = make_sales()
+    cache = FilterCache()
+    engine = FilterEngine(FilterIndex(df, FILTERS), cache=cache)
+    states = engine.common_states()
+    assert states[0] == {filter_name: [] for filter_name in FILTERS}
+    assert engine.warm_up() == len(states)
+    misses = cache.stats()["misses"]
+    plain = FilterEngine(FilterIndex(df, FILTERS))
+    for state in states:
+        result, expected = engine.evaluate(state), plain.evaluate(state)
+        assert result["options"] == expected["options"]
+        assert (result["positions"] is None) == (expected["positions"] is None)
+        assert expected["positions"] is None or np.array_equal(result["positions"], expected["positions"])
+    assert cache.stats()["misses"] == misses
+    assert cache.stats()["hits"] >= 2 * len(states)
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+from streamlit_dynamic_filters import FilterCache, FilterEngine, FilterIndex
+from streamlit_dynamic_filters.cache import fingerprint
+
+SALES = pd.DataFrame(
+    {
+        "region": ["EMEA", "EMEA", "APAC", "AMER", "APAC"],
+        "country": ["FR", "DE", "JP", "US", "AU"],
+    }
+)
+
+
+def test_repeated_lookups_are_hits():
+    cache = FilterCache()
+    calls = []
+    for _ in range(3):
+        assert cache.get_or_compute("key", lambda: calls.append(1) or "value") == "value"
+    assert len(calls) == 1
+    assert cache.stats() == {"hits": 2, "misses": 1, "evictions": 0, "entries": 1, "bytes": cache.nbytes}
+
+
+def test_least_recently_used_entry_is_evicted_first():
+    cache = FilterCache(max_entries=2)
+    cache.get_or_compute("a", lambda: 1)
+    cache.get_or_compute("b", lambda: 2)
+    cache.get_or_compute("a", lambda: 1)
+    cache.get_or_compute("c", lambda: 3)
+    assert cache.stats()["evictions"] == 1
+    calls = []
+    cache.get_or_compute("a", lambda: calls.append("a"))
+    cache.get_or_compute("b", lambda: calls.append("b"))
+    assert calls == ["b"]
+
+
+def test_entries_are_bounded_by_bytes():
+    cache = FilterCache(max_entries=100, max_bytes=3000)
+    for key in range(5):
+        cache.get_or_compute(key, lambda: np.zeros(100))
+    assert cache.stats()["bytes"] <= 3000
+    assert cache.stats()["entries"] == 3
+    # values larger than the whole cache are returned without being stored
+    assert len(cache.get_or_compute("large", lambda: np.zeros(1000))) == 1000
+    assert cache.stats()["entries"] == 3
+
+
+def test_engines_share_results_by_data_and_selection():
+    cache = FilterCache()
+    selections = {"region": ["EMEA"], "country": []}
+    expected = FilterEngine(FilterIndex(SALES, ["region", "country"])).evaluate(selections)
+    for _ in range(2):
+        engine = FilterEngine(FilterIndex(SALES.copy(), ["region", "country"]), cache=cache)
+        result = engine.evaluate(selections)
+        assert result["options"] == expected["options"]
+        assert np.array_equal(result["positions"], expected["positions"])
+    assert cache.stats()["hits"] > 0
+    hits = cache.stats()["hits"]
+    other = SALES.assign(region=["EMEA", "APAC", "APAC", "AMER", "APAC"])
+    result = FilterEngine(FilterIndex(other, ["region", "country"]), cache=cache).evaluate(selections)
+    assert result["positions"].tolist() == [0]
+    assert cache.stats()["hits"] == hits
+
+
+def test_version_replaces_the_fingerprint_in_keys():
+    data = FilterIndex(SALES, ["region", "country"], version="2024-06-01")
+    assert data.fingerprint() == ("version", "2024-06-01")
+    assert FilterIndex(SALES, ["region", "country"]).fingerprint() == (fingerprint(SALES),)
+
+
+def test_fingerprint_is_recomputed_when_the_structure_changes():
+    df = SALES.copy()
+    before = fingerprint(df)
+    df["units"] = [1, 2, 3, 4, 5]
+    assert fingerprint(df) != before
@@ -0,0 +1,52 @@
+from streamlit.testing.v1 import AppTest
+
+
+def sales_app(use_callbacks):
+    import pandas as pd
+    import streamlit as st
+
+    from streamlit_dynamic_filters import DynamicFilters
+
+    st.session_state["runs"] = st.session_state.get("runs", 0) + 1
+    df = pd.DataFrame(
+        {
+            "region": ["EMEA", "EMEA", "APAC", "AMER"],
+            "country": ["FR", "DE", "JP", "US"],
+            "units": [3, 5, 2, 7],
+        }
+    )
+    dynamic_filters = DynamicFilters(df, ["region", "country"])
+    dynamic_filters.display_filters(use_callbacks=use_callbacks)
+    st.text(sorted(dynamic_filters.filter_df()["units"].tolist()))
+
+
+def select(use_callbacks, *steps):
+    at = AppTest.from_function(sales_app, args=(use_callbacks,)).run()
+    runs = []
+    for key, value in steps:
+        before = at.session_state["runs"]
+        at.multiselect(key=key).set_value(value).run()
+        runs.append(at.session_state["runs"] - before)
+    assert not at.exception
+    return at, runs
+
+
+def test_callbacks_update_the_options_in_one_run():
+    steps = [("filtersregion", ["EMEA"]), ("filterscountry", ["FR"]), ("filtersregion", [])]
+    with_callbacks, runs = select(True, *steps)
+    assert runs == [1, 1, 1]
+    without_callbacks, reruns = select(False, *steps)
+    assert reruns == [2, 2, 2]
+    for at in [with_callbacks, without_callbacks]:
+        assert at.session_state["filters"] == {"region": [], "country": ["FR"]}
+        assert at.multiselect(key="filtersregion").options == ["EMEA"]
+        assert at.multiselect(key="filterscountry").options == ["DE", "FR", "JP", "US"]
+        assert at.text[0].value == "[3]"
+
+
+def test_callbacks_drop_selections_that_are_no_longer_offered():
+    at, runs = select(True, ("filterscountry", ["JP", "US"]), ("filtersregion", ["APAC"]))
+    assert runs == [1, 1]
+    assert at.session_state["filters"] == {"region": ["APAC"], "country": ["JP"]}
+    assert at.multiselect(key="filterscountry").value == ["JP"]
+    assert at.text[0].value == "[2]"
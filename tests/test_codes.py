@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+from streamlit_dynamic_filters.engine import ColumnIndex
+
+COLUMNS = {
+    "object": pd.Series(["b", "a", "c", "a", "b", "b"], dtype=object),
+    "string": pd.Series(["b", "a", "c", "a", "b", "b"]),
+    "category": pd.Series(["b", "a", "c", "a", "b", "b"], dtype="category"),
+    "int": pd.Series([3, 1, 2, 1, 3, 3]),
+    "float": pd.Series([0.5, 1.5, 0.5, 2.5, 1.5, 0.5]),
+    "datetime": pd.Series(pd.to_datetime(["2024-01-02", "2024-01-01", "2024-01-02", "2024-01-03", "2024-01-01", "2024-01-02"])),
+    "bool": pd.Series([True, False, False, True, True, False]),
+}
+
+
+def test_codes_decode_to_the_column():
+    for name, column in COLUMNS.items():
+        index = ColumnIndex(column)
+        assert index.values.tolist() == column.unique().tolist(), name
+        assert index.values.take(index.codes.astype(np.intp)).tolist() == column.tolist(), name
+        assert index.codes.dtype == np.uint8, name
+
+
+def test_lookups_on_codes_match_isin():
+    for name, column in COLUMNS.items():
+        index = ColumnIndex(column)
+        distinct = column.unique().tolist()
+        for values in [[], distinct[:1], distinct[1:], distinct, distinct[:1] + ["missing"]]:
+            expected = column.isin(values).to_numpy()
+            assert np.array_equal(index.positions(values), np.flatnonzero(expected)), name
+            assert np.array_equal(index.mask(values), expected), name
+            assert index.count(values) == expected.sum(), name
+            some = np.flatnonzero(np.arange(len(column)) % 2 == 0)
+            assert np.array_equal(index.narrow(some, values), some[expected[some]]), name
+
+
+def test_counts_and_options_follow_a_mask():
+    column = COLUMNS["string"]
+    index = ColumnIndex(column)
+    mask = np.array([True, False, True, False, True, False])
+    assert dict(zip(index.values, index.counts(mask))) == {"b": 2, "a": 0, "c": 1}
+    assert index.options(mask) == ["b", "c"]
+    assert index.contains(["a", "c", "missing"], index.present(mask)).tolist() == [False, True, False]
+
+
+def test_codes_widen_with_the_number_of_values():
+    index = ColumnIndex(pd.Series(np.arange(300)))
+    assert index.codes.dtype == np.uint16
+    assert np.array_equal(index.codes, np.arange(300))
@@ -0,0 +1,84 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+
+from streamlit_dynamic_filters.cube import PARTIALS, AggregationCube
+
+DIMENSIONS = ["region", "channel", "year"]
+
+
+def make_sales(rows=500, seed=0):
+    rng = np.random.default_rng(seed)
+    revenue = rng.normal(100, 30, rows)
+    revenue[rng.random(rows) < 0.05] = np.nan
+    return pd.DataFrame(
+        {
+            "region": rng.choice(["EMEA", "APAC", "AMER"], rows),
+            "channel": rng.choice(["web", "store", "phone"], rows),
+            "year": rng.integers(2020, 2024, rows),
+            "revenue": revenue,
+            "units": rng.integers(0, 10, rows),
+        }
+    )
+
+
+def groupby(df, selections, group_by, numerics, aggregation):
+    """The aggregation of the original implementation: filter the rows, then group them."""
+    for key, values in selections.items():
+        if values:
+            df = df[df[key].isin(values)]
+    return df.groupby(group_by, as_index=False)[numerics].agg(aggregation)
+
+
+def assert_same_groups(result, expected, group_by):
+    result = result.sort_values(group_by).reset_index(drop=True)
+    expected = expected.sort_values(group_by).reset_index(drop=True)
+    tm.assert_frame_equal(result, expected, check_dtype=False)
+
+
+def test_cube_queries_match_a_groupby_for_every_aggregation():
+    df = make_sales()
+    states = [
+        {},
+        {"region": ["EMEA"]},
+        {"region": ["APAC", "AMER"], "year": [2021]},
+        {"channel": ["web"], "year": [2020, 2023]},
+    ]
+    for aggregation in PARTIALS:
+        cube = AggregationCube(df, DIMENSIONS, ["revenue", "units"], aggregation=aggregation)
+        for size in [1, 2]:
+            for group_by in itertools.combinations(DIMENSIONS, size):
+                for selections in states:
+                    expected = groupby(df, selections, list(group_by), ["revenue", "units"], aggregation)
+                    result = cube.query(selections, list(group_by))
+                    assert_same_groups(result, expected, list(group_by))
+
+
+def test_rollups_are_reused_and_evicted_within_the_budget():
+    df = make_sales()
+    cube = AggregationCube(df, DIMENSIONS, ["revenue"], eager=True)
+    assert cube.stats()["rollups"] == [sorted(DIMENSIONS)]
+    # a finer rollup answers coarser queries without building new ones
+    cube.query({"year": [2021]}, ["region"])
+    assert len(cube.stats()["rollups"]) == 1
+
+    small = AggregationCube(df, DIMENSIONS, ["revenue"], max_bytes=1)
+    result = small.query({"region": ["EMEA"]}, ["channel"])
+    assert small.stats() == {"rollups": [], "rows": 0, "bytes": 0}
+    assert_same_groups(result, groupby(df, {"region": ["EMEA"]}, ["channel"], ["revenue"], "sum"), ["channel"])
+
+
+def test_engine_aggregates_from_the_cube_like_from_the_rows():
+    from streamlit_dynamic_filters import FilterEngine, FilterIndex
+
+    df = make_sales()
+    engine = FilterEngine(FilterIndex(df, DIMENSIONS))
+    for aggregation in PARTIALS:
+        cube = AggregationCube(df, DIMENSIONS, ["revenue"], aggregation=aggregation)
+        selections = {"region": ["EMEA", "APAC"], "channel": [], "year": [2022]}
+        result = engine.aggregate(selections, ["channel"], ["revenue"], aggregation, cube=cube)
+        expected = engine.aggregate(selections, ["channel"], ["revenue"], aggregation)
+        assert_same_groups(result, expected, ["channel"])
+        assert cube.stats()["rollups"]
@@ -0,0 +1,79 @@
+import pytest
+from streamlit.testing.v1 import AppTest
+
+from streamlit_dynamic_filters.sql import shared_connection
+
+duckdb = pytest.importorskip("duckdb")
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / "sales.duckdb")
+    with duckdb.connect(path) as connection:
+        connection.execute(
+            "CREATE TABLE sales AS SELECT * FROM (VALUES"
+            " ('EMEA', 'FR', 3), ('EMEA', 'DE', 5), ('APAC', 'JP', 2), (NULL, 'US', 7), ('APAC', NULL, 1)"
+            ") AS t(region, country, units)"
+        )
+    return path
+
+
+def sales_app(path, backend):
+    import pandas as pd
+    import streamlit as st
+
+    from streamlit_dynamic_filters import DynamicFilters, DynamicFiltersDuckDB
+
+    if backend == "duckdb":
+        dynamic_filters = DynamicFiltersDuckDB(path, ["region", "country"], table="sales")
+    else:
+        df = pd.DataFrame(
+            {
+                "region": ["EMEA", "EMEA", "APAC", None, "APAC"],
+                "country": ["FR", "DE", "JP", "US", None],
+                "units": [3, 5, 2, 7, 1],
+            }
+        )
+        dynamic_filters = DynamicFilters(df, ["region", "country"])
+    dynamic_filters.display_filters()
+    st.text(sorted(dynamic_filters.filter_df()["units"].tolist()))
+
+
+def run(path, backend, selections=None):
+    at = AppTest.from_function(sales_app, args=(path, backend))
+    if selections is not None:
+        at.session_state["filters"] = selections
+    return at.run()
+
+
+def test_options_and_rows_match_the_pandas_backend(database):
+    for selections in [
+        None,
+        {"region": ["APAC"], "country": []},
+        {"region": [None], "country": []},
+        {"region": [float("nan")], "country": []},
+        {"region": [], "country": [None, "FR"]},
+    ]:
+        expected, result = run(database, "pandas", selections), run(database, "duckdb", selections)
+        assert not expected.exception and not result.exception
+        for key in ["filtersregion", "filterscountry"]:
+            assert result.multiselect(key=key).options == expected.multiselect(key=key).options
+        assert result.text[0].value == expected.text[0].value
+
+
+def test_null_is_offered_last_and_stays_selected_across_runs(database):
+    for backend in ["pandas", "duckdb"]:
+        at = run(database, backend)
+        assert at.multiselect(key="filtersregion").options == ["APAC", "EMEA", "None"]
+        at.multiselect(key="filtersregion").select(None).run()
+        at.run()
+        assert not at.exception
+        assert at.multiselect(key="filtersregion").value == [None]
+        assert at.text[0].value == "[7]"
+
+
+def test_database_is_opened_once_per_process(database):
+    assert shared_connection(database) is shared_connection(database)
+    run(database, "duckdb")
+    run(database, "duckdb")
+    assert shared_connection(database) is shared_connection(database)
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+from streamlit.testing.v1 import AppTest
+
+from streamlit_dynamic_filters import FilterEngine, FilterIndex
+
+FILTERS = ["region", "country", "city"]
+
+
+def make_places(rows=300, seed=0):
+    rng = np.random.default_rng(seed)
+    cities = {"FR": ["Paris", "Lyon"], "DE": ["Berlin"], "JP": ["Tokyo", "Osaka"], "US": ["NYC", "Austin"]}
+    regions = {"FR": "EMEA", "DE": "EMEA", "JP": "APAC", "US": "AMER"}
+    country = rng.choice(list(cities), rows)
+    return pd.DataFrame(
+        {
+            "region": [regions[value] for value in country],
+            "country": country,
+            "city": [rng.choice(cities[value]) for value in country],
+        }
+    )
+
+
+def isin_cascade(df, selections):
+    """The original hierarchical filtering: each level offers the values left by the selections above it."""
+    while True:
+        options, rows = {}, df
+        for key, values in selections.items():
+            options[key] = sorted(rows[key].unique().tolist())
+            if values:
+                rows = rows[rows[key].isin(values)]
+        valid = {key: [value for value in values if value in options[key]] for key, values in selections.items()}
+        if valid == selections:
+            return selections, options, rows
+        selections = valid
+
+
+def test_cascade_matches_isin_filtering_level_by_level():
+    df = make_places()
+    engine = FilterEngine(FilterIndex(df, FILTERS))
+    rng = np.random.default_rng(1)
+    previous = None
+    for _ in range(40):
+        state = {}
+        for key in FILTERS:
+            values = df[key].unique()
+            size = rng.integers(0, 3)
+            state[key] = rng.choice(values, size=size, replace=False).tolist() if size else []
+        expected_selections, expected_options, expected_rows = isin_cascade(df, state)
+        result = engine.evaluate(state, hierarchical=True)
+        assert result["selections"] == expected_selections
+        assert {key: sorted(options) for key, options in result["options"].items()} == expected_options
+        pd.testing.assert_frame_equal(engine.take_rows(result["positions"]), expected_rows)
+        # levels reused from the previous cascade give the same result as a fresh one
+        cascade = engine.cascade(expected_selections, previous)
+        fresh = engine.cascade(expected_selections)
+        for level, fresh_level in zip(cascade["levels"], fresh["levels"]):
+            assert np.array_equal(level["counts"], fresh_level["counts"])
+        previous = cascade
+
+
+def hierarchical_app():
+    import pandas as pd
+
+    from streamlit_dynamic_filters import DynamicFiltersHierarchical
+
+    df = pd.DataFrame(
+        {
+            "region": ["EMEA", "EMEA", "APAC", "AMER"],
+            "country": ["FR", "DE", "JP", "US"],
+        }
+    )
+    dynamic_filters = DynamicFiltersHierarchical(df, ["region", "country"])
+    dynamic_filters.display_filters()
+
+
+def test_lower_levels_do_not_narrow_upper_levels():
+    at = AppTest.from_function(hierarchical_app).run()
+    at.multiselect(key="filterscountry").select("FR").run()
+    assert at.multiselect(key="filtersregion").options == ["AMER", "APAC", "EMEA"]
+    at.multiselect(key="filtersregion").select("APAC").run()
+    assert at.multiselect(key="filterscountry").options == ["JP"]
+    assert at.multiselect(key="filterscountry").value == []
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+from streamlit.testing.v1 import AppTest
+
+from streamlit_dynamic_filters import FilterEngine, FilterIndex
+
+# customer c1 only has rows in region EMEA
+SALES = pd.DataFrame(
+    {
+        "region": ["EMEA", "EMEA", "APAC", "APAC", "AMER"],
+        "cust": ["c1", "c2", "c2", "c3", "c4"],
+    }
+)
+
+
+def high_cardinality_app():
+    import pandas as pd
+
+    from streamlit_dynamic_filters import DynamicFilters
+
+    df = pd.DataFrame(
+        {
+            "region": ["EMEA", "EMEA", "APAC", "APAC", "AMER"],
+            "cust": ["c1", "c2", "c2", "c3", "c4"],
+        }
+    )
+    dynamic_filters = DynamicFilters(df, ["region", "cust"], high_cardinality={"cust": 2}, hide_empty=False)
+    dynamic_filters.display_filters()
+
+
+def test_selected_value_without_rows_stays_an_option():
+    engine = FilterEngine(FilterIndex(SALES, ["region", "cust"]), hide_empty=False, high_cardinality={"cust": 2})
+    result = engine.evaluate({"region": ["APAC"], "cust": ["c1"]})
+    assert result["selections"]["cust"] == ["c1"]
+    assert "c1" in result["options"]["cust"]
+
+
+def test_selected_value_without_rows_is_dropped_when_hiding_empty():
+    engine = FilterEngine(FilterIndex(SALES, ["region", "cust"]), high_cardinality={"cust": 2})
+    result = engine.evaluate({"region": ["APAC"], "cust": ["c1"]})
+    assert result["selections"]["cust"] == []
+
+
+def test_narrowing_another_filter_keeps_the_high_cardinality_selection():
+    app = AppTest.from_function(high_cardinality_app).run()
+    app.multiselect[1].select("c1").run()
+    app.multiselect[0].select("APAC").run()
+    assert not app.exception
+    assert app.multiselect[1].value == ["c1"]
+    assert "c1" in app.multiselect[1].options
+
+
+def make_customers(rows=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    names = np.array([f"{prefix}{number}" for prefix in ["Acme", "acorn", "Beta", "bolt"] for number in range(50)])
+    # skewed counts, so the top values differ from one selection to the other
+    weights = rng.pareto(1.5, len(names)) + 0.01
+    return pd.DataFrame(
+        {
+            "region": rng.choice(["EMEA", "APAC", "AMER"], rows),
+            "cust": rng.choice(names, rows, p=weights / weights.sum()),
+        }
+    )
+
+
+def test_top_options_match_value_counts_of_the_matching_labels():
+    df = make_customers()
+    engine = FilterEngine(FilterIndex(df, ["region", "cust"]), high_cardinality={"cust": 10})
+    for regions in [[], ["EMEA"], ["APAC", "AMER"]]:
+        for query in ["", "ac", "ACME1", "b", "zzz"]:
+            result = engine.evaluate({"region": regions, "cust": []}, queries={"cust": query})
+            rows = df[df["region"].isin(regions)] if regions else df
+            counts = rows["cust"].value_counts()
+            counts = counts[counts.index.str.casefold().str.startswith(query.casefold())]
+            options = result["options"]["cust"]
+            assert len(options) == min(10, len(counts))
+            assert set(options) <= set(counts.index)
+            if options:
+                # no value left out has more rows than a value offered
+                assert counts.drop(options).max() <= counts[options].min() or len(options) == len(counts)
+
+
+def test_selected_values_stay_offered_outside_the_top_values():
+    df = make_customers()
+    engine = FilterEngine(FilterIndex(df, ["region", "cust"]), high_cardinality={"cust": 5})
+    rarest = df["cust"].value_counts().index[-1]
+    result = engine.evaluate({"region": [], "cust": [rarest]}, queries={"cust": "zzz"})
+    assert result["selections"]["cust"] == [rarest]
+    assert result["options"]["cust"] == [rarest]
+
+
+def test_search_box_narrows_the_options():
+    app = AppTest.from_function(high_cardinality_app).run()
+    assert len(app.multiselect[1].options) == 2
+    app.text_input(key="filterscust_search").input("C3").run()
+    assert app.multiselect[1].options == ["c3"]
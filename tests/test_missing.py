@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+from streamlit.testing.v1 import AppTest
+
+from streamlit_dynamic_filters import FilterEngine, FilterIndex
+
+# None and NaN in an object column, as left by pd.read_sql or a merge
+SALES = pd.DataFrame(
+    {
+        "region": pd.Series(["EMEA", None, "APAC", np.nan, None], dtype=object),
+        "country": ["FR", "JP", "JP", "US", "DE"],
+        "units": [1.0, np.nan, 2.0, np.nan, 3.0],
+    }
+)
+
+
+def test_missing_values_share_one_code():
+    index = FilterIndex(SALES, ["region"]).index["region"]
+    assert index.value_codes([None])[0] == index.value_codes([np.nan])[0] == index.missing_code()
+    assert index.value_codes([pd.NaT])[0] == index.missing_code()
+    assert index.value_codes(["AMER"])[0] == -1
+
+
+def test_selected_none_matches_every_missing_row():
+    for row_sets in ["masks", "bitmaps"]:
+        engine = FilterEngine(FilterIndex(SALES, ["region", "country", "units"]), row_sets=row_sets)
+        for missing in [None, np.nan]:
+            result = engine.evaluate({"region": [missing], "country": [], "units": []})
+            assert result["positions"].tolist() == [1, 3, 4]
+            assert sorted(result["options"]["country"]) == ["DE", "JP", "US"]
+            assert len(result["selections"]["region"]) == 1 and pd.isna(result["selections"]["region"][0])
+        result = engine.evaluate({"region": [], "country": [], "units": [None]})
+        assert result["positions"].tolist() == [1, 3]
+
+
+def test_selected_none_is_replaced_by_the_missing_value_of_the_column():
+    engine = FilterEngine(FilterIndex(SALES, ["region", "country"]))
+    options = engine.evaluate({"region": [], "country": []})["options"]["region"]
+    selected = engine.valid_selections("region", [None, "EMEA"], options)
+    assert selected[1] == "EMEA"
+    assert any(value is selected[0] for value in options)
+
+
+def missing_app():
+    import numpy as np
+    import pandas as pd
+    import streamlit as st
+
+    from streamlit_dynamic_filters import DynamicFilters
+
+    df = pd.DataFrame(
+        {
+            "region": pd.Series(["EMEA", None, "APAC", np.nan, None], dtype=object),
+            "country": ["FR", "JP", "JP", "US", "DE"],
+        }
+    )
+    if "filters" not in st.session_state:
+        st.session_state["filters"] = {"region": [None], "country": []}
+    dynamic_filters = DynamicFilters(df, ["region", "country"])
+    dynamic_filters.display_filters()
+    st.write(len(dynamic_filters.filter_df()))
+
+
+def test_app_filters_the_missing_rows_selected_as_none():
+    at = AppTest.from_function(missing_app).run()
+    assert not at.exception
+    assert at.markdown[0].value == "`3`"
+    assert at.multiselect(key="filterscountry").options == ["DE", "JP", "US"]
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+from streamlit.testing.v1 import AppTest
+
+from streamlit_dynamic_filters import FilterEngine, FilterIndex
+
+FILTERS = ["region", "country", "channel", "year"]
+
+
+def make_sales(rows=400, seed=0):
+    rng = np.random.default_rng(seed)
+    countries = {"EMEA": ["FR", "DE", "UK"], "APAC": ["JP", "AU"], "AMER": ["US", "CA", "BR"]}
+    region = rng.choice(list(countries), rows)
+    return pd.DataFrame(
+        {
+            "region": region,
+            "country": [rng.choice(countries[value]) for value in region],
+            "channel": rng.choice(["web", "store", "phone"], rows),
+            "year": rng.integers(2019, 2024, rows),
+        }
+    )
+
+
+def isin_filter(df, selections, except_filters=()):
+    """The filtering of the original implementation: one isin per selected filter."""
+    for key, values in selections.items():
+        if key not in except_filters and values:
+            df = df[df[key].isin(values)]
+    return df
+
+
+def isin_evaluate(df, selections):
+    """Leave-one-out options, dropping selected values that are no longer offered until nothing changes."""
+    while True:
+        options = {key: sorted(isin_filter(df, selections, [key])[key].unique().tolist()) for key in selections}
+        valid = {key: [value for value in values if value in options[key]] for key, values in selections.items()}
+        if valid == selections:
+            return selections, options
+        selections = valid
+
+
+def random_states(df, count, seed=1):
+    rng = np.random.default_rng(seed)
+    for _ in range(count):
+        state = {}
+        for key in FILTERS:
+            values = df[key].unique()
+            size = rng.integers(0, 3)
+            state[key] = rng.choice(values, size=size, replace=False).tolist() if size else []
+        yield state
+
+
+def test_leave_one_out_options_match_isin_filtering():
+    df = make_sales()
+    engine = FilterEngine(FilterIndex(df, FILTERS))
+    for state in random_states(df, 50):
+        expected_selections, expected_options = isin_evaluate(df, state)
+        result = engine.evaluate(state)
+        assert result["selections"] == expected_selections
+        assert {key: sorted(options) for key, options in result["options"].items()} == expected_options
+        rows = engine.take_rows(result["positions"])
+        pd.testing.assert_frame_equal(rows, isin_filter(df, expected_selections))
+
+
+def test_options_of_a_filter_ignore_its_own_selection():
+    df = make_sales()
+    result = FilterEngine(FilterIndex(df, FILTERS)).evaluate({"region": ["EMEA"], "country": [], "channel": [], "year": []})
+    assert sorted(result["options"]["region"]) == sorted(df["region"].unique().tolist())
+    assert sorted(result["options"]["country"]) == ["DE", "FR", "UK"]
+
+
+def options_app():
+    import pandas as pd
+
+    from streamlit_dynamic_filters import DynamicFilters
+
+    df = pd.DataFrame(
+        {
+            "region": ["EMEA", "EMEA", "APAC", "AMER"],
+            "country": ["FR", "DE", "JP", "US"],
+        }
+    )
+    dynamic_filters = DynamicFilters(df, ["region", "country"])
+    dynamic_filters.display_filters()
+
+
+def test_selecting_a_value_narrows_the_options_of_the_other_filters():
+    at = AppTest.from_function(options_app).run()
+    assert at.multiselect(key="filterscountry").options == ["DE", "FR", "JP", "US"]
+    at.multiselect(key="filtersregion").select("EMEA").run()
+    assert at.multiselect(key="filterscountry").options == ["DE", "FR"]
+    assert at.multiselect(key="filtersregion").options == ["AMER", "APAC", "EMEA"]
@@ -0,0 +1,51 @@
+from streamlit.testing.v1 import AppTest
+
+
+def paged_app(page_size):
+    import pandas as pd
+    import streamlit as st
+
+    from streamlit_dynamic_filters import DynamicFilters
+
+    df = pd.DataFrame(
+        {
+            "region": ["EMEA", "APAC"] * 25,
+            "units": list(range(50)),
+        }
+    )
+    dynamic_filters = DynamicFilters(df, ["region"])
+    dynamic_filters.display_filters()
+    dynamic_filters.display_df(page_size=page_size)
+
+
+def rendered_units(at):
+    return at.dataframe[0].value["units"].tolist()
+
+
+def test_pages_hold_consecutive_rows():
+    at = AppTest.from_function(paged_app, args=(20,)).run()
+    assert at.caption[0].value == "Rows 1-20 of 50"
+    assert rendered_units(at) == list(range(20))
+    at.number_input(key="filters_page").set_value(3).run()
+    assert at.caption[0].value == "Rows 41-50 of 50"
+    assert rendered_units(at) == list(range(40, 50))
+
+
+def test_pages_follow_the_sort_column():
+    at = AppTest.from_function(paged_app, args=(20,)).run()
+    at.selectbox(key="filters_sort_by").set_value("units").run()
+    at.checkbox(key="filters_descending").check().run()
+    assert rendered_units(at) == list(range(49, 29, -1))
+    at.number_input(key="filters_page").set_value(2).run()
+    assert rendered_units(at) == list(range(29, 9, -1))
+
+
+def test_changing_the_selections_shows_the_first_page_again():
+    at = AppTest.from_function(paged_app, args=(10,)).run()
+    at.number_input(key="filters_page").set_value(4).run()
+    assert at.caption[0].value == "Rows 31-40 of 50"
+    at.multiselect(key="filtersregion").select("APAC").run()
+    assert not at.exception
+    assert at.number_input(key="filters_page").value == 1
+    assert at.caption[0].value == "Rows 1-10 of 25"
+    assert rendered_units(at) == list(range(1, 20, 2))
@@ -0,0 +1,56 @@
+import threading
+
+import numpy as np
+from streamlit.testing.v1 import AppTest
+from test_options import FILTERS, make_sales, random_states
+
+from streamlit_dynamic_filters import FilterEngine, FilterIndex
+from streamlit_dynamic_filters.engine import shared_executor
+
+
+def test_thread_pool_evaluates_like_one_filter_after_the_other():
+    df = make_sales()
+    data = FilterIndex(df, FILTERS)
+    sequential = FilterEngine(data, count_options=True)
+    parallel = FilterEngine(data, count_options=True, max_workers=4)
+    for hierarchical in [False, True]:
+        for state in random_states(df, 30):
+            expected = sequential.evaluate(state, hierarchical=hierarchical)
+            result = parallel.evaluate(state, hierarchical=hierarchical)
+            assert result["selections"] == expected["selections"]
+            assert result["options"] == expected["options"]
+            assert result["option_counts"] == expected["option_counts"]
+            assert (result["positions"] is None) == (expected["positions"] is None)
+            if expected["positions"] is not None:
+                assert np.array_equal(result["positions"], expected["positions"])
+
+
+def test_map_filters_keeps_the_filter_order_and_runs_on_the_shared_pool():
+    engine = FilterEngine(FilterIndex(make_sales(), FILTERS), max_workers=3)
+    threads = engine.map_filters(lambda filter_name: threading.current_thread().name, FILTERS)
+    assert list(threads) == FILTERS
+    assert all(name.startswith("dynamic-filters") for name in threads.values())
+    assert shared_executor(3) is shared_executor(3)
+
+
+def parallel_app(max_workers):
+    import streamlit as st
+    from test_options import FILTERS, make_sales
+
+    from streamlit_dynamic_filters import DynamicFilters
+
+    dynamic_filters = DynamicFilters(make_sales(), FILTERS, max_workers=max_workers)
+    dynamic_filters.display_filters()
+    st.text(len(dynamic_filters.filter_df()))
+
+
+def test_widgets_are_rendered_in_order_from_the_pool():
+    apps = [AppTest.from_function(parallel_app, args=(max_workers,)).run() for max_workers in [None, 4]]
+    for at in apps:
+        at.multiselect(key="filtersregion").select("EMEA").run()
+        at.multiselect(key="filterschannel").select("web").run()
+        assert not at.exception
+    sequential, parallel = apps
+    assert [widget.label for widget in parallel.multiselect] == [widget.label for widget in sequential.multiselect]
+    assert [widget.options for widget in parallel.multiselect] == [widget.options for widget in sequential.multiselect]
+    assert parallel.text[0].value == sequential.text[0].value
@@ -0,0 +1,104 @@
+import threading
+import time
+
+import pandas as pd
+from streamlit.testing.v1 import AppTest
+
+from streamlit_dynamic_filters import FilterEngine, FilterIndex, FilterProfiler
+
+SALES = pd.DataFrame(
+    {
+        "region": ["EMEA", "EMEA", "APAC", "AMER"] * 50,
+        "country": ["FR", "DE", "JP", "US"] * 50,
+        "channel": ["web", "store", "web", "phone"] * 50,
+    }
+)
+
+
+def test_nested_stages_are_timed_once():
+    profiler = FilterProfiler()
+    profiler.start_run("filters")
+    with profiler.stage("options"):
+        time.sleep(0.01)
+        with profiler.stage("sort", "region"):
+            time.sleep(0.05)
+    run = profiler.finish_run()
+    assert 0.01 <= run["stages"]["options"] < 0.05
+    assert run["stages"]["sort"] >= 0.05
+    assert run["filters"] == {"region": run["stages"]["sort"]}
+    assert run["seconds"] >= run["stages"]["options"] + run["stages"]["sort"]
+
+
+def test_finished_runs_are_counted_kept_and_passed_to_the_callback():
+    finished = []
+    profiler = FilterProfiler(callback=finished.append, history=2)
+    for rerun in [True, False, False]:
+        profiler.start_run("filters")
+        profiler.add(rows_scanned=10, copies=1)
+        profiler.finish_run(rerun=rerun)
+    assert profiler.finish_run() is None
+    assert len(finished) == 3
+    assert list(profiler.history) == finished[1:]
+    assert profiler.stats()["runs"] == 3 and profiler.stats()["reruns"] == 1
+    assert finished[0]["rows_scanned"] == 10 and finished[0]["copies"] == 1
+    profiler.clear()
+    assert profiler.stats() == {"runs": 0, "reruns": 0, "stages": {}}
+
+
+def test_runs_are_kept_per_thread():
+    profiler = FilterProfiler()
+    profiler.start_run("main")
+
+    def other():
+        profiler.start_run("other")
+        profiler.add(rows_scanned=5)
+        profiler.finish_run()
+
+    thread = threading.Thread(target=other)
+    thread.start()
+    thread.join()
+    profiler.add(rows_scanned=1)
+    assert profiler.finish_run()["rows_scanned"] == 1
+    assert [run["filters_name"] for run in profiler.history] == ["other", "main"]
+
+
+def test_pool_threads_count_like_the_script_thread():
+    selections = {"region": ["EMEA"], "country": ["FR", "JP"], "channel": []}
+    counted = []
+    for max_workers in [None, 4]:
+        profiler = FilterProfiler()
+        engine = FilterEngine(FilterIndex(SALES, list(selections)), profiler=profiler, max_workers=max_workers)
+        profiler.start_run("filters")
+        engine.evaluate(selections)
+        engine.take_rows(engine.positions(selections))
+        run = profiler.finish_run()
+        counted.append({counter: run[counter] for counter in ["rows_scanned", "rows_copied", "copies"]})
+    assert counted[0] == counted[1]
+    assert counted[0]["rows_scanned"] > 0 and counted[0]["copies"] == 1
+
+
+def profiled_app():
+    import pandas as pd
+    import streamlit as st
+
+    from streamlit_dynamic_filters import DynamicFilters, FilterProfiler
+
+    if "profiler" not in st.session_state:
+        st.session_state["profiler"] = FilterProfiler()
+    profiler = st.session_state["profiler"]
+    df = pd.DataFrame({"region": ["EMEA", "EMEA", "APAC"], "country": ["FR", "DE", "JP"]})
+    dynamic_filters = DynamicFilters(df, ["region", "country"], profiler=profiler)
+    dynamic_filters.display_filters()
+    dynamic_filters.display_df()
+    profiler.display_expander()
+
+
+def test_app_runs_and_reruns_are_recorded():
+    at = AppTest.from_function(profiled_app).run()
+    at.multiselect(key="filtersregion").select("EMEA").run()
+    assert not at.exception
+    runs = list(at.session_state["profiler"].history)
+    assert [run["rerun"] for run in runs] == [False, True, False]
+    assert {"options", "display_df"} <= set(runs[-1]["stages"])
+    assert runs[-1]["rows_copied"] == 2
+    assert at.expander[0].label == "Filter profile"
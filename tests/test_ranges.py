@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+from streamlit.testing.v1 import AppTest
+
+from streamlit_dynamic_filters import FilterEngine, FilterIndex
+from streamlit_dynamic_filters.engine import SortedIndex
+from streamlit_dynamic_filters.rowset import RowSet
+
+
+def make_columns(rows=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    floats = rng.normal(0, 10, rows).round(1)
+    floats[rng.random(rows) < 0.05] = np.nan
+    dates = pd.Series(pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, rows), unit="D"))
+    dates[rng.random(rows) < 0.05] = pd.NaT
+    return {"int": pd.Series(rng.integers(0, 50, rows)), "float": pd.Series(floats), "date": dates}
+
+
+def test_sorted_index_matches_between():
+    rng = np.random.default_rng(1)
+    for name, column in make_columns().items():
+        index = SortedIndex(column)
+        values = column.dropna().sort_values().to_numpy()
+        for first, last in [(0, -1), (10, 500), (700, 700), (-1, 0)]:
+            low, high = pd.Series(values[[first, last]]).tolist()
+            expected = column.between(low, high).to_numpy()
+            assert np.array_equal(index.positions([low, high]), np.flatnonzero(expected)), name
+            assert np.array_equal(index.mask([low, high]), expected), name
+            assert np.array_equal(index.row_set([low, high]).positions(), np.flatnonzero(expected)), name
+            assert index.count([low, high]) == expected.sum(), name
+            some = np.flatnonzero(rng.random(len(column)) < 0.3)
+            assert np.array_equal(index.narrow(some, [low, high]), some[expected[some]]), name
+
+
+def test_bounds_are_the_extremes_of_the_selected_rows():
+    rng = np.random.default_rng(2)
+    for name, column in make_columns().items():
+        index = SortedIndex(column)
+        for density in [0.001, 0.3, 1]:
+            mask = rng.random(len(column)) < density
+            selected = column[mask].dropna()
+            expected = [selected.min(), selected.max()] if len(selected) else []
+            positions = np.flatnonzero(mask)
+            for rows in [mask, positions, RowSet.from_positions(positions, len(column))]:
+                assert index.decode(index.bounds(rows)) == expected, name
+
+
+def test_range_selections_narrow_the_other_filters():
+    df = pd.DataFrame(make_columns()).assign(region=lambda df: np.where(df["int"] < 25, "low", "high"))
+    engine = FilterEngine(FilterIndex(df, ["region", "int", "float", "date"], ranges=["int", "float", "date"]))
+    dates = [pd.Timestamp("2024-03-01"), pd.Timestamp("2024-06-30")]
+    state = {"region": ["low"], "int": [], "float": [-5.0, 5.0], "date": dates}
+    result = engine.evaluate(state)
+    expected = df[df["region"].eq("low") & df["float"].between(-5, 5) & df["date"].between(*state["date"])]
+    assert np.array_equal(result["positions"], expected.index.to_numpy())
+    assert result["options"]["int"] == [expected["int"].min(), expected["int"].max()]
+    others = df[df["float"].between(-5, 5) & df["date"].between(*state["date"])]
+    assert sorted(result["options"]["region"]) == sorted(others["region"].unique())
+
+
+def range_app():
+    import pandas as pd
+    import streamlit as st
+
+    from streamlit_dynamic_filters import DynamicFilters
+
+    df = pd.DataFrame(
+        {
+            "region": ["EMEA", "EMEA", "APAC", "AMER"],
+            "units": [3, 5, 2, 7],
+            "day": pd.to_datetime(["2024-01-01", "2024-02-01", "2024-03-01", "2024-04-01"]),
+        }
+    )
+    dynamic_filters = DynamicFilters(df, ["region", "units", "day"], ranges=["units", "day"])
+    dynamic_filters.display_filters()
+    st.text(sorted(dynamic_filters.filter_df()["units"].tolist()))
+
+
+def test_slider_and_date_inputs_filter_the_rows():
+    at = AppTest.from_function(range_app).run()
+    assert at.slider(key="filtersunits").value == (2, 7)
+    at.slider(key="filtersunits").set_range(3, 5).run()
+    assert not at.exception
+    assert at.text[0].value == "[3, 5]"
+    assert at.multiselect(key="filtersregion").options == ["EMEA"]
+    january, february = pd.Timestamp("2024-01-01").date(), pd.Timestamp("2024-02-01").date()
+    assert at.date_input(key="filtersday").value == (january, february)
+    at.date_input(key="filtersday").set_value((february, february)).run()
+    assert at.text[0].value == "[5]"
+    assert at.session_state["filters"]["units"] == [3, 5]
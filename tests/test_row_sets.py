@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+from streamlit_dynamic_filters import FilterEngine, FilterIndex
+from streamlit_dynamic_filters.rowset import RowSet
+
+SIZE = 10_000
+
+
+def random_mask(rng, density):
+    return rng.random(SIZE) < density
+
+
+def row_set(mask):
+    return RowSet.from_positions(np.flatnonzero(mask), SIZE)
+
+
+def test_row_sets_combine_like_boolean_masks():
+    rng = np.random.default_rng(0)
+    codes = rng.integers(0, 7, SIZE)
+    densities = [0, 0.001, 0.01, 0.2, 0.9, 1]
+    for left in densities:
+        for right in densities:
+            a, b = random_mask(rng, left), random_mask(rng, right)
+            for result, expected in [(row_set(a) & row_set(b), a & b), (row_set(a) | row_set(b), a | b)]:
+                assert np.array_equal(result.positions(), np.flatnonzero(expected))
+                assert len(result) == expected.sum()
+                assert np.array_equal(result.bincount(codes, 7), np.bincount(codes[expected], minlength=7))
+                probe = rng.integers(0, SIZE, 50)
+                assert np.array_equal(result.contains(probe), expected[probe])
+
+
+def make_sales(rows=SIZE, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            # a skewed column, so some selections are sparse and others dense
+            "product": rng.choice(["common", "usual", "rare", "unique"], rows, p=[0.6, 0.395, 0.004, 0.001]),
+            "region": rng.choice(["EMEA", "APAC", "AMER"], rows),
+            "units": rng.integers(0, 100, rows),
+        }
+    )
+
+
+def test_row_set_modes_evaluate_alike():
+    df = make_sales()
+    data = FilterIndex(df, ["product", "region", "units"], ranges=["units"])
+    engines = {mode: FilterEngine(data, row_sets=mode) for mode in ["masks", "bitmaps", "auto"]}
+    states = [
+        {"product": [], "region": [], "units": []},
+        {"product": ["rare"], "region": ["EMEA"], "units": []},
+        {"product": ["common", "unique"], "region": [], "units": [10, 20]},
+        {"product": [], "region": ["APAC", "AMER"], "units": [0, 0]},
+    ]
+    for state in states:
+        expected = engines["masks"].evaluate(state)
+        for mode in ["bitmaps", "auto"]:
+            result = engines[mode].evaluate(state)
+            assert result["selections"] == expected["selections"]
+            assert result["options"] == expected["options"]
+            if expected["positions"] is None:
+                assert result["positions"] is None
+            else:
+                assert np.array_equal(result["positions"], expected["positions"])
+
+
+def test_auto_picks_row_sets_for_sparse_selections():
+    engine = FilterEngine(FilterIndex(make_sales(), ["product", "region"]), row_sets="auto")
+    assert engine.use_row_sets((("product", frozenset(["rare"])),))
+    assert not engine.use_row_sets((("product", frozenset(["common"])), ("region", frozenset(["EMEA"]))))
+    assert engine.use_row_sets((("product", frozenset(["unique"])), ("region", frozenset(["EMEA"]))))
@@ -0,0 +1,84 @@
+import pickle
+
+import pandas as pd
+import pytest
+from streamlit.errors import StreamlitAPIException
+from streamlit.testing.v1 import AppTest
+
+from streamlit_dynamic_filters import DynamicFilters, FilterIndex
+from streamlit_dynamic_filters.cache import fingerprint
+
+SALES = pd.DataFrame(
+    {
+        "region": ["EMEA", "EMEA", "APAC", "AMER"],
+        "country": ["FR", "DE", "JP", "US"],
+        "units": [3, 5, 2, 7],
+    }
+)
+
+
+def test_fingerprint_follows_values_not_objects():
+    copy = pickle.loads(pickle.dumps(SALES))
+    assert fingerprint(copy) == fingerprint(SALES)
+    changed = SALES.copy()
+    changed.loc[1, "country"] = "AT"
+    assert fingerprint(changed) != fingerprint(SALES)
+    changed = SALES.copy()
+    changed.loc[1, "units"] = 6
+    assert fingerprint(changed) != fingerprint(SALES)
+    assert fingerprint(SALES.set_axis(["a", "b", "c", "d"])) != fingerprint(SALES)
+
+
+def test_indexes_are_shared_across_runs_by_default():
+    first = DynamicFilters(SALES, ["region", "country"], filters_name="shared_default")
+    rerun = DynamicFilters(pickle.loads(pickle.dumps(SALES)), ["region", "country"], filters_name="shared_default")
+    assert rerun.data is first.data
+    assert first.shared
+
+
+def test_unshared_filters_build_their_own_indexes():
+    first = DynamicFilters(SALES, ["region", "country"], filters_name="unshared", shared=False)
+    rerun = DynamicFilters(SALES, ["region", "country"], filters_name="unshared", shared=False)
+    assert rerun.data is not first.data
+    assert not first.shared
+
+
+def test_filter_index_backs_the_filters_of_every_instance():
+    data = FilterIndex(SALES, ["region", "country"])
+    first = DynamicFilters(data, ["region", "country"], filters_name="index_first")
+    second = DynamicFilters(data, ["country"], filters_name="index_second", shared=False)
+    assert first.data is data and second.data is data
+    assert second.shared
+    filtered = first.filter_df()
+    filtered["revenue"] = filtered["units"] * 10
+    assert list(SALES.columns) == ["region", "country", "units"]
+    with pytest.raises(StreamlitAPIException):
+        DynamicFilters(data, ["units"], filters_name="index_other")
+
+
+def report_app():
+    import pandas as pd
+    import streamlit as st
+
+    from streamlit_dynamic_filters import DynamicFilters
+
+    df = pd.DataFrame({"region": ["EMEA", "EMEA", "APAC", "AMER"] * 50, "units": range(200)})
+    dynamic_filters = DynamicFilters(df, ["region"])
+    dynamic_filters.display_filters()
+    st.session_state["report"] = dynamic_filters.memory_report()
+
+
+def test_memory_report_separates_the_shared_data_from_the_session():
+    at = AppTest.from_function(report_app).run()
+    report = at.session_state["report"]
+    assert report["shared_across_sessions"]
+    assert report["shared"]["df"] > 200 * 8
+    assert report["shared_bytes"] == sum(report["shared"].values())
+    assert set(report["session"]) <= {"filters", "filtersregion"}
+    # the session holds the selections, not the dataframe
+    assert report["session_bytes"] < report["shared"]["df"]
+    before = report
+    at.multiselect(key="filtersregion").select("EMEA").run()
+    report = at.session_state["report"]
+    assert report["session_bytes"] > before["session_bytes"]
+    assert report["shared"]["df"] == before["shared"]["df"]
@@ -0,0 +1,45 @@
+import os
+
+import pandas as pd
+
+from streamlit_dynamic_filters import FilterEngine, FilterIndex
+
+SALES = pd.DataFrame(
+    {
+        "region": ["EMEA", "EMEA", "APAC", None, "AMER"],
+        "tier": pd.Categorical(["gold", "silver", "gold", "gold", "silver"], categories=["silver", "gold", "bronze"]),
+        "product": ["Desk", "desk lamp", "Chair", "Desk", "Lamp"],
+        "price": [10.0, 25.5, 7.0, 12.0, 3.5],
+        "cust": [1, 2, 2, 3, 9],
+    }
+)
+CUSTOMERS = pd.DataFrame({"cust": [1, 2, 3], "segment": ["Corp", "SMB", "Corp"]})
+ARGUMENTS = {
+    "filters": ["region", "tier", "product", "price", "cust", "segment"],
+    "ranges": ["price"],
+    "texts": ["product"],
+    "dimensions": {"cust": CUSTOMERS},
+}
+
+
+def test_artifact_is_not_pickled(tmp_path):
+    directory = FilterIndex(SALES, **ARGUMENTS).save(str(tmp_path))
+    assert all(name.endswith(".npy") or name == "manifest.json" for name in os.listdir(directory))
+
+
+def test_loaded_index_matches_built_index(tmp_path):
+    built = FilterIndex(SALES, **ARGUMENTS)
+    built.save(str(tmp_path))
+    loaded = FilterIndex.load(str(tmp_path), SALES, **ARGUMENTS)
+    assert loaded.sorted_values == built.sorted_values
+    for column_name in ["region", "tier", "product", "cust", "segment"]:
+        values = loaded.index[column_name].values
+        assert values.dtype == built.index[column_name].values.dtype
+        assert values.equals(built.index[column_name].values)
+    assert loaded.index["segment"].key_index is loaded.index["cust"]
+    for state in [{}, {"region": ["EMEA"]}, {"product": ["desk"]}, {"price": [5, 20]}, {"segment": ["Corp"]}]:
+        selections = {filter_name: state.get(filter_name, []) for filter_name in ARGUMENTS["filters"]}
+        expected = FilterEngine(built).evaluate(selections)
+        result = FilterEngine(loaded).evaluate(selections)
+        assert repr(result["options"]) == repr(expected["options"])
+        assert result["selections"] == expected["selections"]
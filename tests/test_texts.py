@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+from streamlit.testing.v1 import AppTest
+
+from streamlit_dynamic_filters import FilterEngine, FilterIndex
+from streamlit_dynamic_filters.engine import TextIndex
+
+PRODUCTS = pd.Series(
+    ["Straße Bike", "road bike", "Mountain BIKE", "bike pump", "Helmet", None, "e-Bike 🚲", "Kid's bike", "helmet light"] * 3
+)
+QUERIES = ["bike", "BIKE", "e b", "ke", "b", "", "strasse", "straße", "🚲", "'s", "pump", "zzz", "helmet l", "  "]
+
+
+def contains(column, query):
+    """The expected matches: the string contains the query, ignoring case."""
+    return column.map(lambda value: value is not None and query.casefold() in str(value).casefold()).to_numpy()
+
+
+def test_trigram_index_matches_a_contains_scan():
+    index = TextIndex(PRODUCTS)
+    for query in QUERIES:
+        expected = contains(PRODUCTS, query)
+        assert np.array_equal(index.positions([query]), np.flatnonzero(expected)), query
+        assert np.array_equal(index.mask([query]), expected), query
+        assert index.count([query]) == expected.sum(), query
+
+
+def test_contains_selection_narrows_the_other_filters():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"product": PRODUCTS, "store": rng.choice(["north", "south", "east"], len(PRODUCTS))})
+    engine = FilterEngine(FilterIndex(df, ["product", "store"], texts=["product"]))
+    for query in ["bike", "helmet", "zzz"]:
+        result = engine.evaluate({"product": [query], "store": ["north", "south"]})
+        matched = contains(df["product"], query)
+        expected = df[matched & df["store"].isin(["north", "south"])]
+        assert np.array_equal(result["positions"], expected.index.to_numpy()), query
+        assert sorted(result["options"]["store"]) == sorted(df[matched]["store"].unique()), query
+        assert result["selections"]["product"] == [query]
+
+
+def text_app():
+    import pandas as pd
+    import streamlit as st
+
+    from streamlit_dynamic_filters import DynamicFilters
+
+    df = pd.DataFrame({"product": ["Road bike", "Bike pump", "Helmet"], "store": ["north", "south", "north"]})
+    dynamic_filters = DynamicFilters(df, ["product", "store"], texts=["product"])
+    dynamic_filters.display_filters()
+    st.text(dynamic_filters.filter_df()["product"].tolist())
+
+
+def test_typed_query_filters_the_rows():
+    at = AppTest.from_function(text_app).run()
+    at.text_input(key="filtersproduct").input("BIKE").run()
+    assert not at.exception
+    assert at.caption[0].value == "2 matching rows"
+    assert at.text[0].value == "['Road bike', 'Bike pump']"
+    assert at.multiselect(key="filtersstore").options == ["north", "south"]
+    at.multiselect(key="filtersstore").select("south").run()
+    assert at.text[0].value == "['Bike pump']"